@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.database.session import get_db
 from app.services.dashboard import get_dashboard_stats
 from app.schemas.dashboard import DashboardStats
 from app.core.auth import get_current_user
@@ -7,7 +9,8 @@ from app.models.user import User
 router = APIRouter()
 
 @router.get("/dashboard/stats", response_model=DashboardStats)
-async def get_stats(current_user: User = Depends(get_current_user)):
+def get_stats(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Счетчики панели администратора: одна строка dashboard_counters"""
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    return get_dashboard_stats() 
\ No newline at end of file
+    return get_dashboard_stats(db)
@@ -2,10 +2,13 @@
 API v1 router and endpoints
 """
 
-from fastapi import APIRouter
-from app.api.v1 import menu, settings, analytics, auth, waiter, reviews
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.api.v1 import menu, settings, analytics, auth, waiter, reviews, tables, admin
 from app.api.v1.endpoints import orders, categories, reservations
 from app.api.v1.users import router as users_router
+from app.models.user import User, UserRole
+from app.services.auth import get_current_user
+from app.services import db_backup, db_maintenance
 
 api_router = APIRouter()
 
@@ -16,9 +19,11 @@ api_router.include_router(orders.router, prefix="/orders", tags=["orders"])
 api_router.include_router(categories.router, prefix="/categories", tags=["categories"])
 api_router.include_router(reservations.router, prefix="/reservations", tags=["reservations"])
 api_router.include_router(settings.router, prefix="/settings", tags=["settings"])
+api_router.include_router(tables.router, prefix="/tables", tags=["tables"])
 api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
 api_router.include_router(waiter.router, prefix="/waiter", tags=["waiter"])
 api_router.include_router(reviews.router, prefix="/reviews", tags=["reviews"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
 
 @api_router.get("/health", tags=["system"])
 async def health_check():
@@ -32,6 +37,17 @@ async def health_check():
         "message": "API сервер работает нормально"
     }
 
+@api_router.get("/health/db", tags=["system"])
+def db_health(current_user: User = Depends(get_current_user)):
+    """
+    Метрики SQLite: размер файла -wal, свободные страницы, режим auto_vacuum,
+    результат последнего фонового обслуживания и последняя резервная копия.
+    Доступно только администраторам.
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав")
+    return {**db_maintenance.get_metrics(), "last_backup": db_backup.get_last_backup()}
+
 @api_router.get("/ping", tags=["system"])
 async def ping():
     """
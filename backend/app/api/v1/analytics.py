@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 import logging
 
-from app.database.session import get_db
+from app.database.session import get_read_db
 from app.models.user import User, UserRole
 from app.core.security import get_current_active_user
 from app.services import analytics
@@ -75,7 +75,7 @@ def parse_date(date_str: str = None) -> datetime:
 def get_sales_statistics(
     start_date: str = Query(None),
     end_date: str = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -103,7 +103,7 @@ def get_top_dishes(
     limit: int = 10,
     start_date: str = Query(None),
     end_date: str = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -124,7 +124,7 @@ def get_top_dishes(
 def get_revenue_by_category(
     start_date: str = Query(None),
     end_date: str = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -143,7 +143,7 @@ def get_revenue_by_category(
 
 @router.get("/dashboard", response_model=Dict[str, Any])
 def get_dashboard_statistics(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -183,7 +183,7 @@ def get_financial_analytics(
     start_date: str = None,
     end_date: str = None,
     use_mock_data: bool = False,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -231,7 +231,7 @@ def get_menu_analytics(
     category_id: int = None,
     dish_id: int = None,
     use_mock_data: bool = False,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -272,7 +272,7 @@ def get_customers_analytics(
     end_date: str = None,
     user_id: int = None,
     use_mock_data: bool = False,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -316,7 +316,7 @@ def get_operational_analytics(
     start_date: str = None,
     end_date: str = None,
     use_mock_data: bool = False,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -357,7 +357,7 @@ def get_operational_analytics(
 def get_predictive_analytics(
     start_date: str = None,
     end_date: str = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -392,7 +392,7 @@ def get_dashboard_analytics(
     start_date: str = None,
     end_date: str = None,
     use_mock_data: bool = False,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -1,19 +1,28 @@
 from typing import Any, List, Dict, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Body
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 import json
 from pydantic import BaseModel
 
-from app.schemas.orders import OrderCreate, OrderOut, OrderDishItem
-from app.services.orders import create_order as create_order_service, get_orders as get_orders_service
+from app.schemas.orders import OrderCreate, OrderOut, OrderDishItem, OrderBulkUpdateItem
+from app.services.orders import create_order as create_order_service, get_orders as get_orders_service, get_items_for_orders
+from app.services.order_state import bulk_transition_orders
+from app.services.order_archive import get_archived_order
+from app.services.write_queue import execute_write
+from app.utils.fields import parse_fields, nested_fields, build_fields, filter_fields, wants
 from app.models.user import User
 from app.models.order import Order, OrderDish
 from app.models.menu import Dish
-from app.database.session import get_db
+from app.database.session import get_db, get_read_db
 from app.core.auth import get_current_user
 
 router = APIRouter()
 
+# Максимальное количество заказов в одном пакетном обновлении
+BULK_UPDATE_LIMIT = 500
+
 class OrderCreateRequest(BaseModel):
     payment_method: Optional[str] = "cash"
     customer_name: Optional[str] = None
@@ -27,13 +36,14 @@ class OrderCreateRequest(BaseModel):
 
 @router.get("/", response_model=List[OrderOut])
 def get_orders(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
     status: str = None,
     user_id: int = None,
     start_date: str = None,
     end_date: str = None,
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -44,21 +54,29 @@ def get_orders(
     - user_id: фильтр по ID пользователя
     - start_date: начальная дата для выборки
     - end_date: конечная дата для выборки
+    - fields: список возвращаемых полей через запятую (например, "id,status,items.name")
     """
     try:
         # Проверка прав доступа: обычный пользователь видит только свои заказы
         if current_user.role not in ["admin", "waiter"]:
             user_id = current_user.id
 
+        requested_fields = parse_fields(fields)
+
         # Получаем заказы через сервисный слой
         orders = get_orders_service(
             db=db,
             skip=skip,
             limit=limit,
             status=status,
-            user_id=user_id
+            user_id=user_id,
+            fields=requested_fields
         )
         
+        if requested_fields:
+            # Частичный ответ не проходит валидацию по полной схеме OrderOut
+            return JSONResponse(content=jsonable_encoder(orders))
+        
         return orders
     except Exception as e:
         raise HTTPException(
@@ -66,74 +84,123 @@ def get_orders(
             detail=f"Ошибка при получении заказов: {str(e)}"
         )
 
+@router.post("/bulk-update", response_model=None)
+def bulk_update_orders(
+    updates: List[OrderBulkUpdateItem] = Body(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Пакетное обновление статусов заказов (например, при закрытии стола или смены).
+    
+    Принимает список [{"order_id": 1, "status": "COMPLETED", "payment_status": "PAID"}, ...]
+    и применяет его в одной транзакции. Возвращает результат по каждому заказу.
+    """
+    if current_user.role not in ["admin", "waiter"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав для обновления заказов"
+        )
+    
+    if not updates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Не указаны заказы для обновления"
+        )
+    
+    if len(updates) > BULK_UPDATE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Слишком много заказов в одном запросе (максимум {BULK_UPDATE_LIMIT})"
+        )
+    
+    try:
+        results = execute_write(db, bulk_transition_orders, [item.dict() for item in updates])
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при пакетном обновлении заказов: {str(e)}"
+        )
+    
+    updated_count = sum(1 for result in results if result["success"])
+    return {
+        "success": updated_count == len(results),
+        "updated": updated_count,
+        "failed": len(results) - updated_count,
+        "results": results
+    }
+
 @router.get("/{order_id}", response_model=OrderOut)
 def get_order_by_id(
     order_id: int,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Получение информации о конкретном заказе по ID
+    
+    Параметр fields позволяет запросить только нужные поля (например, "id,status,items.name")
     """
     try:
         # Проверяем наличие заказа в базе данных
         order = db.query(Order).filter(Order.id == order_id).first()
+        # Давно закрытые заказы лежат в месячных архивах
+        archived_order = get_archived_order(db, order_id) if not order else None
         
-        if not order:
+        if not order and not archived_order:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Заказ с ID {order_id} не найден"
             )
         
         # Проверка прав доступа
-        if current_user.role not in ["admin", "waiter"] and order.user_id != current_user.id:
+        owner_id = order.user_id if order else archived_order["user_id"]
+        if current_user.role not in ["admin", "waiter"] and owner_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="У вас нет прав на просмотр этого заказа"
             )
         
-        # Получаем позиции заказа
-        order_dishes = db.query(OrderDish).filter(OrderDish.order_id == order_id).all()
+        requested_fields = parse_fields(fields)
+        
+        if archived_order:
+            order_data = filter_fields(archived_order, requested_fields)
+            if requested_fields:
+                return JSONResponse(content=jsonable_encoder(order_data))
+            return order_data
         
-        # Формируем список позиций
+        # Позиции заказа загружаем только если они запрошены
         items = []
-        for item in order_dishes:
-            # Получаем связанное блюдо
-            dish = db.query(Dish).filter(Dish.id == item.dish_id).first()
-            dish_name = dish.name if dish else f"Блюдо #{item.dish_id}"
-            
-            items.append({
-                "id": item.id,
-                "dish_id": item.dish_id,
-                "name": dish_name,
-                "quantity": item.quantity,
-                "price": float(item.price),
-                "total_price": float(item.price * item.quantity),
-                "special_instructions": item.special_instructions or ""
-            })
+        if wants(requested_fields, "items"):
+            items = get_items_for_orders([order_id], db, nested_fields(requested_fields, "items")).get(order_id, [])
         
         # Формируем ответ
-        order_data = {
-            "id": order.id,
-            "user_id": order.user_id,
-            "waiter_id": order.waiter_id,
-            "table_number": order.table_number,
-            "status": order.status,
-            "payment_status": order.payment_status,
-            "payment_method": order.payment_method,
-            "total_amount": float(order.total_amount),
-            "comment": order.comment,
-            "special_instructions": order.comment,
-            "created_at": order.created_at.isoformat() if order.created_at else None,
-            "updated_at": order.updated_at.isoformat() if order.updated_at else None,
-            "completed_at": order.completed_at.isoformat() if order.completed_at else None,
-            "customer_name": order.customer_name or "",
-            "customer_phone": order.customer_phone or "",
-            "order_code": order.order_code or "",
-            "is_urgent": order.is_urgent or False,
-            "is_group_order": order.is_group_order or False,
-            "items": items
-        }
+        order_data = build_fields({
+            "id": lambda: order.id,
+            "user_id": lambda: order.user_id,
+            "waiter_id": lambda: order.waiter_id,
+            "table_number": lambda: order.table_number,
+            "status": lambda: order.status,
+            "payment_status": lambda: order.payment_status,
+            "payment_method": lambda: order.payment_method,
+            "total_amount": lambda: float(order.total_amount),
+            "comment": lambda: order.comment,
+            "special_instructions": lambda: order.comment,
+            "created_at": lambda: order.created_at.isoformat() if order.created_at else None,
+            "updated_at": lambda: order.updated_at.isoformat() if order.updated_at else None,
+            "completed_at": lambda: order.completed_at.isoformat() if order.completed_at else None,
+            "customer_name": lambda: order.customer_name or "",
+            "customer_phone": lambda: order.customer_phone or "",
+            "order_code": lambda: order.order_code or "",
+            "is_urgent": lambda: order.is_urgent or False,
+            "is_group_order": lambda: order.is_group_order or False,
+            "items": lambda: items
+        }, requested_fields)
+        
+        if requested_fields:
+            # Частичный ответ не проходит валидацию по полной схеме OrderOut
+            return JSONResponse(content=jsonable_encoder(order_data))
         
         return order_data
         
@@ -195,7 +262,7 @@ def create_order(
         
         # Создаем заказ через сервисный слой
         try:
-            order_result = create_order_service(db, current_user.id, OrderCreate(**order_data))
+            order_result = execute_write(db, create_order_service, current_user.id, OrderCreate(**order_data))
             
             # Возвращаем результат прямо, без валидации Pydantic
             return {
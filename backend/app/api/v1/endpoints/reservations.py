@@ -1,13 +1,17 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
 from sqlalchemy.orm import Session
 
-from app.database.session import get_db
+from app.database.session import get_db, get_read_db
 from app.models.user import User, UserRole
 from app.models.reservation import ReservationStatus, Reservation
 from app.schemas.reservation import ReservationResponse, ReservationCreate, ReservationUpdate, ReservationRawResponse
+from app.schemas.waitlist import WaitlistEntryCreate, WaitlistEntryResponse
 from app.services.auth import get_current_user, get_optional_current_user
+from app.utils.date_utils import day_bounds, to_naive
+from app.services.availability import availability, ReservationConflictError
+from app.services.waitlist import waitlist
 from app.services.reservation import (
     get_reservation, get_reservations_by_user, get_reservations_by_date,
     get_reservations_by_status, create_reservation, update_reservation, delete_reservation,
@@ -24,7 +28,7 @@ async def read_reservations(
     limit: int = 100,
     status: ReservationStatus = None,
     date: datetime = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_optional_current_user)
 ):
     """Получение списка бронирований"""
@@ -156,7 +160,7 @@ async def create_reservation_endpoint(
             detail="Не указано время бронирования",
         )
     
-    if reservation_in.reservation_time <= datetime.now():
+    if reservation_in.reservation_time <= datetime.utcnow():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Дата бронирования должна быть в будущем",
@@ -171,8 +175,11 @@ async def create_reservation_endpoint(
                 detail=f"Бронирование с кодом {reservation_in.reservation_code} уже существует",
             )
     
-    # Создаем бронирование
-    db_reservation = create_reservation(db, current_user.id, reservation_in)
+    # Создаем бронирование (стол должен быть свободен на это время)
+    try:
+        db_reservation = create_reservation(db, current_user.id, reservation_in)
+    except ReservationConflictError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     
     # Проверяем, что код бронирования установлен правильно
     print(f"[DEBUG API] После создания бронирования: ID={db_reservation.id}, код={db_reservation.reservation_code}, исходный код={reservation_in.reservation_code}")
@@ -183,6 +190,96 @@ async def create_reservation_endpoint(
     return db_reservation
 
 
+@router.get("/availability", response_model=Dict[str, Any])
+def check_table_availability(
+    table_number: int,
+    start: datetime,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Проверка, свободен ли стол в интервале [start, end).
+    Если end не указан, проверяется стандартная длительность брони.
+    """
+    start, end = to_naive(start), end and to_naive(end)
+    if end is not None and end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Время окончания должно быть позже времени начала",
+        )
+    
+    return {
+        "table_number": table_number,
+        "start": start,
+        "end": end or start + availability.duration,
+        "is_free": availability.is_table_free(db, table_number, start, end)
+    }
+
+
+@router.get("/available-tables", response_model=List[Dict[str, Any]])
+def read_available_tables(
+    guests_count: int = Query(..., ge=1),
+    start: datetime = Query(...),
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """Свободные в интервале [start, end) столы, вмещающие указанное число гостей"""
+    start, end = to_naive(start), end and to_naive(end)
+    if end is not None and end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Время окончания должно быть позже времени начала",
+        )
+    
+    return availability.free_tables(db, guests_count, start, end)
+
+
+def _require_staff(current_user: User) -> None:
+    if current_user.role not in [UserRole.ADMIN, UserRole.WAITER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав для работы с листом ожидания",
+        )
+
+
+@router.get("/waitlist", response_model=List[WaitlistEntryResponse])
+def read_waitlist(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Лист ожидания в порядке очереди с оценкой времени освобождения стола"""
+    _require_staff(current_user)
+    return waitlist.entries(db)
+
+
+@router.post("/waitlist", response_model=WaitlistEntryResponse, status_code=status.HTTP_201_CREATED)
+def add_to_waitlist(
+    entry_in: WaitlistEntryCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Постановка гостей в лист ожидания"""
+    _require_staff(current_user)
+    party_id = waitlist.add_party(
+        entry_in.guest_name, entry_in.guests_count, entry_in.guest_phone, entry_in.priority
+    )
+    return waitlist.get_entry(db, party_id)
+
+
+@router.delete("/waitlist/{party_id}", status_code=status.HTTP_204_NO_CONTENT)
+def remove_from_waitlist(
+    party_id: int,
+    current_user: User = Depends(get_current_user)
+):
+    """Удаление гостей из листа ожидания (посажены за стол или ушли)"""
+    _require_staff(current_user)
+    if not waitlist.remove_party(party_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Запись в листе ожидания не найдена",
+        )
+
+
 @router.get("/{reservation_id}", response_model=ReservationResponse)
 async def read_reservation_by_id(
     request: Request,
@@ -291,7 +388,7 @@ async def update_reservation_endpoint(
         )
     
     # Если изменяется дата, проверяем, что она в будущем
-    if reservation_in.reservation_time and reservation_in.reservation_time <= datetime.now():
+    if reservation_in.reservation_time and reservation_in.reservation_time <= datetime.utcnow():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Дата бронирования должна быть в будущем",
@@ -304,7 +401,10 @@ async def update_reservation_endpoint(
             detail="Нельзя изменить отмененное или завершенное бронирование",
         )
     
-    return update_reservation(db, reservation_id, reservation_in)
+    try:
+        return update_reservation(db, reservation_id, reservation_in)
+    except ReservationConflictError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
 
 
 @router.delete("/{reservation_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -410,7 +510,7 @@ async def read_raw_reservations(
     limit: int = 100,
     status: str = None,
     date: datetime = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Получение списка бронирований без строгой валидации схемы"""
     print(f"[RAW API] Получение бронирований с параметрами: skip={skip}, limit={limit}, status={status}, date={date}")
@@ -423,13 +523,12 @@ async def read_raw_reservations(
         query = query.filter(Reservation.status == status)
     
     if date:
-        # Извлекаем только дату (без времени)
-        start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = date.replace(hour=23, minute=59, second=59, microsecond=999999)
+        # Полуоткрытый интервал дня - фильтр по индексу reservation_time
+        start_of_day, next_day = day_bounds(date)
         
         query = query.filter(
             Reservation.reservation_time >= start_of_day,
-            Reservation.reservation_time <= end_of_day
+            Reservation.reservation_time < next_day
         )
     
     # Получаем результаты с пагинацией
@@ -524,6 +623,8 @@ async def update_reservation_status(
         print(f"[DEBUG] Статус бронирования #{reservation_id} обновлен на {new_status}")
         
         return updated_reservation
+    except ReservationConflictError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         print(f"[ERROR] Ошибка при обновлении статуса бронирования: {str(e)}")
         raise HTTPException(
@@ -2,7 +2,7 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
-from app.database.session import get_db
+from app.database.session import get_db, get_read_db
 from app.models.user import User, UserRole
 from app.schemas.menu import (
     CategoryResponse, CategoryCreate, CategoryUpdate,
@@ -26,7 +26,7 @@ router = APIRouter()
 def read_categories(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Получение списка категорий"""
     return get_categories(db, skip=skip, limit=limit)
@@ -312,7 +312,7 @@ def read_dishes(
     is_vegetarian: Optional[bool] = None,
     is_vegan: Optional[bool] = None,
     available_only: bool = False,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Получение списка блюд с фильтрацией"""
     return get_dishes(
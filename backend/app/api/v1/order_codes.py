@@ -12,7 +12,8 @@ from app.services.order_code import (
     get_order_codes,
     get_order_code_by_code,
     update_order_code,
-    delete_order_code
+    delete_order_code,
+    is_code_expired
 )
 
 router = APIRouter()
@@ -121,6 +122,12 @@ def verify_order_code(
             detail="Код заказа уже использован"
         )
     
+    if is_code_expired(code):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Срок действия кода заказа истек"
+        )
+    
     return code
 
 
@@ -8,7 +8,7 @@ from datetime import datetime
 
 from app.database.session import get_db
 from app.models.user import User, UserRole
-from app.models.order import OrderStatus, OrderDish, Order, PaymentMethod
+from app.models.order import OrderStatus, OrderDish, Order, PaymentMethod, ORDER_STATUS_ALIASES, normalize_status_value
 from app.models.menu import Dish
 from app.schemas.order import (
     Order as OrderSchema,
@@ -21,9 +21,13 @@ from app.schemas.order import (
     OrderStatusUpdateSchema
 )
 from app.services import order as order_service
+from app.services import order_state
 from app.core.security import get_current_active_user, check_admin_permission, check_waiter_permission
 from app.services.auth import get_current_user
 from fastapi import status as http_status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.utils.fields import parse_fields, filter_fields
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -41,6 +45,7 @@ def read_orders(
     user_id: int = None,
     start_date: str = None,
     end_date: str = None,
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -51,6 +56,7 @@ def read_orders(
     - user_id: фильтр по ID пользователя
     - start_date: начальная дата для выборки (формат ISO, например "2025-04-08T19:00:00.000Z")
     - end_date: конечная дата для выборки (формат ISO)
+    - fields: список возвращаемых полей через запятую (например, "id,status,items.name")
     """
     try:
         logger.info(f"Запрос списка заказов. Пользователь: {current_user.id}, роль: {current_user.role}")
@@ -69,7 +75,8 @@ def read_orders(
                 skip=skip, 
                 limit=limit, 
                 status=status, 
-                user_id=user_id
+                user_id=user_id,
+                fields=parse_fields(fields)
             )
             
             logger.info(f"Успешно получено {len(orders_data)} заказов для ответа")
@@ -207,12 +214,18 @@ def read_order(
     *,
     db: Session = Depends(get_db),
     order_id: int,
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
     """
     Получить информацию о конкретном заказе
+    
+    Параметр fields позволяет запросить только нужные поля (например, "id,status,items.name")
     """
-    order = order_service.get_order_detailed(db, order_id)
+    requested_fields = parse_fields(fields)
+    # user_id нужен для проверки прав доступа, даже если не запрошен клиентом
+    service_fields = {**requested_fields, "user_id": None} if requested_fields else None
+    order = order_service.get_order_detailed(db, order_id, service_fields)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -222,6 +235,10 @@ def read_order(
             status_code=http_status.HTTP_403_FORBIDDEN,
             detail="У вас нет прав для просмотра этого заказа"
         )
+    
+    if requested_fields:
+        # Частичный ответ не проходит валидацию по полной схеме заказа
+        return JSONResponse(content=jsonable_encoder(filter_fields(order, requested_fields)))
         
     return order
 
@@ -302,15 +319,6 @@ def update_order_universal(
                 detail="Недостаточно прав для обновления заказа"
             )
         
-        # Проверяем существование заказа
-        db_order = db.query(Order).filter(Order.id == order_id).first()
-        if not db_order:
-            logger.warning(f"Заказ с ID {order_id} не найден")
-            raise HTTPException(
-                status_code=http_status.HTTP_404_NOT_FOUND,
-                detail=f"Заказ с ID {order_id} не найден"
-            )
-        
         # Экстракция данных из запроса - обрабатываем все возможные форматы
         status = None
         payment_status = None
@@ -367,142 +375,24 @@ def update_order_universal(
                     detail="Не указаны данные для обновления"
                 )
         
-        # Преобразуем статусы в верхний регистр
-        if status:
-            status = status.upper()
-        if payment_status:
-            payment_status = payment_status.upper()
-        
-        # Прямое обновление через SQL (безопасно для SQLite)
+        # Переход статуса одним условным UPDATE через машину состояний заказа
         try:
-            from sqlalchemy.sql import text
-            
-            sql_parts = []
-            params = {"order_id": order_id}
-            
-            # Обновляем статус заказа
-            if status:
-                sql_parts.append("status = :status")
-                params["status"] = status
-                
-                # Для статуса COMPLETED также обновляем дату завершения
-                if status == "COMPLETED":
-                    sql_parts.append("completed_at = datetime('now')")
-            
-            # Обновляем статус оплаты
-            if payment_status:
-                sql_parts.append("payment_status = :payment_status")
-                params["payment_status"] = payment_status
-            
-            # Всегда обновляем дату изменения
-            sql_parts.append("updated_at = datetime('now')")
-            
-            # Формируем и выполняем запрос
-            sql = f"UPDATE orders SET {', '.join(sql_parts)} WHERE id = :order_id"
-            logger.info(f"SQL запрос: {sql}, параметры: {params}")
-            
-            result = db.execute(text(sql), params)
-            db.commit()
-            
-            if result.rowcount == 0:
-                logger.warning(f"SQL запрос не обновил ни одной записи для заказа {order_id}")
-                raise HTTPException(
-                    status_code=http_status.HTTP_404_NOT_FOUND,
-                    detail=f"Заказ с ID {order_id} не найден или не обновлен"
-                )
-            
-            # Получаем обновленный заказ
-            updated_order = order_service.get_order_detailed(db, order_id)
-            
-            if not updated_order:
-                logger.warning(f"Не удалось получить обновленный заказ {order_id}")
-                return {
-                    "success": True,
-                    "message": "Статус заказа обновлен, но не удалось получить обновленные данные",
-                    "order_id": order_id
-                }
-            
-            logger.info(f"Заказ {order_id} успешно обновлен")
-            return {
-                "success": True,
-                "message": "Заказ успешно обновлен",
-                "order": updated_order
-            }
-            
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Ошибка SQL: {str(e)}")
-            
-            # Аварийное обновление через ORM
-            try:
-                logger.info(f"Аварийное обновление заказа {order_id} через ORM")
-                
-                if status:
-                    db_order.status = status
-                    if status == "COMPLETED":
-                        db_order.completed_at = datetime.utcnow()
-                
-                if payment_status:
-                    db_order.payment_status = payment_status
-                
-                # Обновляем время изменения
-                db_order.updated_at = datetime.utcnow()
-                
-                db.commit()
-                db.refresh(db_order)
-                
-                # Получаем обновленный заказ
-                updated_order = order_service.get_order_detailed(db, order_id)
-                
-                return {
-                    "success": True,
-                    "message": "Заказ успешно обновлен (аварийный режим)",
-                    "order": updated_order or {
-                        "id": db_order.id,
-                        "status": db_order.status,
-                        "payment_status": db_order.payment_status,
-                        "updated_at": db_order.updated_at.isoformat() if db_order.updated_at else None
-                    }
-                }
-            except Exception as orm_error:
-                db.rollback()
-                logger.error(f"Критическая ошибка ORM: {str(orm_error)}")
-                
-                # Финальная сверхнадежная попытка прямым SQL
-                try:
-                    logger.warning(f"Финальная попытка прямого SQL для заказа {order_id}")
-                    
-                    # Максимально простой запрос
-                    emergency_parts = []
-                    emergency_params = {"order_id": order_id}
-                    
-                    if status:
-                        emergency_parts.append("status = :status")
-                        emergency_params["status"] = status
-                    
-                    if payment_status:
-                        emergency_parts.append("payment_status = :payment_status")
-                        emergency_params["payment_status"] = payment_status
-                    
-                    if not emergency_parts:
-                        emergency_parts.append("updated_at = datetime('now')")
-                    
-                    emergency_sql = f"UPDATE orders SET {', '.join(emergency_parts)} WHERE id = :order_id"
-                    db.execute(text(emergency_sql), emergency_params)
-                    db.commit()
-                    
-                    return {
-                        "success": True,
-                        "message": "Заказ обновлен (экстренный режим)",
-                        "order_id": order_id
-                    }
-                except Exception as final_error:
-                    db.rollback()
-                    logger.error(f"ФИНАЛЬНАЯ ОШИБКА: {str(final_error)}")
-                    raise HTTPException(
-                        status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail=f"Все попытки обновления заказа {order_id} не удались"
-                    )
+            result = order_state.transition_order(
+                db, order_id,
+                status=status,
+                payment_status=payment_status,
+                expected_version=update_data.get("version")
+            )
+        except order_state.OrderTransitionError as e:
+            logger.warning(f"Переход статуса заказа {order_id} отклонен: {e.message}")
+            raise HTTPException(status_code=e.status_code, detail=e.message)
+        
+        logger.info(f"Заказ {order_id} успешно обновлен")
+        return {
+            "success": True,
+            "message": "Заказ успешно обновлен",
+            "order": order_state.serialize_transition(result)
+        }
     
     except HTTPException:
         raise
@@ -564,17 +454,23 @@ def read_order_raw(
     *,
     db: Session = Depends(get_db),
     order_id: int,
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Получение заказа по ID без валидации ответа (для отладки).
     Этот эндпоинт возвращает сырые данные заказа без преобразования в модель Pydantic.
+    Параметр fields позволяет запросить только нужные поля.
     """
     try:
         logger.info(f"Запрос raw заказа ID {order_id}. Пользователь: {current_user.id}, роль: {current_user.role}")
         
+        requested_fields = parse_fields(fields)
+        # user_id нужен для проверки прав доступа, даже если не запрошен клиентом
+        service_fields = {**requested_fields, "user_id": None} if requested_fields else None
+        
         # Получаем заказ из базы данных с помощью безопасной функции
-        order_data = order_service.get_order_detailed(db, order_id)
+        order_data = order_service.get_order_detailed(db, order_id, service_fields)
         
         if not order_data:
             logger.warning(f"Заказ с ID {order_id} не найден")
@@ -587,7 +483,7 @@ def read_order_raw(
             raise HTTPException(status_code=403, detail="Недостаточно прав")
         
         # Нормализуем данные и возвращаем их напрямую без валидации
-        return order_data
+        return filter_fields(order_data, requested_fields)
         
     except HTTPException:
         raise
@@ -822,7 +718,8 @@ def assign_order_to_waiter_by_code(
     # ПРИНУДИТЕЛЬНОЕ ОБНОВЛЕНИЕ ЗАКАЗА ЧЕРЕЗ ПРЯМОЙ SQL
     try:
         # Определяем новый статус
-        new_status = "confirmed" if order_status.lower() == "pending" else order_status
+        current_status = normalize_status_value(order_status)
+        new_status = OrderStatus.CONFIRMED.value if current_status == OrderStatus.PENDING.value else current_status
         
         # Формируем SQL запрос и выполняем его
         update_query = text("""
@@ -968,7 +865,7 @@ def force_update_order(
         
         if "status" in update_data and update_data["status"] is not None:
             update_fields.append("status = :status")
-            params["status"] = update_data["status"].lower()
+            params["status"] = normalize_status_value(update_data["status"], ORDER_STATUS_ALIASES)
         
         # Всегда обновляем updated_at
         update_fields.append("updated_at = NOW()")
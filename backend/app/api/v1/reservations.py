@@ -8,6 +8,8 @@ from app.models.user import User, UserRole
 from app.models.reservation import ReservationStatus, Reservation
 from app.schemas.reservation import ReservationResponse, ReservationCreate, ReservationUpdate, ReservationRawResponse
 from app.services.auth import get_current_user, get_optional_current_user
+from app.utils.date_utils import day_bounds
+from app.services.availability import ReservationConflictError
 from app.services.reservation import (
     get_reservation, get_reservations_by_user, get_reservations_by_date,
     get_reservations_by_status, create_reservation, update_reservation, delete_reservation,
@@ -181,7 +183,10 @@ async def create_reservation_endpoint(
     print(f"[RESERVATIONS DEBUG] Создание бронирования для пользователя {user_id}")
     
     # Создаем бронирование
-    db_reservation = create_reservation(db, user_id, reservation_in)
+    try:
+        db_reservation = create_reservation(db, user_id, reservation_in)
+    except ReservationConflictError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     
     # Проверяем, что бронирование создано и имеет правильный user_id
     if db_reservation.user_id != user_id:
@@ -331,7 +336,10 @@ async def update_reservation_endpoint(
             detail="Нельзя изменить отмененное или завершенное бронирование",
         )
     
-    return update_reservation(db, reservation_id, reservation_in)
+    try:
+        return update_reservation(db, reservation_id, reservation_in)
+    except ReservationConflictError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
 
 
 @router.delete("/{reservation_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -421,13 +429,12 @@ async def read_raw_reservations(
         query = query.filter(Reservation.status == status)
     
     if date:
-        # Извлекаем только дату (без времени)
-        start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = date.replace(hour=23, minute=59, second=59, microsecond=999999)
+        # Полуоткрытый интервал дня - фильтр по индексу reservation_time
+        start_of_day, next_day = day_bounds(date)
         
         query = query.filter(
             Reservation.reservation_time >= start_of_day,
-            Reservation.reservation_time <= end_of_day
+            Reservation.reservation_time < next_day
         )
     
     # Получаем результаты с пагинацией
@@ -0,0 +1,57 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+import logging
+
+from app.database.session import get_db
+from app.models.table import TableStatus
+from app.models.user import User, UserRole
+from app.schemas.tables import TableResponse, TableStatusUpdate
+from app.services.auth import get_current_user
+from app.services import tables as tables_service
+from app.services.settings_cache import settings_cache
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("", response_model=List[TableResponse])
+def read_tables(
+    status_filter: Optional[TableStatus] = Query(None, alias="status"),
+    active_only: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Список столов ресторана (с фильтром по статусу)"""
+    return tables_service.get_tables(
+        db, active_only=active_only, status=status_filter.value if status_filter else None
+    )
+
+
+@router.patch("/{table_id}/status", response_model=TableResponse)
+def update_table_status(
+    table_id: int,
+    status_in: TableStatusUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Смена статуса стола (свободен, занят, забронирован, обслуживание).
+    Доступно администраторам и официантам.
+    """
+    if current_user.role not in [UserRole.ADMIN, UserRole.WAITER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав для изменения статуса стола",
+        )
+
+    table = tables_service.update_table_status(db, table_id, status_in.status.value)
+    if table is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Стол не найден",
+        )
+    settings_cache.update_table(table)
+    logger.info(f"Статус стола {table['number']} изменен на {table['status']} пользователем {current_user.id}")
+    return table
@@ -2,7 +2,7 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 
-from app.database.session import get_db
+from app.database.session import get_db, get_read_db
 from app.models.user import User, UserRole
 from app.schemas.user import UserResponse, UserUpdate, UserCreate
 from app.services.auth import get_current_user
@@ -96,7 +96,7 @@ def read_users(
     skip: int = 0,
     limit: int = 100,
     role: UserRole = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Получение списка пользователей"""
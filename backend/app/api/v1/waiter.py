@@ -1,14 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session, joinedload
-from typing import List
+from typing import List, Optional
 from app.database.session import get_db
 from app.services.auth import get_current_user
 from app.models.user import User
-from app.models.order import Order, OrderStatus, PaymentStatus, OrderDish
+from app.models.order import Order, OrderStatus, PaymentStatus, OrderDish, normalize_status_value
 from app.models.menu import Dish
 from app.schemas.order import OrderResponse
+from app.utils.fields import parse_fields, nested_fields, build_fields, wants
 import logging
-from sqlalchemy.sql import text
+from sqlalchemy import func, select, update
 
 router = APIRouter()
 
@@ -29,8 +32,8 @@ async def emergency_assign_order(
     
     try:
         # Получаем информацию о заказе
-        check_query = text("SELECT id, status, waiter_id FROM orders WHERE order_code = :code")
-        result = db.execute(check_query, {"code": order_code})
+        check_query = select(Order.id, Order.status, Order.waiter_id).where(Order.order_code == order_code)
+        result = db.execute(check_query)
         order_data = result.fetchone()
         
         if not order_data:
@@ -53,30 +56,23 @@ async def emergency_assign_order(
             }
         
         # Определяем новый статус
-        new_status = "confirmed" if current_status.lower() == "pending" else current_status
+        current_status = normalize_status_value(current_status)
+        new_status = OrderStatus.CONFIRMED.value if current_status == OrderStatus.PENDING.value else current_status
         
-        # Выполняем SQL запрос с LOCK TABLE
-        update_query = text("""
-        BEGIN;
-        LOCK TABLE orders IN EXCLUSIVE MODE;
-        UPDATE orders 
-        SET waiter_id = :waiter_id, 
-            status = :status, 
-            updated_at = NOW() 
-        WHERE id = :order_id;
-        COMMIT;
-        """)
+        # Обновляем заказ одним UPDATE (строка блокируется до конца транзакции в любой СУБД)
+        update_query = (
+            update(Order)
+            .where(Order.id == order_id)
+            .values(waiter_id=waiter_id, status=new_status, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
         
-        db.execute(update_query, {
-            "waiter_id": waiter_id,
-            "status": new_status,
-            "order_id": order_id
-        })
+        db.execute(update_query)
         db.commit()
         
         # Проверяем результат
-        verify_query = text("SELECT waiter_id FROM orders WHERE id = :order_id")
-        verify_result = db.execute(verify_query, {"order_id": order_id})
+        verify_query = select(Order.waiter_id).where(Order.id == order_id)
+        verify_result = db.execute(verify_query)
         verify_data = verify_result.fetchone()
         
         if verify_data and verify_data[0] == waiter_id:
@@ -94,13 +90,8 @@ async def emergency_assign_order(
             
             # Последняя отчаянная попытка
             try:
-                logger.warning("Экстренная попытка через RAW SQL")
-                raw_query = f"""
-                UPDATE orders
-                SET waiter_id = {waiter_id},
-                    updated_at = NOW()
-                WHERE id = {order_id}
-                """
+                logger.warning("Экстренная попытка повторного обновления")
+                raw_query = update(Order).where(Order.id == order_id).values(waiter_id=waiter_id, updated_at=func.now())
                 db.execute(raw_query)
                 db.commit()
                 
@@ -151,9 +142,15 @@ def normalize_status(status):
 
 @router.get("/orders", response_model=List[OrderResponse])
 async def get_waiter_orders(
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """
+    Получение заказов официанта (для администратора - всех заказов).
+    Параметр fields позволяет запросить только нужные поля (например, "id,status,table_number");
+    если позиции заказа не запрошены, блюда из БД не загружаются.
+    """
     try:
         logger.info(f"Получение заказов для пользователя ID: {current_user.id}, роль: {current_user.role}")
         
@@ -165,11 +162,13 @@ async def get_waiter_orders(
                 detail="Недостаточно прав для просмотра заказов"
             )
         
-        # Получаем заказы с помощью join
-        query = (
-            db.query(Order)
-            .options(joinedload(Order.order_dishes).joinedload(OrderDish.dish))
-        )
+        requested_fields = parse_fields(fields)
+        need_items = wants(requested_fields, "items")
+        
+        # Получаем заказы с помощью join (блюда подгружаем только если они нужны)
+        query = db.query(Order)
+        if need_items:
+            query = query.options(joinedload(Order.order_dishes).joinedload(OrderDish.dish))
         
         if current_user.role == "admin":
             orders = query.order_by(Order.created_at.desc()).all()
@@ -184,6 +183,7 @@ async def get_waiter_orders(
             logger.info(f"Заказы для пользователя {current_user.id} не найдены")
             return []
             
+        item_fields = nested_fields(requested_fields, "items")
         result = []
         for order in orders:
             try:
@@ -191,107 +191,106 @@ async def get_waiter_orders(
                 items = []
                 total_amount = 0
                 
-                logger.info(f"Обработка заказа ID:{order.id}, количество блюд: {len(order.order_dishes)}")
+                if not need_items:
+                    # Позиции не запрошены - берем сохраненную сумму заказа
+                    total_amount = float(order.total_amount or 0)
+                else:
+                    logger.info(f"Обработка заказа ID:{order.id}, количество блюд: {len(order.order_dishes)}")
                 
-                for order_dish in order.order_dishes:
-                    try:
-                        dish = order_dish.dish
-                        if not dish:
-                            logger.warning(f"Блюдо не найдено для order_dish.id={order_dish.id}")
-                            # Добавляем заглушку для удаленного блюда
-                            dish_item = {
-                                "id": order_dish.id,
-                                "dish_id": order_dish.dish_id,
-                                "name": f"Блюдо #{order_dish.dish_id} (удалено)",
-                                "dish_name": f"Блюдо #{order_dish.dish_id} (удалено)",
-                                "dish_image": "",
-                                "price": float(order_dish.price),
-                                "price_formatted": f"{float(order_dish.price)} ₸",
-                                "quantity": int(order_dish.quantity),
-                                "total_price": float(order_dish.price) * int(order_dish.quantity),
-                                "total_price_formatted": f"{float(order_dish.price) * int(order_dish.quantity)} ₸",
-                                "special_instructions": order_dish.special_instructions or "",
-                                "order_id": order.id
-                            }
-                        else:
-                            dish_price = float(order_dish.price)
+                    for order_dish in order.order_dishes:
+                        try:
+                            dish = order_dish.dish
+                            price = float(order_dish.price)
                             quantity = int(order_dish.quantity)
+                            item_total = price * quantity
+                            if not dish:
+                                logger.warning(f"Блюдо не найдено для order_dish.id={order_dish.id}")
+                                # Добавляем заглушку для удаленного блюда
+                                dish_name = f"Блюдо #{order_dish.dish_id} (удалено)"
+                                dish_item = build_fields({
+                                    "id": lambda: order_dish.id,
+                                    "dish_id": lambda: order_dish.dish_id,
+                                    "name": lambda: dish_name,
+                                    "dish_name": lambda: dish_name,
+                                    "dish_image": lambda: "",
+                                    "price": lambda: price,
+                                    "price_formatted": lambda: f"{price} ₸",
+                                    "quantity": lambda: quantity,
+                                    "total_price": lambda: item_total,
+                                    "total_price_formatted": lambda: f"{item_total} ₸",
+                                    "special_instructions": lambda: order_dish.special_instructions or "",
+                                    "order_id": lambda: order.id
+                                }, item_fields)
+                            else:
+                                # Рассчитываем стоимость заказа по позициям
+                                total_amount += item_total
                             
-                            # Рассчитываем стоимость позиции
-                            item_total = dish_price * quantity
-                            total_amount += item_total
-                            
-                            # Создаем позицию заказа
-                            dish_item = {
-                                "id": order_dish.id,
-                                "dish_id": dish.id,
-                                "name": dish.name,
-                                "dish_name": dish.name,
-                                "dish_image": dish.image_url or "",
-                                "price": dish_price,
-                                "price_formatted": f"{dish_price} ₸",
-                                "quantity": quantity,
-                                "total_price": item_total,
-                                "total_price_formatted": f"{item_total} ₸",
-                                "special_instructions": order_dish.special_instructions or "",
-                                "order_id": order.id,
-                                "description": dish.description or "",
-                                "category_id": dish.category_id
-                            }
+                                # Создаем позицию заказа
+                                dish_item = build_fields({
+                                    "id": lambda: order_dish.id,
+                                    "dish_id": lambda: dish.id,
+                                    "name": lambda: dish.name,
+                                    "dish_name": lambda: dish.name,
+                                    "dish_image": lambda: dish.image_url or "",
+                                    "price": lambda: price,
+                                    "price_formatted": lambda: f"{price} ₸",
+                                    "quantity": lambda: quantity,
+                                    "total_price": lambda: item_total,
+                                    "total_price_formatted": lambda: f"{item_total} ₸",
+                                    "special_instructions": lambda: order_dish.special_instructions or "",
+                                    "order_id": lambda: order.id,
+                                    "description": lambda: dish.description or "",
+                                    "category_id": lambda: dish.category_id
+                                }, item_fields)
                         
-                        items.append(dish_item)
-                        logger.debug(f"Добавлено блюдо {dish_item['name']} к заказу {order.id}")
-                    except Exception as e:
-                        logger.error(f"Ошибка при обработке блюда заказа {order.id}: {str(e)}")
-                        continue
+                            items.append(dish_item)
+                        except Exception as e:
+                            logger.error(f"Ошибка при обработке блюда заказа {order.id}: {str(e)}")
+                            continue
                 
-                # Если сумма в БД отличается от рассчитанной, обновляем её
-                if not order.total_amount or abs(order.total_amount - total_amount) > 0.01:
-                    try:
-                        db.query(Order).filter(Order.id == order.id).update({"total_amount": total_amount})
-                        db.commit()
-                        logger.info(f"Обновлена сумма заказа ID:{order.id} в БД: {total_amount}")
-                    except Exception as e:
-                        logger.error(f"Ошибка при обновлении суммы заказа ID:{order.id}: {str(e)}")
+                    # Если сумма в БД отличается от рассчитанной, обновляем её
+                    if not order.total_amount or abs(order.total_amount - total_amount) > 0.01:
+                        try:
+                            db.query(Order).filter(Order.id == order.id).update({"total_amount": total_amount})
+                            db.commit()
+                            logger.info(f"Обновлена сумма заказа ID:{order.id} в БД: {total_amount}")
+                        except Exception as e:
+                            logger.error(f"Ошибка при обновлении суммы заказа ID:{order.id}: {str(e)}")
                 
-                # Нормализуем статусы
-                status = normalize_status(order.status)
-                payment_status = str(order.payment_status).lower() if order.payment_status else "pending"
-                payment_method = str(order.payment_method).lower() if order.payment_method else None
-                
-                # Формируем данные заказа
-                order_data = {
-                    "id": order.id,
-                    "table_number": order.table_number or 0,
-                    "status": status,
-                    "order_status": status,
-                    "payment_status": payment_status,
-                    "payment_method": payment_method,
-                    "waiter_id": order.waiter_id,
-                    "user_id": order.user_id,
-                    "created_at": order.created_at,
-                    "updated_at": order.updated_at,
-                    "completed_at": order.completed_at,
-                    "items": items,
-                    "total": total_amount,
-                    "total_price": total_amount,
-                    "total_amount": total_amount,
-                    "total_sum": total_amount,
-                    "total_formatted": f"{total_amount} ₸",
-                    "total_price_formatted": f"{total_amount} ₸",
-                    "total_amount_formatted": f"{total_amount} ₸",
-                    "total_sum_formatted": f"{total_amount} ₸",
-                    "customer_name": order.customer_name or "Клиент",
-                    "customer_phone": order.customer_phone or "",
-                    "name": order.customer_name or "Клиент",
-                    "phone": order.customer_phone or "",
-                    "order_type": "dine-in",
-                    "comment": order.comment,
-                    "is_urgent": order.is_urgent,
-                    "is_group_order": order.is_group_order,
-                    "reservation_code": order.reservation_code,
-                    "order_code": order.order_code
-                }
+                # Формируем данные заказа: вычисляются только запрошенные поля
+                total_formatted = lambda: f"{total_amount} ₸"
+                order_data = build_fields({
+                    "id": lambda: order.id,
+                    "table_number": lambda: order.table_number or 0,
+                    "status": lambda: normalize_status(order.status),
+                    "order_status": lambda: normalize_status(order.status),
+                    "payment_status": lambda: str(order.payment_status).lower() if order.payment_status else "pending",
+                    "payment_method": lambda: str(order.payment_method).lower() if order.payment_method else None,
+                    "waiter_id": lambda: order.waiter_id,
+                    "user_id": lambda: order.user_id,
+                    "created_at": lambda: order.created_at,
+                    "updated_at": lambda: order.updated_at,
+                    "completed_at": lambda: order.completed_at,
+                    "items": lambda: items,
+                    "total": lambda: total_amount,
+                    "total_price": lambda: total_amount,
+                    "total_amount": lambda: total_amount,
+                    "total_sum": lambda: total_amount,
+                    "total_formatted": total_formatted,
+                    "total_price_formatted": total_formatted,
+                    "total_amount_formatted": total_formatted,
+                    "total_sum_formatted": total_formatted,
+                    "customer_name": lambda: order.customer_name or "Клиент",
+                    "customer_phone": lambda: order.customer_phone or "",
+                    "name": lambda: order.customer_name or "Клиент",
+                    "phone": lambda: order.customer_phone or "",
+                    "order_type": lambda: "dine-in",
+                    "comment": lambda: order.comment,
+                    "is_urgent": lambda: order.is_urgent,
+                    "is_group_order": lambda: order.is_group_order,
+                    "reservation_code": lambda: order.reservation_code,
+                    "order_code": lambda: order.order_code
+                }, requested_fields)
                 result.append(order_data)
                 logger.info(f"Заказ ID:{order.id} успешно обработан, блюд: {len(items)}")
             except Exception as e:
@@ -299,6 +298,9 @@ async def get_waiter_orders(
                 continue
             
         logger.info(f"Успешно получено {len(result)} заказов для пользователя {current_user.id}")
+        if requested_fields:
+            # Частичный ответ не проходит валидацию по полной схеме OrderResponse
+            return JSONResponse(content=jsonable_encoder(result))
         return result
         
     except Exception as e:
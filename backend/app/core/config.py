@@ -52,12 +52,30 @@ class Settings(BaseSettings):
     # Окружение (development, staging, production)
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "production")
     
-    # SQLite
+    # База данных: по умолчанию файл SQLite, DATABASE_URL=postgresql://... - PostgreSQL
+    # (нужен драйвер psycopg2); название настройки сохранено для совместимости
     SQLITE_DATABASE_URI: str = os.getenv(
         "DATABASE_URL",
         f"sqlite:///{Path(__file__).parent.parent.parent}/data/restaurant.db"
     )
-    
+    # Профиль настроек SQLite: durable (надежность, по умолчанию), balanced или throughput
+    # (см. SQLITE_PROFILES в app/database/session.py)
+    SQLITE_PROFILE: str = os.getenv("SQLITE_PROFILE", "durable")
+    # Проверка целостности SQLite при запуске: off, quick (PRAGMA quick_check) или full
+    # (PRAGMA integrity_check, читает весь файл); выполняется в фоне после старта сервера
+    DB_INTEGRITY_CHECK: str = os.getenv("DB_INTEGRITY_CHECK", "off")
+    # Пул соединений одного процесса для PostgreSQL и других серверных СУБД (для SQLite не используется);
+    # пулов два - основной и только для чтения, поэтому на сервере нужно не меньше
+    # WORKERS_COUNT * 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) соединений (max_connections)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 5))
+    # Очередь записи с групповой фиксацией (app.services.write_queue): создание заказов и смены
+    # статусов выполняет один поток-писатель, объединяя до WRITE_QUEUE_MAX_BATCH операций
+    # в одну транзакцию; перед фиксацией он ждет новые операции до WRITE_QUEUE_MAX_WAIT_MS мс
+    WRITE_QUEUE_ENABLED: bool = os.getenv("WRITE_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+    WRITE_QUEUE_MAX_BATCH: int = int(os.getenv("WRITE_QUEUE_MAX_BATCH", 64))
+    WRITE_QUEUE_MAX_WAIT_MS: float = float(os.getenv("WRITE_QUEUE_MAX_WAIT_MS", 2))
+
     # Redis (для очередей и кэширования)
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
@@ -65,8 +83,57 @@ class Settings(BaseSettings):
     # Настройки сервера
     SERVER_PORT: int = int(os.getenv("PORT", 8000))
     DEBUG: bool = False
-    WORKERS_COUNT: int = 1  # Уменьшаем количество воркеров для Railway
+    # Количество процессов-воркеров; при значении больше 1 включается межпроцессная синхронизация
+    # (app.core.process_sync): разовая подготовка БД под файловой блокировкой, общие версии кэшей
+    WORKERS_COUNT: int = int(os.getenv("WORKERS_COUNT", 1))  # По умолчанию 1 воркер для Railway
+    
+    # Idempotency-Key: время хранения ответов (в секундах) и период очистки устаревших ключей
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", 24 * 60 * 60))
+    IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS: int = 10 * 60
+    # Сколько секунд ключ без сохраненного ответа считается занятым выполняющимся запросом;
+    # после этого запись считается брошенной (процесс упал) и ключ может занять новый запрос
+    IDEMPOTENCY_LEASE_SECONDS: int = int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", 5 * 60))
+    
+    # Коды заказов: сколько свободных кодов добавлять в пул при его исчерпании
+    ORDER_CODE_POOL_REFILL_SIZE: int = 1000
+    # Срок действия неиспользованного кода и параметры фоновой очистки устаревших кодов
+    ORDER_CODE_TTL_SECONDS: int = int(os.getenv("ORDER_CODE_TTL_SECONDS", 12 * 60 * 60))
+    ORDER_CODE_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("ORDER_CODE_SWEEP_INTERVAL_SECONDS", 10 * 60))
+    ORDER_CODE_SWEEP_BATCH_SIZE: int = 500
     
+    # Бронирования: длительность одной брони стола (в минутах)
+    RESERVATION_DURATION_MINUTES: int = int(os.getenv("RESERVATION_DURATION_MINUTES", 120))
+    # Лист ожидания: сколько гости проводят за столом после подачи блюд (в минутах)
+    WAITLIST_DINING_MINUTES: int = 45
+    # Планировщик бронирований: период запуска, размер пакета, через сколько минут после
+    # начала брони она считается неявкой, за сколько минут до брони отправляется напоминание
+    RESERVATION_SCHEDULER_INTERVAL_SECONDS: int = int(os.getenv("RESERVATION_SCHEDULER_INTERVAL_SECONDS", 60))
+    RESERVATION_SCHEDULER_BATCH_SIZE: int = 200
+    RESERVATION_NO_SHOW_GRACE_MINUTES: int = int(os.getenv("RESERVATION_NO_SHOW_GRACE_MINUTES", 30))
+    RESERVATION_NO_SHOW_LOOKBACK_HOURS: int = 24
+    RESERVATION_REMINDER_MINUTES: int = int(os.getenv("RESERVATION_REMINDER_MINUTES", 120))
+    
+    # Обслуживание SQLite: период запуска, сколько секунд без фиксаций считается затишьем
+    # (тогда выполняются wal_checkpoint(TRUNCATE) и incremental_vacuum) и шаг освобождения страниц
+    DB_MAINTENANCE_INTERVAL_SECONDS: int = int(os.getenv("DB_MAINTENANCE_INTERVAL_SECONDS", 60))
+    DB_MAINTENANCE_QUIET_SECONDS: int = int(os.getenv("DB_MAINTENANCE_QUIET_SECONDS", 5))
+    DB_INCREMENTAL_VACUUM_PAGES: int = 256
+
+    # Архив заказов (только SQLite): закрытые больше ORDER_ARCHIVE_AFTER_DAYS дней назад заказы
+    # переносятся в месячные файлы data/archive/orders_YYYY_MM.db пакетами по ORDER_ARCHIVE_BATCH_SIZE;
+    # 0 - архивация отключена
+    ORDER_ARCHIVE_AFTER_DAYS: int = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", 90))
+    ORDER_ARCHIVE_INTERVAL_SECONDS: int = int(os.getenv("ORDER_ARCHIVE_INTERVAL_SECONDS", 60 * 60))
+    ORDER_ARCHIVE_BATCH_SIZE: int = 500
+
+    # Резервные копии SQLite (app.services.db_backup): снимок раз в DB_BACKUP_INTERVAL_SECONDS
+    # (0 - отключено) в data/backups, хранятся последние DB_BACKUP_RETENTION снимков;
+    # копирование идет шагами по DB_BACKUP_PAGES_PER_STEP страниц с паузой DB_BACKUP_STEP_SLEEP_MS мс
+    DB_BACKUP_INTERVAL_SECONDS: int = int(os.getenv("DB_BACKUP_INTERVAL_SECONDS", 24 * 60 * 60))
+    DB_BACKUP_RETENTION: int = int(os.getenv("DB_BACKUP_RETENTION", 7))
+    DB_BACKUP_PAGES_PER_STEP: int = int(os.getenv("DB_BACKUP_PAGES_PER_STEP", 256))
+    DB_BACKUP_STEP_SLEEP_MS: float = float(os.getenv("DB_BACKUP_STEP_SLEEP_MS", 5))
+
     # Настройки пользователей
     FIRST_SUPERUSER: str = "admin1@example.com"
     FIRST_SUPERUSER_PASSWORD: str = "admin123"
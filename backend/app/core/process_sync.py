@@ -0,0 +1,161 @@
+"""
+Синхронизация между процессами-воркерами.
+
+При запуске нескольких воркеров (WORKERS_COUNT > 1) у каждого процесса свои кэши в памяти
+(настройки ресторана, индекс доступности столов, состояние столов листа ожидания).
+Здесь собраны примитивы, через которые процессы договариваются между собой без
+дополнительных сервисов - через файлы рядом с базой данных:
+
+- InterProcessLock - файловая блокировка (flock, на Windows - msvcrt.locking):
+  разовая подготовка БД, выбор воркера для фоновых задач;
+- SharedLock - блокировка потоков процесса, дополненная файловой блокировкой:
+  связка "проверка - запись" в одном процессе и между процессами;
+- SharedVersion - общий счетчик версии кэша: процесс, изменивший данные, увеличивает
+  его, остальные при следующем обращении к кэшу видят новую версию и перечитывают данные.
+
+В режиме одного воркера межпроцессные части отключены и ничего не стоят.
+"""
+from pathlib import Path
+from typing import Optional
+import os
+import threading
+import time
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Межпроцессная синхронизация нужна только при нескольких воркерах
+MULTI_WORKER = settings.WORKERS_COUNT > 1
+
+# Каталог файлов блокировок и версий - рядом с файлом базы SQLite, для серверной СУБД -
+# в каталоге data приложения (воркеры одного сервера)
+if settings.SQLITE_DATABASE_URI.startswith("sqlite:///"):
+    SYNC_DIR = Path(settings.SQLITE_DATABASE_URI.replace("sqlite:///", "")).parent / ".sync"
+else:
+    SYNC_DIR = Path(__file__).resolve().parent.parent.parent / "data" / ".sync"
+
+
+class InterProcessLock:
+    """Файловая блокировка SYNC_DIR/<name>.lock (не реентерабельная)"""
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.path = SYNC_DIR / f"{name}.lock"
+        self.enabled = enabled
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Захватывает блокировку; при blocking=False возвращает False, если она занята другим процессом"""
+        if not self.enabled or self._fd is not None:
+            return True
+        SYNC_DIR.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise
+                        time.sleep(0.05)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> "InterProcessLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class SharedLock:
+    """
+    Реентерабельная блокировка потоков (как threading.RLock), которая при нескольких воркерах
+    на время внешнего захвата дополнительно держит файловую блокировку.
+    """
+
+    def __init__(self, name: str):
+        self._thread_lock = threading.RLock()
+        self._file_lock = InterProcessLock(name, enabled=MULTI_WORKER)
+        self._depth = 0
+
+    def __enter__(self) -> "SharedLock":
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            self._file_lock.acquire()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._file_lock.release()
+        self._thread_lock.release()
+
+
+class SharedVersion:
+    """Общий для воркеров счетчик версии данных кэша (файл SYNC_DIR/<name>.version)"""
+
+    def __init__(self, name: str):
+        self.path = SYNC_DIR / f"{name}.version"
+        self.enabled = MULTI_WORKER
+        self._lock = SharedLock(f"{name}.version")
+        self._seen = self._read()
+
+    def _read(self) -> int:
+        if not self.enabled:
+            return 0
+        try:
+            return int(self.path.read_text() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def changed(self) -> bool:
+        """Изменил ли другой воркер данные с момента последней проверки"""
+        if not self.enabled:
+            return False
+        version = self._read()
+        if version == self._seen:
+            return False
+        self._seen = version
+        return True
+
+    def bump(self) -> None:
+        """Сообщает остальным воркерам, что данные изменились"""
+        if not self.enabled:
+            return
+        with self._lock:
+            version = self._read() + 1
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(str(version))
+            os.replace(tmp_path, self.path)
+            self._seen = version
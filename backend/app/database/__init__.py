@@ -1,6 +1,6 @@
 """
 Database configuration and session management
 """
-from app.database.session import Base, engine, get_db
+from app.database.session import Base, engine, get_db, get_read_db, read_engine
 
-__all__ = ["Base", "engine", "get_db"] 
\ No newline at end of file
+__all__ = ["Base", "engine", "get_db", "get_read_db", "read_engine"] 
\ No newline at end of file
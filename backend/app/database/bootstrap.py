@@ -0,0 +1,200 @@
+"""
+Подготовка базы данных при запуске приложения.
+
+Подготовка вызывается из lifespan-обработчика приложения (app.main), а не при импорте модуля.
+Версия схемы - отпечаток таблиц, колонок и индексов моделей, списков ADDED_COLUMNS /
+ADDED_INDEXES и BOOTSTRAP_REVISION - хранится в PRAGMA user_version (в PostgreSQL и других
+СУБД - в служебной таблице schema_state). Если она совпадает
+с текущей, создание таблиц, дополнение схемы и разовые исправления данных пропускаются,
+и время запуска не зависит от размера базы.
+
+Проверка целостности SQLite (PRAGMA quick_check / integrity_check) читает весь файл базы,
+поэтому включается настройкой DB_INTEGRITY_CHECK и выполняется в фоне.
+"""
+from typing import Callable, List, Optional, Tuple
+import logging
+import zlib
+
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.init_db import init_db
+from app.core.process_sync import InterProcessLock
+from app.database.schema import ADDED_COLUMNS, ADDED_INDEXES
+from app.database.session import IS_SQLITE, Base, SessionLocal, create_tables, engine
+import app.models  # noqa: F401 - регистрируем все модели в Base.metadata
+
+logger = logging.getLogger(__name__)
+
+# Увеличивается при добавлении нового разового шага подготовки данных,
+# чтобы он выполнился на уже подготовленных базах
+BOOTSTRAP_REVISION = 2
+
+# Версия схемы вне SQLite; таблица не входит в Base.metadata и в отпечаток схемы
+schema_state = Table(
+    "schema_state", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
+INTEGRITY_PRAGMAS = {
+    "quick": "PRAGMA quick_check",
+    "full": "PRAGMA integrity_check",
+}
+
+
+def _data_fixes() -> List[Tuple[str, Callable[[Session], object]]]:
+    """Разовые исправления данных, выполняемые после создания таблиц"""
+    from app.services.order import (
+        backfill_order_line_items, fix_payment_method_case, normalize_order_statuses
+    )
+    from app.services.tables import seed_tables_from_settings
+    from app.services.db_maintenance import enable_incremental_vacuum
+    from app.services.dashboard import refresh_counters
+    from app.services.order_code import clear_closed_order_codes
+
+    return [
+        # Исправляем значения payment_method
+        ("исправление payment_method", fix_payment_method_case),
+        # Приводим статусы заказов к каноническому виду (пакетами)
+        ("нормализация статусов заказов", normalize_order_statuses),
+        # Переносим позиции заказов в единую таблицу order_dish (пакетами)
+        ("перенос позиций заказов", backfill_order_line_items),
+        # Снимаем с закрытых заказов коды, уже возвращенные в пул
+        ("очистка кодов закрытых заказов", clear_closed_order_codes),
+        # Переносим столы из JSON настроек в таблицу restaurant_tables
+        ("перенос столов", seed_tables_from_settings),
+        # Переводим базу в auto_vacuum=INCREMENTAL (однократный VACUUM)
+        ("перевод в auto_vacuum=INCREMENTAL", enable_incremental_vacuum),
+        # Пересчитываем счетчики панели администратора после исправлений данных
+        ("пересчет счетчиков панели администратора", refresh_counters),
+    ]
+
+
+def schema_fingerprint() -> int:
+    """Отпечаток ожидаемой схемы, помещающийся в PRAGMA user_version (32-битное знаковое целое)"""
+    parts = [f"revision={BOOTSTRAP_REVISION}"]
+    for table in sorted(Base.metadata.tables.values(), key=lambda table: table.name):
+        columns = ",".join(sorted(column.name for column in table.columns))
+        indexes = ",".join(sorted(index.name for index in table.indexes if index.name))
+        parts.append(f"{table.name}({columns})[{indexes}]")
+    parts.extend(f"{table}.{column}" for table, column, _ in ADDED_COLUMNS)
+    parts.extend(index_name for index_name, _, _ in ADDED_INDEXES)
+    return zlib.crc32("|".join(parts).encode("utf-8")) & 0x7FFFFFFF
+
+
+def get_schema_version() -> int:
+    with engine.connect() as conn:
+        if IS_SQLITE:
+            return conn.execute(text("PRAGMA user_version")).scalar() or 0
+        if not inspect(conn).has_table(schema_state.name):
+            return 0
+        return conn.execute(select(schema_state.c.version).where(schema_state.c.id == 1)).scalar() or 0
+
+
+def set_schema_version(version: int) -> None:
+    with engine.begin() as conn:
+        if IS_SQLITE:
+            conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+            return
+        schema_state.create(conn, checkfirst=True)
+        updated = conn.execute(
+            update(schema_state).where(schema_state.c.id == 1).values(version=version)
+        ).rowcount
+        if not updated:
+            conn.execute(schema_state.insert().values(id=1, version=version))
+
+
+def _prepare_database(version: int) -> None:
+    """Полная подготовка базы; версия схемы записывается только после успешного выполнения всех шагов"""
+    logger.info("Версия схемы БД изменилась, выполняем подготовку базы данных...")
+    succeeded = True
+    try:
+        create_tables()
+        logger.info("Таблицы успешно созданы")
+    except Exception as e:
+        succeeded = False
+        logger.error(f"Ошибка при создании таблиц: {e}")
+
+    db = SessionLocal()
+    try:
+        try:
+            init_db(db)
+        except Exception as e:
+            succeeded = False
+            db.rollback()
+            logger.error(f"Ошибка при инициализации базы данных: {e}")
+
+        for name, fix in _data_fixes():
+            try:
+                fix(db)
+            except Exception as e:
+                succeeded = False
+                db.rollback()
+                logger.error(f"Ошибка на шаге «{name}»: {e}")
+    finally:
+        db.close()
+
+    # Версию записываем только после успешной подготовки - иначе шаги повторятся при следующем запуске
+    if succeeded:
+        set_schema_version(version)
+        logger.info(f"Подготовка базы данных завершена, версия схемы {version}")
+
+
+def bootstrap_database(force: bool = False) -> bool:
+    """
+    Готовит базу к работе: создание таблиц и дополнение схемы, администратор и тестовые данные,
+    разовые исправления данных. Шаги пропускаются, если версия схемы в базе совпадает с текущей.
+    Кэш настроек ресторана загружается в любом случае.
+
+    Returns:
+        True, если выполнялась полная подготовка
+    """
+    expected = schema_fingerprint()
+    full = force or get_schema_version() != expected
+
+    if full:
+        # Воркеры запускаются одновременно: подготовку выполняет первый захвативший блокировку,
+        # остальные ждут и перепроверяют версию схемы
+        with InterProcessLock("bootstrap"):
+            full = force or get_schema_version() != expected
+            if full:
+                _prepare_database(expected)
+    else:
+        logger.info("Схема БД не изменилась, подготовка базы данных пропущена")
+
+    db = SessionLocal()
+    try:
+        from app.services.settings_cache import settings_cache
+        settings_cache.load(db)
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке настроек в кэш: {e}")
+    finally:
+        db.close()
+
+    return full
+
+
+def run_integrity_check(mode: Optional[str] = None) -> Optional[str]:
+    """
+    Проверка целостности SQLite: mode "quick" или "full" (по умолчанию DB_INTEGRITY_CHECK).
+
+    Returns:
+        Результат проверки ("ok" или описание ошибок) или None, если проверка выключена
+        или база не SQLite
+    """
+    pragma = INTEGRITY_PRAGMAS.get((mode or settings.DB_INTEGRITY_CHECK).lower())
+    if pragma is None:
+        return None
+    if not IS_SQLITE:
+        logger.info("Проверка целостности выполняется только для SQLite, пропущена")
+        return None
+    with engine.connect() as conn:
+        rows = conn.execute(text(pragma)).scalars().all()
+    result = "\n".join(str(row) for row in rows)
+    if result == "ok":
+        logger.info(f"Проверка целостности базы данных ({pragma}): ok")
+    else:
+        logger.error(f"Проверка целостности базы данных ({pragma}) обнаружила ошибки: {result}")
+    return result
@@ -0,0 +1,69 @@
+"""
+Дополнение схемы существующей БД.
+
+Base.metadata.create_all создает только отсутствующие таблицы и не добавляет
+новые колонки и индексы в уже существующие. Колонки и индексы, появившиеся
+в моделях позже, перечислены здесь и добавляются при запуске
+(дублируют миграции из migrations/versions).
+"""
+from typing import List, Tuple
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# (таблица, колонка, DDL-описание колонки; типы, понятные и SQLite, и PostgreSQL)
+ADDED_COLUMNS: List[Tuple[str, str, str]] = [
+    ("orders", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("order_dish", "dish_name", "VARCHAR"),
+    ("order_dish", "category_id", "INTEGER"),
+    ("order_dish", "cost_price", "FLOAT"),
+    ("reservations", "reminder_sent_at", "TIMESTAMP"),
+]
+
+# (имя индекса, таблица, колонки) - индексы, добавленные в модели после создания таблиц
+ADDED_INDEXES: List[Tuple[str, str, str]] = [
+    ("ix_orders_status", "orders", "status"),
+    ("ix_orders_payment_status", "orders", "payment_status"),
+    ("ix_order_dish_order_id", "order_dish", "order_id"),
+    ("ix_order_codes_is_used_created_at", "order_codes", "is_used, created_at"),
+    ("ix_reservations_time_status", "reservations", "reservation_time, status"),
+    ("ix_orders_order_code", "orders", "order_code"),
+]
+
+
+def upgrade_schema(engine: Engine) -> int:
+    """
+    Добавляет недостающие колонки и индексы в существующие таблицы.
+
+    Returns:
+        Количество выполненных изменений схемы
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    changes = 0
+
+    with engine.begin() as conn:
+        for table, column, ddl in ADDED_COLUMNS:
+            if table not in tables:
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table)}
+            if column in existing:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            logger.info(f"Добавлена колонка {table}.{column}")
+            changes += 1
+
+        for index_name, table, columns in ADDED_INDEXES:
+            if table not in tables:
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table)}
+            if index_name in existing:
+                continue
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({columns})"))
+            logger.info(f"Создан индекс {index_name}")
+            changes += 1
+
+    return changes
@@ -1,57 +1,188 @@
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from pathlib import Path
+from typing import Callable
+import logging
+import os
 
 from app.core.config import settings
 
-# Создаем директорию для базы данных, если она не существует
-db_path = Path(settings.SQLITE_DATABASE_URI.replace("sqlite:///", "")).parent
-db_path.mkdir(parents=True, exist_ok=True)
+logger = logging.getLogger(__name__)
 
-# Создаем движок SQLAlchemy для SQLite с оптимизированными настройками
-engine = create_engine(
-    settings.SQLITE_DATABASE_URI,
-    connect_args={
-        "check_same_thread": False,  # Разрешаем доступ из разных потоков
-        "timeout": 30,               # Таймаут для ожидания блокировки
+# Профили настроек SQLite (выбираются настройкой SQLITE_PROFILE):
+# - durable: прежнее поведение - fsync при каждой фиксации (synchronous=FULL), затирание
+#   удаленных данных, без отображения файла в память;
+# - balanced: synchronous=NORMAL - в режиме WAL база не повреждается при сбое, но при
+#   отключении питания могут пропасть последние зафиксированные транзакции; mmap 256 МБ,
+#   временные таблицы в памяти;
+# - throughput: synchronous=OFF (при сбое ОС или питания возможна потеря и повреждение данных,
+#   падение самого приложения безопасно), большой кэш и mmap, редкие контрольные точки WAL.
+SQLITE_PROFILES = {
+    "durable": {
+        "synchronous": "FULL",
+        "secure_delete": "ON",
+        "cache_size": -20000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "wal_autocheckpoint": 1000,
     },
-    # Настройки пула соединений
-    pool_size=5,                    # Уменьшаем размер пула для Railway
-    max_overflow=10,                # Разрешаем дополнительные соединения при перегрузке
-    pool_timeout=30,                # Таймаут ожидания соединения из пула
-    pool_recycle=1800,              # Пересоздаем соединения каждые 30 минут
-    pool_pre_ping=True,             # Проверяем соединение перед использованием
-)
+    "balanced": {
+        "synchronous": "NORMAL",
+        "secure_delete": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 1000,
+    },
+    "throughput": {
+        "synchronous": "OFF",
+        "secure_delete": "OFF",
+        "cache_size": -256000,
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 10000,
+    },
+}
 
-# Оптимизируем SQLite через события подключения
-@event.listens_for(engine, "connect")
-def optimize_sqlite_connection(dbapi_connection, connection_record):
+DEFAULT_SQLITE_PROFILE = "durable"
+
+
+def apply_sqlite_profile(dbapi_connection, profile: str) -> None:
+    """Применяет к соединению общие настройки и PRAGMA выбранного профиля"""
     # Включаем журнал упреждающей записи (WAL) для поддержки параллельного чтения и записи
     dbapi_connection.execute("PRAGMA journal_mode=WAL")
     
-    # Улучшаем надежность за счет производительности
-    dbapi_connection.execute("PRAGMA synchronous=FULL")
-    
     # Включаем внешние ключи
     dbapi_connection.execute("PRAGMA foreign_keys=ON")
     
     # Увеличиваем таймаут для транзакций
     dbapi_connection.execute("PRAGMA busy_timeout=10000")
     
-    # Включаем строгий режим
-    dbapi_connection.execute("PRAGMA strict=ON")
+    # Место после удалений освобождается пошагово фоновым обслуживанием (app.services.db_maintenance).
+    # Действует для новых файлов базы; существующие переводятся один раз при подготовке базы
+    dbapi_connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
     
-    # Настройка кэша
-    dbapi_connection.execute("PRAGMA cache_size=-20000")
-    
-    # Включаем защиту от повреждения данных
-    dbapi_connection.execute("PRAGMA secure_delete=ON")
-    
-    # Ограничиваем размер БД (100 MB)
-    dbapi_connection.execute("PRAGMA max_page_count=25000")
-    
-    print("[DB] SQLite оптимизация выполнена")
+    for pragma, value in SQLITE_PROFILES[profile].items():
+        dbapi_connection.execute(f"PRAGMA {pragma}={value}")
+
+
+sqlite_profile = settings.SQLITE_PROFILE.lower()
+if sqlite_profile not in SQLITE_PROFILES:
+    print(f"[DB] Неизвестный профиль SQLite «{settings.SQLITE_PROFILE}», используется {DEFAULT_SQLITE_PROFILE}")
+    sqlite_profile = DEFAULT_SQLITE_PROFILE
+
+
+def normalize_database_url(url: str) -> str:
+    """Приводит URL базы к виду, понятному SQLAlchemy (Railway и Heroku выдают postgres://)"""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+DATABASE_URL = normalize_database_url(settings.SQLITE_DATABASE_URI)
+# SQLite - файл рядом с приложением и один писатель; другие СУБД (PostgreSQL) - сетевой сервер
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+
+# PRAGMA профиля, влияющие на чтение (synchronous, auto_vacuum и контрольные точки
+# относятся только к записи)
+READ_PRAGMAS = ("cache_size", "mmap_size", "temp_store")
+
+
+def optimize_sqlite_connection(dbapi_connection, connection_record):
+    apply_sqlite_profile(dbapi_connection, sqlite_profile)
+    print(f"[DB] SQLite оптимизация выполнена (профиль {sqlite_profile})")
+
+
+def configure_read_connection(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA query_only=ON")
+    dbapi_connection.execute("PRAGMA busy_timeout=10000")
+    for pragma in READ_PRAGMAS:
+        dbapi_connection.execute(f"PRAGMA {pragma}={SQLITE_PROFILES[sqlite_profile][pragma]}")
+
+
+def create_database_engine(url: str, read_only: bool = False) -> Engine:
+    """
+    Создает движок SQLAlchemy для URL базы данных.
+
+    SQLite: соединения доступны из разных потоков, PRAGMA профиля SQLITE_PROFILE; движок только
+    для чтения открывает файл с mode=ro и включает query_only. Размер пула невелик: запись
+    в SQLite все равно выполняется по одной транзакции.
+
+    Другие СУБД (PostgreSQL): пул DB_POOL_SIZE + DB_MAX_OVERFLOW соединений на процесс,
+    движок только для чтения открывает транзакции в режиме READ ONLY.
+    """
+    url = make_url(normalize_database_url(url))
+
+    if url.get_backend_name() == "sqlite":
+        # Создаем директорию для базы данных, если она не существует
+        database = Path(url.database).resolve()
+        database.parent.mkdir(parents=True, exist_ok=True)
+        if read_only:
+            url = make_url(f"sqlite:///file:{database.as_posix()}?mode=ro&uri=true")
+
+        engine = create_engine(
+            url,
+            connect_args={
+                "check_same_thread": False,  # Разрешаем доступ из разных потоков
+                "timeout": 30,               # Таймаут для ожидания блокировки
+            },
+            # Настройки пула соединений
+            pool_size=5,                    # Уменьшаем размер пула для Railway
+            max_overflow=10,                # Разрешаем дополнительные соединения при перегрузке
+            pool_timeout=30,                # Таймаут ожидания соединения из пула
+            pool_recycle=1800,              # Пересоздаем соединения каждые 30 минут
+            pool_pre_ping=True,             # Проверяем соединение перед использованием
+        )
+        event.listen(engine, "connect", configure_read_connection if read_only else optimize_sqlite_connection)
+        return engine
+
+    connect_args = {}
+    if read_only and url.get_backend_name() == "postgresql":
+        # Все транзакции соединения - только для чтения (параметр libpq, не зависит от драйвера)
+        connect_args["options"] = "-c default_transaction_read_only=on"
+
+    return create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        # Последнее возвращенное соединение выдается первым: лишние простаивают и закрываются сервером
+        pool_use_lifo=True,
+    )
+
+
+# Основной движок (запись и короткие запросы)
+engine = create_database_engine(DATABASE_URL)
+
+# Отдельный движок только для чтения (аналитика, отчеты, списки) со своим пулом:
+# долгие отчеты не занимают соединения пула записи, и заказы не ждут их освобождения.
+# В SQLite файл открывается с mode=ro, а PRAGMA query_only=ON запрещает запись и на уровне
+# соединения; в режиме WAL читатели не блокируют писателя и видят последнее зафиксированное
+# состояние. В PostgreSQL транзакции этого движка открываются в режиме READ ONLY.
+read_engine = create_database_engine(DATABASE_URL, read_only=True)
+
+
+def insert_ignore(table):
+    """INSERT ... ON CONFLICT DO NOTHING: строки с уже существующим ключом пропускаются"""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table).on_conflict_do_nothing()
+
+# Каждый воркер работает со своими соединениями: если процесс порожден через fork
+# (gunicorn --preload и т.п.), унаследованный от родителя пул не используется
+def _reset_pool_after_fork():
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
 
 # Создаем фабрику сессий
 SessionLocal = sessionmaker(
@@ -61,6 +192,36 @@ SessionLocal = sessionmaker(
     expire_on_commit=False  # Предотвращаем автоматическое устаревание объектов
 )
 
+
+def run_after_commit(db, callback: Callable[[], None]) -> None:
+    """
+    Откладывает действие над состоянием в памяти процесса (лист ожидания и т.п.) до фиксации
+    транзакции сессии db. При откате, в том числе пакета очереди записи, действие отбрасывается:
+    иначе память процесса разошлась бы с базой.
+    """
+    db.info.setdefault("after_commit", []).append(callback)
+
+@event.listens_for(SessionLocal, "after_commit")
+def _run_after_commit(session):
+    for callback in session.info.pop("after_commit", []):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Ошибка действия после фиксации транзакции: {e}")
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_after_commit(session):
+    session.info.pop("after_commit", None)
+
+# Фабрика сессий только для чтения; попытка записи завершается ошибкой
+# "attempt to write a readonly database"
+ReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine,
+    expire_on_commit=False
+)
+
 # Базовый класс для создания моделей
 Base = declarative_base()
 
@@ -68,18 +229,19 @@ Base = declarative_base()
 def create_tables():
     Base.metadata.create_all(bind=engine)
     
-    # Проверяем состояние базы данных
+    # Добавляем в существующие таблицы колонки, появившиеся после их создания
+    from app.database.schema import upgrade_schema
+    upgrade_schema(engine)
+    
+    if not IS_SQLITE:
+        return
+    
+    # Режимы журнала и синхронизации (проверка целостности - app.database.bootstrap.run_integrity_check)
     with engine.connect() as conn:
-        result = conn.execute("PRAGMA integrity_check")
-        integrity = result.scalar()
-        print(f"[DB] Проверка целостности базы данных: {integrity}")
-        
-        result = conn.execute("PRAGMA journal_mode")
-        journal_mode = result.scalar()
+        journal_mode = conn.execute(text("PRAGMA journal_mode")).scalar()
         print(f"[DB] Режим журнала: {journal_mode}")
         
-        result = conn.execute("PRAGMA synchronous")
-        sync_mode = result.scalar()
+        sync_mode = conn.execute(text("PRAGMA synchronous")).scalar()
         print(f"[DB] Режим синхронизации: {sync_mode}")
 
 # Функция для очистки и пересоздания схемы БД
@@ -93,4 +255,12 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close() 
+
+# Функция-зависимость для получения сессии только для чтения (аналитика, отчеты, списки)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
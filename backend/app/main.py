@@ -5,56 +5,119 @@ from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 import logging
 import os
+import hashlib
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import Depends
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import text
+from sqlalchemy import func, select, update
 
 from app.api.v1 import api_router
 from app.core.config import settings
-from app.database.session import SessionLocal, create_tables, get_db
-from app.core.init_db import init_db
+from app.database.session import IS_SQLITE, SessionLocal, get_db
+from app.core.process_sync import InterProcessLock, MULTI_WORKER
+from app.database.bootstrap import bootstrap_database, run_integrity_check, INTEGRITY_PRAGMAS
 from app.api.v1.endpoints import orders
-from app.models.order import Order
+from app.models.order import Order, OrderStatus, normalize_status_value
 from app.models.user import User
 from app.services.auth import get_current_user
+from app.services import idempotency as idempotency_service
+from app.services import order_state
+from app.services import order_code as order_code_service
+from app.services import reservation_scheduler
+from app.services import notification as notification_service
+from app.services import db_backup, db_maintenance, order_archive
+from app.services.write_queue import execute_write_async, write_queue
 
 # Настройка логгера
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Создаем все таблицы в базе данных
-try:
-    logger.info("Создание таблиц базы данных...")
-    create_tables()
-    logger.info("Таблицы успешно созданы")
-except Exception as e:
-    logger.error(f"Ошибка при создании таблиц: {e}")
+def _run_with_session(job):
+    db = SessionLocal()
+    try:
+        job(db)
+    finally:
+        db.close()
+
+
+# При нескольких воркерах фоновые задачи выполняет только воркер, захвативший эту блокировку;
+# если он завершится, блокировку подхватит другой воркер на следующем запуске задачи
+background_leader = InterProcessLock("background", enabled=MULTI_WORKER)
+
+
+async def _run_periodically(name: str, job, interval_seconds: int):
+    """Запускает job(db) в отдельном потоке раз в interval_seconds"""
+    while True:
+        try:
+            if background_leader.acquire(blocking=False):
+                await asyncio.to_thread(_run_with_session, job)
+        except Exception as e:
+            logger.error(f"Ошибка фоновой задачи «{name}»: {e}")
+        await asyncio.sleep(interval_seconds)
+
 
-# Инициализируем базу данных при запуске
-db = SessionLocal()
-try:
-    logger.info("Инициализация базы данных...")
-    init_db(db)
+def _reservation_scheduler_job(db: Session):
+    reservation_scheduler.run_tick(db)
+    notification_service.deliver_pending_emails(db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Подготовка БД выполняется до приема запросов, но не при импорте модуля
+    await asyncio.to_thread(bootstrap_database)
     
-    # Исправляем значения payment_method
-    try:
-        from app.services.order import fix_payment_method_case
-        updated_count = fix_payment_method_case(db)
-        logger.info(f"Исправлено {updated_count} записей payment_method в базе данных")
-    except Exception as e:
-        logger.error(f"Ошибка при исправлении payment_method: {e}")
-except Exception as e:
-    logger.error(f"Ошибка при инициализации базы данных: {e}")
-finally:
-    db.close()
+    app.state.background_tasks = [
+        # Очистка устаревших кодов заказов
+        asyncio.create_task(_run_periodically(
+            "очистка кодов заказов", order_code_service.sweep_expired_codes,
+            settings.ORDER_CODE_SWEEP_INTERVAL_SECONDS
+        )),
+        # Неявки и напоминания по бронированиям
+        asyncio.create_task(_run_periodically(
+            "планировщик бронирований", _reservation_scheduler_job,
+            settings.RESERVATION_SCHEDULER_INTERVAL_SECONDS
+        )),
+    ]
+    if IS_SQLITE:
+        # Контрольные точки WAL и освобождение места в файле базы
+        app.state.background_tasks.append(asyncio.create_task(_run_periodically(
+            "обслуживание БД", db_maintenance.run_maintenance,
+            settings.DB_MAINTENANCE_INTERVAL_SECONDS
+        )))
+        # Перенос давно закрытых заказов в месячные архивы
+        app.state.background_tasks.append(asyncio.create_task(_run_periodically(
+            "архивация заказов", order_archive.archive_orders,
+            settings.ORDER_ARCHIVE_INTERVAL_SECONDS
+        )))
+        # Резервные копии по расписанию: задача проверяет возраст последнего снимка
+        if settings.DB_BACKUP_INTERVAL_SECONDS > 0:
+            app.state.background_tasks.append(asyncio.create_task(_run_periodically(
+                "резервное копирование БД", db_backup.run_scheduled_backup,
+                min(settings.DB_BACKUP_INTERVAL_SECONDS, 10 * 60)
+            )))
+    # Проверка целостности читает весь файл базы - только по настройке и в фоне
+    if settings.DB_INTEGRITY_CHECK.lower() in INTEGRITY_PRAGMAS:
+        app.state.background_tasks.append(asyncio.create_task(asyncio.to_thread(run_integrity_check)))
+    
+    yield
+    
+    for task in app.state.background_tasks:
+        task.cancel()
+    # Дожидаемся операций, уже поставленных в очередь записи
+    await asyncio.to_thread(write_queue.stop)
+    background_leader.release()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="СППР для управления рестораном",
     version="0.1.0",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Настройки CORS
@@ -70,6 +133,7 @@ app.add_middleware(
         "Origin",
         "X-User-ID",
         "X-User-Role",
+        "Idempotency-Key",
         "Access-Control-Allow-Origin",
         "Access-Control-Allow-Credentials"
     ],
@@ -81,12 +145,75 @@ app.add_middleware(
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     logger.info(f"Request: {request.method} {request.url}")
-    logger.info(f"Client host: {request.client.host}")
+    logger.info(f"Client host: {request.client.host if request.client else None}")
     logger.info(f"Headers: {request.headers}")
     response = await call_next(request)
     logger.info(f"Response status: {response.status_code}")
     return response
 
+# Middleware для поддержки заголовка Idempotency-Key на создании заказов и изменении статусов/оплаты.
+# Повторный запрос с тем же ключом получает сохраненный ответ без обращения к таблицам заказов.
+@app.middleware("http")
+async def idempotency_keys(request: Request, call_next):
+    idempotency_key = request.headers.get(idempotency_service.IDEMPOTENCY_HEADER)
+    if not idempotency_key or not idempotency_service.is_idempotent_request(request.method, request.url.path):
+        return await call_next(request)
+    
+    if len(idempotency_key) > idempotency_service.MAX_KEY_LENGTH:
+        return JSONResponse(status_code=400, content={"detail": "Слишком длинный Idempotency-Key"})
+    
+    # Ключ действует в пределах пользователя (токена), чтобы разные клиенты не получили чужой ответ
+    scoped_key = hashlib.sha256(
+        f"{request.headers.get('Authorization', '')}|{idempotency_key}".encode("utf-8")
+    ).hexdigest()
+    endpoint = f"{request.method} {request.url.path}"
+    
+    # Обращения к БД выполняются в пуле потоков: при ожидании блокировки SQLite (busy_timeout)
+    # цикл событий продолжает обслуживать остальные запросы
+    stored = await run_in_threadpool(idempotency_service.begin_request, scoped_key, endpoint)
+    if stored is not None:
+        if stored.endpoint != endpoint:
+            return JSONResponse(
+                status_code=422,
+                content={"detail": "Idempotency-Key уже использован для другого запроса"}
+            )
+        if stored.status_code is None:
+            return JSONResponse(
+                status_code=409,
+                content={"detail": "Запрос с этим Idempotency-Key еще выполняется"}
+            )
+        logger.info(f"Повтор запроса {endpoint} по Idempotency-Key, возвращаем сохраненный ответ")
+        return Response(
+            content=stored.response_body or "",
+            status_code=stored.status_code,
+            media_type=stored.media_type,
+            headers={"Idempotent-Replayed": "true"}
+        )
+    
+    # Если запрос прервался исключением (в том числе отменой), ключ освобождается в finally,
+    # чтобы клиент мог повторить запрос, не дожидаясь окончания аренды ключа
+    body = None
+    try:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    finally:
+        if body is None:
+            await run_in_threadpool(idempotency_service.finish_request, scoped_key, None)
+    
+    try:
+        await run_in_threadpool(
+            idempotency_service.finish_request, scoped_key, response.status_code, body, response.media_type
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении ответа для Idempotency-Key: {e}")
+    
+    return Response(
+        content=body,
+        status_code=response.status_code,
+        headers=dict(response.headers),
+        media_type=response.media_type
+    )
+
 # Монтируем статические файлы
 static_path = Path(__file__).parent.parent / "static"
 static_path.mkdir(exist_ok=True)
@@ -107,6 +234,50 @@ def read_root():
         "version": "1.0.0"
     }
 
+def _expected_version(data: dict):
+    """Ожидаемая версия заказа из запроса (для оптимистичной блокировки), если передана"""
+    version = data.get("version") if isinstance(data, dict) else None
+    try:
+        return int(version) if version is not None else None
+    except (TypeError, ValueError):
+        return None
+
+async def _order_transition_response(
+    db: Session,
+    order_id: int,
+    status=None,
+    payment_status=None,
+    expected_version=None,
+    message: str = "Статус заказа успешно обновлен"
+) -> JSONResponse:
+    """
+    Применяет переход статуса через машину состояний заказа и формирует JSON-ответ.
+    Один условный UPDATE ... RETURNING вместо чтения, изменения и повторного чтения заказа;
+    при включенной очереди записи переход выполняется в общей транзакции потока-писателя.
+    """
+    try:
+        result = await execute_write_async(
+            db, order_state.transition_order, order_id,
+            status=status,
+            payment_status=payment_status,
+            expected_version=expected_version
+        )
+    except order_state.OrderTransitionError as e:
+        logger.warning(f"Переход статуса заказа {order_id} отклонен: {e.message}")
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"success": False, "message": e.message}
+        )
+    
+    return JSONResponse(
+        status_code=200,
+        content={
+            "success": True,
+            "message": message,
+            "order": order_state.serialize_transition(result)
+        }
+    )
+
 # Добавляем новый простой эндпоинт для обновления статуса заказа
 @app.post("/api/direct/order-status/{order_id}", include_in_schema=True)
 async def simple_order_status_update(
@@ -123,94 +294,12 @@ async def simple_order_status_update(
     try:
         logger.info(f"Запрос на прямое обновление заказа {order_id}: {status_data}")
         
-        # Простой SQL-запрос для обновления заказа
-        sql_query = "UPDATE orders SET "
-        params = {"order_id": order_id}
-        update_parts = []
-        
-        # Обновляем статус заказа
-        if "status" in status_data and status_data["status"]:
-            new_status = status_data["status"].upper()
-            update_parts.append("status = :status")
-            params["status"] = new_status
-            logger.info(f"Обновление status на {new_status}")
-            
-            # Если статус COMPLETED, устанавливаем время завершения
-            if new_status == "COMPLETED":
-                update_parts.append("completed_at = CURRENT_TIMESTAMP")
-                
-        # Обновляем статус оплаты
-        if "payment_status" in status_data and status_data["payment_status"]:
-            new_payment_status = status_data["payment_status"].upper()
-            update_parts.append("payment_status = :payment_status")
-            params["payment_status"] = new_payment_status
-            logger.info(f"Обновление payment_status на {new_payment_status}")
-        
-        # Обновляем время изменения
-        update_parts.append("updated_at = CURRENT_TIMESTAMP")
-        
-        # Собираем и выполняем запрос
-        if not update_parts:
-            return JSONResponse(
-                status_code=400,
-                content={"success": False, "message": "Не указаны данные для обновления"}
-            )
-            
-        sql_query += ", ".join(update_parts) + " WHERE id = :order_id"
-        logger.info(f"SQL запрос: {sql_query} с параметрами {params}")
-        
-        try:
-            result = db.execute(text(sql_query), params)
-            db.commit()
-            
-            if result.rowcount == 0:
-                return JSONResponse(
-                    status_code=404,
-                    content={"success": False, "message": f"Заказ с ID {order_id} не найден"}
-                )
-                
-            # Получаем обновленные данные заказа
-            updated_order = db.query(Order).filter(Order.id == order_id).first()
-            
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "success": True,
-                    "message": "Статус заказа успешно обновлен",
-                    "order": {
-                        "id": updated_order.id,
-                        "status": updated_order.status,
-                        "payment_status": updated_order.payment_status,
-                        "updated_at": updated_order.updated_at.isoformat() if updated_order.updated_at else None
-                    }
-                }
-            )
-        except Exception as e:
-            logger.error(f"Ошибка SQL: {str(e)}")
-            db.rollback()
-            
-            # Аварийная попытка с простым запросом
-            try:
-                emergency_update = "UPDATE orders SET updated_at = CURRENT_TIMESTAMP"
-                if "status" in params:
-                    emergency_update += ", status = :status"
-                if "payment_status" in params:
-                    emergency_update += ", payment_status = :payment_status"
-                emergency_update += " WHERE id = :order_id"
-                
-                db.execute(text(emergency_update), params)
-                db.commit()
-                return JSONResponse(
-                    status_code=200,
-                    content={"success": True, "message": "Статус обновлен (аварийный режим)"}
-                )
-            except Exception as e2:
-                logger.error(f"Критическая ошибка: {str(e2)}")
-                return JSONResponse(
-                    status_code=500,
-                    content={"success": False, "message": f"Ошибка при обновлении: {str(e)}"}
-                )
-            
+        return await _order_transition_response(
+            db, order_id,
+            status=status_data.get("status") or None,
+            payment_status=status_data.get("payment_status") or None,
+            expected_version=_expected_version(status_data)
+        )
     except Exception as e:
         logger.exception(f"Необработанная ошибка: {str(e)}")
         return JSONResponse(
@@ -259,92 +348,12 @@ async def ultra_simple_update(
                 content={"success": False, "message": "Некорректный JSON"}
             )
         
-        # Прямой SQL-запрос для максимальной надежности
-        sql_parts = []
-        params = {"order_id": order_id}
-        
-        # Обрабатываем статус заказа
-        if "status" in data and data["status"]:
-            status = data["status"].upper()
-            sql_parts.append("status = :status")
-            params["status"] = status
-            
-            # Обновляем время завершения для COMPLETED
-            if status == "COMPLETED":
-                sql_parts.append("completed_at = CURRENT_TIMESTAMP")
-        
-        # Обрабатываем статус оплаты
-        if "payment_status" in data and data["payment_status"]:
-            payment_status = data["payment_status"].upper()
-            sql_parts.append("payment_status = :payment_status")
-            params["payment_status"] = payment_status
-        
-        # Всегда обновляем updated_at
-        sql_parts.append("updated_at = CURRENT_TIMESTAMP")
-        
-        # Если нет данных для обновления
-        if len(sql_parts) < 2:  # только updated_at
-            return JSONResponse(
-                status_code=400,
-                content={"success": False, "message": "Не указаны данные для обновления"}
-            )
-        
-        # Строим и выполняем запрос
-        sql = f"UPDATE orders SET {', '.join(sql_parts)} WHERE id = :order_id"
-        logger.info(f"SQL запрос: {sql}, параметры: {params}")
-        
-        try:
-            result = db.execute(text(sql), params)
-            db.commit()
-            
-            if result.rowcount == 0:
-                return JSONResponse(
-                    status_code=404,
-                    content={"success": False, "message": f"Заказ с ID {order_id} не найден"}
-                )
-            
-            # Получаем обновленные данные заказа
-            updated_order = db.query(Order).filter(Order.id == order_id).first()
-            
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "success": True,
-                    "message": "Статус заказа успешно обновлен",
-                    "order": {
-                        "id": updated_order.id,
-                        "status": updated_order.status,
-                        "payment_status": updated_order.payment_status,
-                        "updated_at": updated_order.updated_at.isoformat() if updated_order.updated_at else None
-                    }
-                }
-            )
-        except Exception as e:
-            logger.error(f"Ошибка SQL: {str(e)}")
-            db.rollback()
-            
-            # Аварийная попытка с простым запросом
-            try:
-                emergency_update = "UPDATE orders SET updated_at = CURRENT_TIMESTAMP"
-                if "status" in params:
-                    emergency_update += ", status = :status"
-                if "payment_status" in params:
-                    emergency_update += ", payment_status = :payment_status"
-                emergency_update += " WHERE id = :order_id"
-                
-                db.execute(text(emergency_update), params)
-                db.commit()
-                return JSONResponse(
-                    status_code=200,
-                    content={"success": True, "message": "Статус обновлен (аварийный режим)"}
-                )
-            except Exception as e2:
-                logger.error(f"Критическая ошибка: {str(e2)}")
-                return JSONResponse(
-                    status_code=500,
-                    content={"success": False, "message": f"Ошибка при обновлении: {str(e)}"}
-                )
-    
+        return await _order_transition_response(
+            db, order_id,
+            status=data.get("status") or None,
+            payment_status=data.get("payment_status") or None,
+            expected_version=_expected_version(data)
+        )
     except Exception as e:
         logger.exception(f"Необработанная ошибка: {str(e)}")
         return JSONResponse(
@@ -406,61 +415,12 @@ async def update_payment_status(
                 content={"success": False, "message": "Не указан статус оплаты в запросе"}
             )
         
-        # Приводим к верхнему регистру
-        payment_status = payment_status.upper()
-        
-        # Прямой SQL-запрос для обновления
-        sql = "UPDATE orders SET payment_status = :payment_status, updated_at = CURRENT_TIMESTAMP WHERE id = :order_id"
-        params = {"order_id": order_id, "payment_status": payment_status}
-        
-        logger.info(f"SQL запрос: {sql}, параметры: {params}")
-        
-        try:
-            result = db.execute(text(sql), params)
-            db.commit()
-            
-            if result.rowcount == 0:
-                return JSONResponse(
-                    status_code=404,
-                    content={"success": False, "message": f"Заказ с ID {order_id} не найден"}
-                )
-                
-            # Получаем обновленные данные заказа
-            updated_order = db.query(Order).filter(Order.id == order_id).first()
-            
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "success": True,
-                    "message": "Статус оплаты заказа успешно обновлен",
-                    "order": {
-                        "id": updated_order.id,
-                        "status": updated_order.status,
-                        "payment_status": updated_order.payment_status,
-                        "updated_at": updated_order.updated_at.isoformat() if updated_order.updated_at else None
-                    }
-                }
-            )
-        except Exception as e:
-            logger.error(f"Ошибка SQL при обновлении статуса оплаты: {str(e)}")
-            db.rollback()
-            
-            # Аварийная попытка с максимально простым запросом
-            try:
-                emergency_sql = f"UPDATE orders SET payment_status = '{payment_status}' WHERE id = {order_id}"
-                db.execute(emergency_sql)
-                db.commit()
-                return JSONResponse(
-                    status_code=200,
-                    content={"success": True, "message": "Статус оплаты обновлен (аварийный режим)"}
-                )
-            except Exception as e2:
-                logger.error(f"Критическая ошибка при обновлении статуса оплаты: {str(e2)}")
-                return JSONResponse(
-                    status_code=500,
-                    content={"success": False, "message": f"Ошибка при обновлении статуса оплаты: {str(e)}"}
-                )
-            
+        return await _order_transition_response(
+            db, order_id,
+            payment_status=payment_status,
+            expected_version=_expected_version(data),
+            message="Статус оплаты заказа успешно обновлен"
+        )
     except Exception as e:
         logger.exception(f"Необработанная ошибка при обновлении статуса оплаты: {str(e)}")
         return JSONResponse(
@@ -537,66 +497,11 @@ async def update_order_status(
                 content={"success": False, "message": "Не указан статус заказа в запросе"}
             )
         
-        # Приводим к верхнему регистру
-        status = status.upper()
-        
-        # Прямой SQL-запрос для обновления
-        sql_parts = ["status = :status", "updated_at = CURRENT_TIMESTAMP"]
-        params = {"order_id": order_id, "status": status}
-        
-        # Для завершенных заказов обновляем время завершения
-        if status == "COMPLETED":
-            sql_parts.append("completed_at = CURRENT_TIMESTAMP")
-        
-        sql = f"UPDATE orders SET {', '.join(sql_parts)} WHERE id = :order_id"
-        logger.info(f"SQL запрос: {sql}, параметры: {params}")
-        
-        try:
-            result = db.execute(text(sql), params)
-            db.commit()
-            
-            if result.rowcount == 0:
-                return JSONResponse(
-                    status_code=404,
-                    content={"success": False, "message": f"Заказ с ID {order_id} не найден"}
-                )
-                
-            # Получаем обновленные данные заказа
-            updated_order = db.query(Order).filter(Order.id == order_id).first()
-            
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "success": True,
-                    "message": "Статус заказа успешно обновлен",
-                    "order": {
-                        "id": updated_order.id,
-                        "status": updated_order.status,
-                        "payment_status": updated_order.payment_status,
-                        "updated_at": updated_order.updated_at.isoformat() if updated_order.updated_at else None
-                    }
-                }
-            )
-        except Exception as e:
-            logger.error(f"Ошибка SQL при обновлении статуса заказа: {str(e)}")
-            db.rollback()
-            
-            # Аварийная попытка с максимально простым запросом
-            try:
-                emergency_sql = f"UPDATE orders SET status = '{status}' WHERE id = {order_id}"
-                db.execute(emergency_sql)
-                db.commit()
-                return JSONResponse(
-                    status_code=200,
-                    content={"success": True, "message": "Статус заказа обновлен (аварийный режим)"}
-                )
-            except Exception as e2:
-                logger.error(f"Критическая ошибка при обновлении статуса заказа: {str(e2)}")
-                return JSONResponse(
-                    status_code=500,
-                    content={"success": False, "message": f"Ошибка при обновлении статуса заказа: {str(e)}"}
-                )
-            
+        return await _order_transition_response(
+            db, order_id,
+            status=status,
+            expected_version=_expected_version(data)
+        )
     except Exception as e:
         logger.exception(f"Необработанная ошибка при обновлении статуса заказа: {str(e)}")
         return JSONResponse(
@@ -645,93 +550,14 @@ async def update_order_universal(
             payment_status = data["status"]
         elif "new_payment_status" in data:
             payment_status = data["new_payment_status"]
-            
-        # Собираем SQL-запрос для обновления
-        sql_parts = []
-        params = {"order_id": order_id}
         
-        if status:
-            status = status.upper()
-            sql_parts.append("status = :status")
-            params["status"] = status
-            
-            # Для завершенных заказов обновляем время завершения
-            if status == "COMPLETED":
-                sql_parts.append("completed_at = CURRENT_TIMESTAMP")
-                
-        if payment_status:
-            payment_status = payment_status.upper()
-            sql_parts.append("payment_status = :payment_status")
-            params["payment_status"] = payment_status
-            
-        # Если нет данных для обновления
-        if not sql_parts:
-            return JSONResponse(
-                status_code=400,
-                content={"success": False, "message": "Не указаны данные для обновления"}
-            )
-            
-        # Всегда обновляем время изменения
-        sql_parts.append("updated_at = CURRENT_TIMESTAMP")
-        
-        # Строим и выполняем запрос
-        sql = f"UPDATE orders SET {', '.join(sql_parts)} WHERE id = :order_id"
-        logger.info(f"SQL запрос: {sql}, параметры: {params}")
-        
-        try:
-            result = db.execute(text(sql), params)
-            db.commit()
-            
-            if result.rowcount == 0:
-                return JSONResponse(
-                    status_code=404,
-                    content={"success": False, "message": f"Заказ с ID {order_id} не найден"}
-                )
-                
-            # Получаем обновленные данные заказа
-            updated_order = db.query(Order).filter(Order.id == order_id).first()
-            
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "success": True,
-                    "message": "Заказ успешно обновлен",
-                    "order": {
-                        "id": updated_order.id,
-                        "status": updated_order.status,
-                        "payment_status": updated_order.payment_status,
-                        "updated_at": updated_order.updated_at.isoformat() if updated_order.updated_at else None
-                    }
-                }
-            )
-        except Exception as e:
-            logger.error(f"Ошибка SQL при универсальном обновлении: {str(e)}")
-            db.rollback()
-            
-            # Аварийная попытка с максимально простым запросом
-            try:
-                emergency_parts = []
-                if "status" in params:
-                    emergency_parts.append(f"status = '{params['status']}'")
-                if "payment_status" in params:
-                    emergency_parts.append(f"payment_status = '{params['payment_status']}'")
-                
-                if emergency_parts:
-                    emergency_sql = f"UPDATE orders SET {', '.join(emergency_parts)} WHERE id = {order_id}"
-                    db.execute(emergency_sql)
-                    db.commit()
-                    return JSONResponse(
-                        status_code=200,
-                        content={"success": True, "message": "Заказ обновлен (аварийный режим)"}
-                    )
-                else:
-                    raise ValueError("Нет данных для аварийного обновления")
-            except Exception as e2:
-                logger.error(f"Критическая ошибка при универсальном обновлении: {str(e2)}")
-                return JSONResponse(
-                    status_code=500,
-                    content={"success": False, "message": f"Ошибка при обновлении заказа: {str(e)}"}
-                )
+        return await _order_transition_response(
+            db, order_id,
+            status=status or None,
+            payment_status=payment_status or None,
+            expected_version=_expected_version(data),
+            message="Заказ успешно обновлен"
+        )
     except Exception as e:
         logger.exception(f"Необработанная ошибка при универсальном обновлении: {str(e)}")
         return JSONResponse(
@@ -768,107 +594,13 @@ async def simplest_order_update(
                 content={"success": False, "message": f"Ошибка в формате JSON: {str(e)}"}
             )
         
-        # Получаем заказ из базы данных
-        order_query = "SELECT id FROM orders WHERE id = :order_id"
-        order_result = db.execute(text(order_query), {"order_id": order_id})
-        order_exists = order_result.fetchone()
-        
-        if not order_exists:
-            return JSONResponse(
-                status_code=404,
-                content={"success": False, "message": f"Заказ с ID {order_id} не найден"}
-            )
-        
-        # Подготовка SQL запроса для обновления
-        update_parts = []
-        params = {"order_id": order_id}
-        
-        # Обрабатываем все возможные поля
-        if "status" in data and data["status"]:
-            status = data["status"].upper() if isinstance(data["status"], str) else data["status"]
-            update_parts.append("status = :status")
-            params["status"] = status
-            
-            # Для завершенных заказов обновляем время завершения
-            if status in ["COMPLETED", "completed"]:
-                update_parts.append("completed_at = datetime('now')")
-        
-        if "payment_status" in data and data["payment_status"]:
-            payment = data["payment_status"].upper() if isinstance(data["payment_status"], str) else data["payment_status"]
-            update_parts.append("payment_status = :payment_status")
-            params["payment_status"] = payment
-        
-        # Всегда обновляем время изменения
-        update_parts.append("updated_at = datetime('now')")
-        
-        if not update_parts:
-            return JSONResponse(
-                status_code=400,
-                content={"success": False, "message": "Не указаны поля для обновления"}
-            )
-        
-        # Формируем SQL запрос
-        sql = f"UPDATE orders SET {', '.join(update_parts)} WHERE id = :order_id"
-        logger.info(f"Выполняем SQL запрос для прямого обновления: {sql}")
-        logger.info(f"Параметры: {params}")
-        
-        # Выполняем запрос
-        try:
-            result = db.execute(text(sql), params)
-            db.commit()
-            logger.info(f"SQL запрос выполнен успешно, обновлено строк: {result.rowcount}")
-            
-            # Получаем обновленные данные заказа
-            order_data_query = "SELECT id, status, payment_status, updated_at FROM orders WHERE id = :order_id"
-            order_data = db.execute(text(order_data_query), {"order_id": order_id}).fetchone()
-            
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "success": True,
-                    "message": "Заказ успешно обновлен через прямой метод",
-                    "order": {
-                        "id": order_data[0] if order_data else order_id,
-                        "status": order_data[1] if order_data else None,
-                        "payment_status": order_data[2] if order_data else None,
-                        "updated_at": order_data[3] if order_data else None
-                    }
-                }
-            )
-        except Exception as sql_error:
-            db.rollback()
-            logger.error(f"Ошибка при выполнении SQL запроса: {str(sql_error)}")
-            
-            # Экстренное обновление через максимально простой запрос
-            try:
-                simple_sql = "UPDATE orders SET updated_at = datetime('now')"
-                if "status" in params:
-                    simple_sql = "UPDATE orders SET status = :status, updated_at = datetime('now') WHERE id = :order_id"
-                elif "payment_status" in params:
-                    simple_sql = "UPDATE orders SET payment_status = :payment_status, updated_at = datetime('now') WHERE id = :order_id"
-                
-                db.execute(text(simple_sql), params)
-                db.commit()
-                logger.info("Выполнено экстренное обновление через простой SQL")
-                
-                return JSONResponse(
-                    status_code=200,
-                    content={
-                        "success": True,
-                        "message": "Заказ обновлен через экстренный метод",
-                        "order_id": order_id
-                    }
-                )
-            except Exception as emergency_error:
-                db.rollback()
-                logger.error(f"Критическая ошибка при обновлении: {str(emergency_error)}")
-                return JSONResponse(
-                    status_code=500,
-                    content={
-                        "success": False,
-                        "message": f"Все попытки обновления не удались: {str(emergency_error)}"
-                    }
-                )
+        return await _order_transition_response(
+            db, order_id,
+            status=data.get("status") or None,
+            payment_status=data.get("payment_status") or None,
+            expected_version=_expected_version(data),
+            message="Заказ успешно обновлен через прямой метод"
+        )
     except Exception as e:
         logger.exception(f"Необработанная ошибка в простом методе обновления: {str(e)}")
         return JSONResponse(
@@ -950,13 +682,9 @@ async def assign_order_by_code_handler(
         logger.info(f"Привязка заказа с кодом {order_code} к официанту {current_user.id}")
         
         # Ищем заказ по коду
-        order_query = text("""
-            SELECT id, status, waiter_id 
-            FROM orders 
-            WHERE order_code = :code
-        """)
+        order_query = select(Order.id, Order.status, Order.waiter_id).where(Order.order_code == order_code)
         
-        result = db.execute(order_query, {"code": order_code})
+        result = db.execute(order_query)
         order_data = result.fetchone()
         
         if not order_data:
@@ -983,8 +711,8 @@ async def assign_order_by_code_handler(
         # Проверяем, привязан ли заказ к другому официанту
         if previous_waiter_id and previous_waiter_id != current_user.id:
             # Получаем имя официанта
-            waiter_query = text("SELECT full_name FROM users WHERE id = :waiter_id")
-            waiter_result = db.execute(waiter_query, {"waiter_id": previous_waiter_id})
+            waiter_query = select(User.full_name).where(User.id == previous_waiter_id)
+            waiter_result = db.execute(waiter_query)
             waiter_data = waiter_result.fetchone()
             waiter_name = waiter_data[0] if waiter_data else "Другой официант"
             
@@ -999,43 +727,35 @@ async def assign_order_by_code_handler(
                 )
         
         # Определяем новый статус
-        new_status = "CONFIRMED" if order_status.upper() == "PENDING" else order_status
-        
-        # Обновляем заказ через прямой SQL запрос
-        update_query = text("""
-            UPDATE orders 
-            SET waiter_id = :waiter_id, 
-                status = :status, 
-                updated_at = datetime('now')
-            WHERE id = :order_id
-        """)
-        
-        update_params = {
-            "waiter_id": current_user.id,
-            "status": new_status,
-            "order_id": order_id
-        }
+        current_status = normalize_status_value(order_status)
+        new_status = OrderStatus.CONFIRMED.value if current_status == OrderStatus.PENDING.value else current_status
+        
+        # Обновляем заказ одним UPDATE, минуя загрузку объекта
+        update_query = (
+            update(Order)
+            .where(Order.id == order_id)
+            .values(waiter_id=current_user.id, status=new_status, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
         
         try:
-            logger.info(f"Выполнение SQL запроса для привязки заказа: {update_params}")
-            result = db.execute(update_query, update_params)
+            logger.info(f"Привязка заказа {order_id}: waiter_id={current_user.id}, статус={new_status}")
+            result = db.execute(update_query)
             db.commit()
             
             # Проверяем успешность обновления
-            verify_query = text("SELECT waiter_id FROM orders WHERE id = :order_id")
-            verify_result = db.execute(verify_query, {"order_id": order_id})
+            verify_query = select(Order.waiter_id).where(Order.id == order_id)
+            verify_result = db.execute(verify_query)
             verify_data = verify_result.fetchone()
             
             if verify_data and verify_data[0] == current_user.id:
                 logger.info(f"Заказ {order_id} успешно привязан к официанту {current_user.id}")
                 
                 # Получаем детали заказа
-                order_details_query = text("""
-                    SELECT id, status, waiter_id, payment_status, updated_at
-                    FROM orders
-                    WHERE id = :order_id
-                """)
-                order_details = db.execute(order_details_query, {"order_id": order_id}).fetchone()
+                order_details_query = select(
+                    Order.id, Order.status, Order.waiter_id, Order.payment_status, Order.updated_at
+                ).where(Order.id == order_id)
+                order_details = db.execute(order_details_query).fetchone()
                 
                 return JSONResponse(
                     status_code=200,
@@ -1047,7 +767,7 @@ async def assign_order_by_code_handler(
                             "status": order_details[1],
                             "waiter_id": order_details[2],
                             "payment_status": order_details[3],
-                            "updated_at": order_details[4]
+                            "updated_at": order_details[4].isoformat() if order_details[4] else None
                         }
                     }
                 )
@@ -1056,11 +776,7 @@ async def assign_order_by_code_handler(
                 logger.error(f"Ошибка привязки заказа! Текущее значение waiter_id = {current_value}")
                 
                 # Экстренная привязка
-                emergency_query = f"""
-                    UPDATE orders
-                    SET waiter_id = {current_user.id}
-                    WHERE id = {order_id}
-                """
+                emergency_query = update(Order).where(Order.id == order_id).values(waiter_id=current_user.id)
                 db.execute(emergency_query)
                 db.commit()
                 
@@ -1078,7 +794,7 @@ async def assign_order_by_code_handler(
             
             # Последняя попытка привязки
             try:
-                super_emergency_query = f"UPDATE orders SET waiter_id = {current_user.id} WHERE id = {order_id}"
+                super_emergency_query = update(Order).where(Order.id == order_id).values(waiter_id=current_user.id)
                 db.execute(super_emergency_query)
                 db.commit()
                 
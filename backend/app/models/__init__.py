@@ -7,10 +7,15 @@ from app.models.menu import Category, Allergen, Tag, Dish
 from app.models.payment import Payment
 from app.models.order import Order, OrderDish, OrderStatus, PaymentStatus, PaymentMethod, OrderType
 from app.models.order_item import OrderItem
+from app.models.order_archive import ArchivedOrder
+from app.models.dashboard import DashboardCounters
 from app.models.reservation import Reservation, ReservationStatus
 from app.models.settings import Settings
-from app.models.order_code import OrderCode
+from app.models.table import RestaurantTable, TableStatus
+from app.models.order_code import OrderCode, OrderCodePool
 from app.models.review import Review
+from app.models.idempotency import IdempotencyKey
+from app.models.notification import Notification, NotificationStatus
 
 # Экспортируем все модели
 __all__ = [
@@ -19,8 +24,11 @@ __all__ = [
     "Category", "Allergen", "Tag", "Dish",
     "Payment",
     "Order", "OrderDish", "OrderStatus", "OrderType", "PaymentStatus", "PaymentMethod",
-    "OrderItem",
+    "OrderItem", "ArchivedOrder", "DashboardCounters",
     "Reservation", "ReservationStatus",
-    "Settings", "OrderCode",
-    "Review"
+    "Settings", "OrderCode", "OrderCodePool",
+    "RestaurantTable", "TableStatus",
+    "Review",
+    "IdempotencyKey",
+    "Notification", "NotificationStatus"
 ] 
\ No newline at end of file
@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, Float, Date, DateTime
+
+from app.database.session import Base
+
+
+class DashboardCounters(Base):
+    """
+    Счетчики панели администратора - одна строка (id = 1), которую поддерживают
+    пути записи заказов, бронирований, пользователей и блюд (app.services.dashboard).
+    Поля "за сегодня" относятся к дню day и пересчитываются при первой записи нового дня.
+    """
+    __tablename__ = "dashboard_counters"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    orders_today = Column(Integer, nullable=False, default=0)
+    # Все заказы, включая перенесенные в месячные архивы
+    orders_total = Column(Integer, nullable=False, default=0)
+    # Сумма оплаченных заказов, созданных за день
+    revenue_today = Column(Float, nullable=False, default=0.0)
+    reservations_today = Column(Integer, nullable=False, default=0)
+    users = Column(Integer, nullable=False, default=0)
+    dishes = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
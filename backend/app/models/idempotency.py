@@ -0,0 +1,21 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Text
+
+from app.database.session import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Сохраненный ответ на мутирующий запрос с заголовком Idempotency-Key.
+    Повтор запроса с тем же ключом получает сохраненный ответ без обращения к таблицам заказов.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(128), primary_key=True)
+    # Метод и путь запроса, для которого использован ключ (например, "POST /api/v1/orders/")
+    endpoint = Column(String(255), nullable=False)
+    # NULL - запрос с этим ключом еще выполняется
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    media_type = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
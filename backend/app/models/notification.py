@@ -0,0 +1,33 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index
+
+from app.database.session import Base
+
+
+class NotificationStatus:
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class Notification(Base):
+    """
+    Исходящее уведомление (email или SMS), поставленное в очередь.
+    Отправка выполняется фоновым планировщиком пакетами.
+    """
+    __tablename__ = "notifications"
+    __table_args__ = (
+        # Выборка очередного пакета для отправки
+        Index("ix_notifications_status_created_at", "status", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String(10), nullable=False)  # email / sms
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=True)
+    body = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default=NotificationStatus.PENDING)
+    error = Column(Text, nullable=True)
+    reservation_id = Column(Integer, ForeignKey("reservations.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
@@ -1,6 +1,7 @@
 from datetime import datetime
 from enum import Enum as PyEnum
 from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Boolean, Table, Text, JSON
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -49,16 +50,80 @@ class OrderType(str, PyEnum):
     DELIVERY = "DELIVERY"
 
 
+# Альтернативные написания статусов, которые присылают клиенты
+ORDER_STATUS_ALIASES = {
+    "CANCELED": OrderStatus.CANCELLED.value,
+    "PROCESSING": OrderStatus.IN_PROGRESS.value,
+}
+
+PAYMENT_STATUS_ALIASES = {
+    "UNPAID": PaymentStatus.PENDING.value,
+}
+
+
+def normalize_status_value(value, aliases=None):
+    """
+    Приводит статус к каноническому виду: значение enum в верхнем регистре
+    ("in progress", "in-progress" -> "IN_PROGRESS", "canceled" -> "CANCELLED").
+    """
+    if value is None:
+        return None
+    if isinstance(value, PyEnum):
+        value = value.value
+    text_value = str(value).strip().upper().replace("-", "_").replace(" ", "_")
+    if not text_value:
+        return None
+    return (aliases or {}).get(text_value, text_value)
+
+
+class OrderStatusType(TypeDecorator):
+    """
+    Строковый статус заказа, нормализуемый при записи (ORM, Core-запросы и сравнения в фильтрах).
+    Благодаря единому виду значений фильтры по статусу используют индекс без func.lower/func.upper.
+    """
+    impl = String(20)
+    cache_ok = True
+    aliases = ORDER_STATUS_ALIASES
+
+    def process_bind_param(self, value, dialect):
+        return normalize_status_value(value, self.aliases)
+
+    def process_result_value(self, value, dialect):
+        return normalize_status_value(value, self.aliases)
+
+
+class PaymentStatusType(OrderStatusType):
+    """Строковый статус оплаты, нормализуемый при записи"""
+    cache_ok = True
+    aliases = PAYMENT_STATUS_ALIASES
+
+
+def dish_snapshot(dish) -> dict:
+    """Поля позиции заказа, копируемые из блюда на момент заказа"""
+    return {
+        "dish_id": dish.id,
+        "price": dish.price,
+        "dish_name": dish.name,
+        "category_id": dish.category_id,
+        "cost_price": dish.cost_price,
+    }
+
+
 class OrderDish(Base):
     __tablename__ = "order_dish"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
     dish_id = Column(Integer, ForeignKey("dishes.id", ondelete="CASCADE"), nullable=False)
     quantity = Column(Integer, default=1)
     special_instructions = Column(Text, nullable=True)
     price = Column(Float, nullable=False)  # Цена блюда на момент заказа
     
+    # Снимок блюда на момент заказа: аналитика группирует по этим полям без соединения с dishes
+    dish_name = Column(String, nullable=True)
+    category_id = Column(Integer, nullable=True)
+    cost_price = Column(Float, nullable=True)  # Себестоимость на момент заказа
+    
     # Связи с явным указанием back_populates
     order = relationship("Order", back_populates="order_dishes")
     dish = relationship("app.models.menu.Dish", back_populates="order_dishes")
@@ -77,11 +142,12 @@ class Order(Base):
     customer_name = Column(String, nullable=True)
     customer_phone = Column(String, nullable=True)
     reservation_code = Column(String, nullable=True)
-    order_code = Column(String, nullable=True)
+    # Индекс - для поиска заказа по коду и возврата кодов закрытых заказов в пул
+    order_code = Column(String, nullable=True, index=True)
     
-    # Используем String для максимальной гибкости - теперь поддерживает верхний регистр
-    status = Column(String, default="PENDING")
-    payment_status = Column(String, default="PENDING")
+    # Статусы хранятся в каноническом виде (значение enum в верхнем регистре), см. OrderStatusType
+    status = Column(OrderStatusType, default=OrderStatus.PENDING.value, index=True)
+    payment_status = Column(PaymentStatusType, default=PaymentStatus.PENDING.value, index=True)
     total_amount = Column(Float, default=0.0)
     comment = Column(Text, nullable=True)
     is_urgent = Column(Boolean, default=False)
@@ -93,6 +159,8 @@ class Order(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    # Версия строки для оптимистичной блокировки (увеличивается при каждом переходе статуса)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Отношения
     user = relationship("User", foreign_keys=[user_id], back_populates="orders")
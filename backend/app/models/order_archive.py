@@ -0,0 +1,17 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime
+
+from app.database.session import Base
+
+
+class ArchivedOrder(Base):
+    """
+    Указатель на заказ, перенесенный в месячный архив (app.services.order_archive).
+    Сам заказ, его позиции и платежи лежат в файле архива за месяц создания заказа.
+    """
+    __tablename__ = "archived_orders"
+
+    order_id = Column(Integer, primary_key=True)
+    # Месяц архива в виде YYYY_MM (файл data/archive/orders_YYYY_MM.db)
+    month = Column(String(7), nullable=False, index=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
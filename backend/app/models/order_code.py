@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.database.session import Base
@@ -7,6 +7,10 @@ from app.database.session import Base
 
 class OrderCode(Base):
     __tablename__ = "order_codes"
+    __table_args__ = (
+        # Очистка устаревших кодов: выборка по is_used в порядке создания
+        Index("ix_order_codes_is_used_created_at", "is_used", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String, unique=True, index=True, nullable=False)
@@ -21,4 +25,14 @@ class OrderCode(Base):
     
     # ID заказа, связанного с этим кодом (если код использован)
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
-    order = relationship("Order", foreign_keys=[order_id], backref="code") 
\ No newline at end of file
+    order = relationship("Order", foreign_keys=[order_id], backref="code") 
+
+class OrderCodePool(Base):
+    """
+    Пул свободных кодов заказов. Коды лежат в случайном порядке (position),
+    выдача кода - удаление первой строки пула одним атомарным запросом.
+    """
+    __tablename__ = "order_code_pool"
+
+    code = Column(String, primary_key=True)
+    position = Column(Integer, nullable=False, index=True)
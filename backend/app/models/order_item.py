@@ -1,20 +1,9 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+"""
+Позиции заказа хранятся в единой таблице order_dish (модель OrderDish),
+которая содержит и снимок блюда на момент заказа (название, категория, себестоимость).
+Отдельная таблица order_items упразднена, её записи перенесены миграцией
+merge_order_line_items; имя OrderItem оставлено как псевдоним для старых импортов.
+"""
+from app.models.order import OrderDish
 
-from app.database.session import Base
-
-
-class OrderItem(Base):
-    __tablename__ = "order_items"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
-    dish_id = Column(Integer, ForeignKey("dishes.id", ondelete="CASCADE"), nullable=False)
-    quantity = Column(Integer, default=1)
-    price = Column(Float, nullable=False)  # Цена на момент заказа
-    created_at = Column(DateTime, default=func.now())
-    
-    # Упрощенные отношения без back_populates или backref
-    order = relationship("app.models.order.Order")
-    dish = relationship("app.models.menu.Dish") 
\ No newline at end of file
+OrderItem = OrderDish
@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 
 from app.database.session import Base
@@ -16,6 +16,10 @@ class ReservationStatus(str, PyEnum):
 
 class Reservation(Base):
     __tablename__ = "reservations"
+    __table_args__ = (
+        # Выборки за день (интервал по reservation_time) с фильтром по статусу
+        Index("ix_reservations_time_status", "reservation_time", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -27,6 +31,8 @@ class Reservation(Base):
     guest_phone = Column(String, nullable=True)
     comment = Column(String, nullable=True)
     reservation_code = Column(String, nullable=True, unique=True)
+    # Когда гостю поставлено в очередь напоминание о брони
+    reminder_sent_at = Column(DateTime, nullable=True)
     
     # Время создания и обновления
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -21,7 +21,8 @@ class Settings(Base):
     # Часы работы хранятся в JSON формате
     working_hours = Column(JSON, nullable=True)
     
-    # Столы ресторана хранятся в JSON формате
+    # Устаревшее хранение столов в JSON: столы перенесены в restaurant_tables (app.models.table),
+    # колонка остается только как источник для переноса
     tables = Column(JSON, nullable=True, default=list)
     
     # Настройки валюты и платежей
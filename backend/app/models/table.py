@@ -0,0 +1,43 @@
+from datetime import datetime
+from enum import Enum as PyEnum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime
+
+from app.database.session import Base
+
+
+class TableStatus(str, PyEnum):
+    AVAILABLE = "available"
+    OCCUPIED = "occupied"
+    RESERVED = "reserved"
+    MAINTENANCE = "maintenance"
+
+
+class RestaurantTable(Base):
+    """
+    Стол ресторана: раскладка зала и текущий статус.
+    Раньше хранились JSON-массивом в Settings.tables, теперь - по строке на стол.
+    """
+    __tablename__ = "restaurant_tables"
+
+    id = Column(Integer, primary_key=True, index=True)
+    number = Column(Integer, nullable=False, unique=True, index=True)
+    name = Column(String(100), nullable=True)
+    capacity = Column(Integer, nullable=False, default=2)
+    is_active = Column(Boolean, nullable=False, default=True)
+    position_x = Column(Integer, nullable=False, default=0)
+    position_y = Column(Integer, nullable=False, default=0)
+    # Статус меняется часто и отдельно от раскладки, по нему фильтруются свободные столы
+    status = Column(String(20), nullable=False, default=TableStatus.AVAILABLE.value, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "number": self.number,
+            "name": self.name,
+            "capacity": self.capacity,
+            "is_active": self.is_active,
+            "position_x": self.position_x,
+            "position_y": self.position_y,
+            "status": self.status,
+        }
@@ -20,6 +20,11 @@ class OrderCreate(OrderBase):
     is_urgent: Optional[bool] = False  # срочный заказ
     is_group_order: Optional[bool] = False  # групповой заказ
 
+class OrderBulkUpdateItem(BaseModel):
+    order_id: int
+    status: Optional[str] = None  # новый статус заказа
+    payment_status: Optional[str] = None  # новый статус оплаты
+
 class OrderOut(BaseModel):
     id: int
     user_id: Optional[int] = None
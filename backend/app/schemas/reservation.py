@@ -4,6 +4,7 @@ from pydantic import BaseModel, Field, validator
 import re
 
 from app.models.reservation import ReservationStatus
+from app.utils.date_utils import to_naive
 
 
 # Схемы для бронирования
@@ -46,6 +47,11 @@ class ReservationCreate(BaseModel):
         
         return v
     
+    @validator('reservation_time')
+    def normalize_reservation_time(cls, v):
+        # Время хранится без часового пояса: "...Z" из toISOString() переводится в UTC
+        return to_naive(v) if v is not None else v
+    
     class Config:
         populate_by_name = True
 
@@ -56,6 +62,11 @@ class ReservationUpdate(ReservationBase):
     reservation_time: Optional[datetime] = None
     status: Optional[ReservationStatus] = None
 
+    @validator('reservation_time')
+    def normalize_reservation_time(cls, v):
+        # Время хранится без часового пояса: "...Z" из toISOString() переводится в UTC
+        return to_naive(v) if v is not None else v
+
 
 class ReservationResponse(ReservationBase):
     id: int
@@ -18,6 +18,7 @@ class WorkingHoursDict(BaseModel):
 class RestaurantTable(BaseModel):
     """Модель данных для столов ресторана"""
     id: int
+    number: Optional[int] = None
     name: str
     capacity: int
     is_active: bool
@@ -0,0 +1,22 @@
+from typing import Optional
+from pydantic import BaseModel
+
+from app.models.table import TableStatus
+
+
+class TableStatusUpdate(BaseModel):
+    status: TableStatus
+
+
+class TableResponse(BaseModel):
+    id: int
+    number: int
+    name: Optional[str] = None
+    capacity: int
+    is_active: bool
+    position_x: int
+    position_y: int
+    status: str
+
+    class Config:
+        from_attributes = True
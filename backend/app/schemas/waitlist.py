@@ -0,0 +1,19 @@
+from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+
+class WaitlistEntryCreate(BaseModel):
+    guest_name: str
+    guest_phone: Optional[str] = None
+    guests_count: int = Field(..., ge=1)
+    priority: int = 0
+
+
+class WaitlistEntryResponse(WaitlistEntryCreate):
+    id: int
+    created_at: datetime
+    position: int
+    table_number: Optional[int] = None
+    eta: Optional[datetime] = None
+    wait_minutes: Optional[int] = None
@@ -8,9 +8,9 @@ from app.models.menu import Dish, Category
 from app.models.reservation import Reservation
 from app.models.user import User
 from app.models.review import Review
-from app.models.order_item import OrderItem
 from app.database.session import Base
-from app.utils.date_utils import is_weekend, get_day_name
+from app.services.order_archive import order_sources
+from app.utils.date_utils import is_weekend, get_day_name, day_bounds
 
 
 def ensure_datetime(dt):
@@ -43,21 +43,22 @@ def get_sales_by_period(
         # Логируем даты для отладки
         print(f"Используем даты в get_sales_by_period: start_date={start_date}, end_date={end_date}")
         
+        orders, _ = order_sources(db, start_date, end_date)
         query = db.query(
-            cast(Order.created_at, Date).label('date'),
-            func.count(Order.id).label('orders_count'),
-            func.sum(Order.total_amount).label('total_revenue')
+            cast(orders.created_at, Date).label('date'),
+            func.count(orders.id).label('orders_count'),
+            func.sum(orders.total_amount).label('total_revenue')
         )
         
         # Применяем фильтры по датам
-        query = query.filter(Order.created_at >= start_date)
-        query = query.filter(Order.created_at <= end_date)
+        query = query.filter(orders.created_at >= start_date)
+        query = query.filter(orders.created_at <= end_date)
         
         # Группируем по дате и сортируем
         result = query.group_by(
-            cast(Order.created_at, Date)
+            cast(orders.created_at, Date)
         ).order_by(
-            cast(Order.created_at, Date)
+            cast(orders.created_at, Date)
         ).all()
         
         print(f"SQL: {str(query)}")
@@ -131,30 +132,30 @@ def get_top_dishes(
     """
     Получение топа самых популярных блюд
     """
+    orders, order_dish = order_sources(db, start_date, end_date)
+    # Название и цена берутся из позиций заказа (снимок на момент заказа), без соединения с dishes
     query = db.query(
-        Dish.id,
-        Dish.name,
-        Dish.price,
-        func.sum(OrderDish.quantity).label("total_ordered"),
-        func.sum(OrderDish.quantity * Dish.price).label("total_revenue")
+        order_dish.dish_id.label("id"),
+        func.max(order_dish.dish_name).label("name"),
+        func.max(order_dish.price).label("price"),
+        func.sum(order_dish.quantity).label("total_ordered"),
+        func.sum(order_dish.quantity * order_dish.price).label("total_revenue")
     ).join(
-        OrderDish, OrderDish.dish_id == Dish.id
-    ).join(
-        Order, Order.id == OrderDish.order_id
+        orders, orders.id == order_dish.order_id
     )
     
     # Фильтрация только по завершенным заказам
-    query = query.filter(Order.status.in_([OrderStatus.COMPLETED, OrderStatus.DELIVERED]))
+    query = query.filter(orders.status.in_([OrderStatus.COMPLETED, OrderStatus.DELIVERED]))
     
     if start_date:
-        query = query.filter(Order.created_at >= start_date)
+        query = query.filter(orders.created_at >= start_date)
     if end_date:
-        query = query.filter(Order.created_at <= end_date)
+        query = query.filter(orders.created_at <= end_date)
     
     results = query.group_by(
-        Dish.id
+        order_dish.dish_id
     ).order_by(
-        func.sum(OrderDish.quantity).desc()
+        func.sum(order_dish.quantity).desc()
     ).limit(limit).all()
     
     return [
@@ -177,32 +178,34 @@ def get_revenue_by_category(
     """
     Получение выручки по категориям
     """
+    orders, order_dish = order_sources(db, start_date, end_date)
+    # Категория берется из позиции заказа (снимок на момент заказа), без соединения с dishes
     query = db.query(
         Category.id,
         Category.name,
-        func.count(Dish.id).label('dishes_count'),
-        func.sum(OrderDish.quantity).label('total_ordered'),
-        func.sum(OrderDish.quantity * Dish.price).label('total_revenue')
-    ).join(
-        Dish, Dish.category_id == Category.id
+        func.count(distinct(order_dish.dish_id)).label('dishes_count'),
+        func.sum(order_dish.quantity).label('total_ordered'),
+        func.sum(order_dish.quantity * order_dish.price).label('total_revenue')
+    ).select_from(
+        order_dish
     ).join(
-        OrderDish, OrderDish.dish_id == Dish.id
+        Category, Category.id == order_dish.category_id
     ).join(
-        Order, Order.id == OrderDish.order_id
+        orders, orders.id == order_dish.order_id
     )
     
     # Фильтрация только по завершенным заказам
-    query = query.filter(Order.status.in_([OrderStatus.COMPLETED, OrderStatus.DELIVERED]))
+    query = query.filter(orders.status.in_([OrderStatus.COMPLETED, OrderStatus.DELIVERED]))
     
     if start_date:
-        query = query.filter(Order.created_at >= start_date)
+        query = query.filter(orders.created_at >= start_date)
     if end_date:
-        query = query.filter(Order.created_at <= end_date)
+        query = query.filter(orders.created_at <= end_date)
     
     results = query.group_by(
         Category.id
     ).order_by(
-        func.sum(OrderDish.quantity * Dish.price).desc()
+        func.sum(order_dish.quantity * order_dish.price).desc()
     ).all()
     
     return [
@@ -221,10 +224,11 @@ def get_avg_order_value(db: Session) -> float:
     """
     Получение средней стоимости заказа
     """
+    orders, _ = order_sources(db)
     result = db.query(
-        func.avg(Order.total_amount).label("avg_order_value")
+        func.avg(orders.total_amount).label("avg_order_value")
     ).filter(
-        Order.status.in_([OrderStatus.COMPLETED, OrderStatus.DELIVERED])
+        orders.status.in_([OrderStatus.COMPLETED, OrderStatus.DELIVERED])
     ).first()
     
     return float(result.avg_order_value) if result.avg_order_value else 0.0
@@ -238,20 +242,21 @@ def get_table_utilization(
     """
     Получение статистики по использованию столиков
     """
+    orders, _ = order_sources(db, start_date, end_date)
     query = db.query(
-        Order.table_number,
-        func.count(Order.id).label('usage_count')
-    ).filter(Order.table_number.isnot(None))
+        orders.table_number,
+        func.count(orders.id).label('usage_count')
+    ).filter(orders.table_number.isnot(None))
     
     # Применяем фильтры по датам, если указаны
     if start_date:
-        query = query.filter(Order.created_at >= start_date)
+        query = query.filter(orders.created_at >= start_date)
     if end_date:
-        query = query.filter(Order.created_at <= end_date)
+        query = query.filter(orders.created_at <= end_date)
     
     # Группируем по номеру столика
     result = query.group_by(
-        Order.table_number
+        orders.table_number
     ).all()
     
     # Формируем словарь {table_number: usage_count}
@@ -294,28 +299,31 @@ def get_reservation_stats(db: Session) -> Dict[str, Any]:
     """
     Получение статистики по бронированиям
     """
-    today = datetime.now().date()
-    tomorrow = today + timedelta(days=1)
+    # Полуоткрытые интервалы дней: фильтры используют индекс по reservation_time
+    today_start, tomorrow_start = day_bounds(datetime.now().date())
+    _, day_after_tomorrow_start = day_bounds(tomorrow_start.date())
     
     # Бронирования на сегодня
     reservations_today = db.query(
         func.count(Reservation.id)
     ).filter(
-        func.date(Reservation.reservation_time) == today
+        Reservation.reservation_time >= today_start,
+        Reservation.reservation_time < tomorrow_start
     ).scalar()
     
     # Бронирования на завтра
     reservations_tomorrow = db.query(
         func.count(Reservation.id)
     ).filter(
-        func.date(Reservation.reservation_time) == tomorrow
+        Reservation.reservation_time >= tomorrow_start,
+        Reservation.reservation_time < day_after_tomorrow_start
     ).scalar()
     
     # Всего активных бронирований
     active_reservations = db.query(
         func.count(Reservation.id)
     ).filter(
-        func.date(Reservation.reservation_time) >= today
+        Reservation.reservation_time >= today_start
     ).scalar()
     
     return {
@@ -334,18 +342,19 @@ def get_daily_orders(
     """
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
+    orders, _ = order_sources(db, start_date, end_date)
     
     query = db.query(
-        func.date(Order.created_at).label("date"),
-        func.count(Order.id).label("orders_count"),
-        func.sum(Order.total_amount).label("total_revenue")
+        func.date(orders.created_at).label("date"),
+        func.count(orders.id).label("orders_count"),
+        func.sum(orders.total_amount).label("total_revenue")
     ).filter(
-        Order.created_at >= start_date,
-        Order.created_at <= end_date
+        orders.created_at >= start_date,
+        orders.created_at <= end_date
     ).group_by(
-        func.date(Order.created_at)
+        func.date(orders.created_at)
     ).order_by(
-        func.date(Order.created_at)
+        func.date(orders.created_at)
     )
     
     results = query.all()
@@ -400,14 +409,15 @@ def get_financial_metrics(
         return get_mock_financial_metrics(start_date, end_date)
     try:
         print(f"Пытаемся получить реальные финансовые данные за период {start_date} - {end_date}")
+        orders, _ = order_sources(db, start_date, end_date)
         
         # Общая выручка за период
         total_revenue_query = db.query(
-            func.sum(Order.total_amount).label('total_revenue')
+            func.sum(orders.total_amount).label('total_revenue')
         ).filter(
-            Order.status.in_(['COMPLETED', 'DELIVERED']),
-            Order.created_at >= start_date,
-            Order.created_at <= end_date
+            orders.status.in_(['COMPLETED', 'DELIVERED']),
+            orders.created_at >= start_date,
+            orders.created_at <= end_date
         )
         
         total_revenue_result = total_revenue_query.scalar()
@@ -415,17 +425,17 @@ def get_financial_metrics(
         
         # Запрашиваем данные о продажах по дням для построения графика
         daily_sales = db.query(
-            func.date(Order.created_at).label('date'),
-            func.sum(Order.total_amount).label('revenue'),
-            func.count(Order.id).label('orders_count')
+            func.date(orders.created_at).label('date'),
+            func.sum(orders.total_amount).label('revenue'),
+            func.count(orders.id).label('orders_count')
         ).filter(
-            Order.status.in_(['COMPLETED', 'DELIVERED']),
-            Order.created_at >= start_date,
-            Order.created_at <= end_date
+            orders.status.in_(['COMPLETED', 'DELIVERED']),
+            orders.created_at >= start_date,
+            orders.created_at <= end_date
         ).group_by(
-            func.date(Order.created_at)
+            func.date(orders.created_at)
         ).order_by(
-            func.date(Order.created_at)
+            func.date(orders.created_at)
         ).all()
         
         print(f"Получено {len(daily_sales)} записей из базы данных")
@@ -464,11 +474,11 @@ def get_financial_metrics(
         
         # Расчет среднего чека
         avg_order_value_query = db.query(
-            func.avg(Order.total_amount).label('avg_order')
+            func.avg(orders.total_amount).label('avg_order')
         ).filter(
-            Order.status.in_(['COMPLETED', 'DELIVERED']),
-            Order.created_at >= start_date,
-            Order.created_at <= end_date
+            orders.status.in_(['COMPLETED', 'DELIVERED']),
+            orders.created_at >= start_date,
+            orders.created_at <= end_date
         )
         
         avg_order_value_result = avg_order_value_query.scalar()
@@ -476,11 +486,11 @@ def get_financial_metrics(
         
         # Количество заказов
         orders_count_query = db.query(
-            func.count(Order.id)
+            func.count(orders.id)
         ).filter(
-            Order.status.in_(['COMPLETED', 'DELIVERED']),
-            Order.created_at >= start_date,
-            Order.created_at <= end_date
+            orders.status.in_(['COMPLETED', 'DELIVERED']),
+            orders.created_at >= start_date,
+            orders.created_at <= end_date
         )
         
         orders_count = orders_count_query.scalar() or 0
@@ -516,6 +526,44 @@ def get_financial_metrics(
         return get_mock_financial_metrics(ensure_datetime(start_date), ensure_datetime(end_date))
 
 
+def _menu_dishes_query(
+    db: Session,
+    orders,
+    order_dish,
+    start_date: datetime,
+    end_date: datetime,
+    category_id: Optional[int] = None,
+    dish_id: Optional[int] = None
+):
+    """
+    Продажи по блюдам за период. Название, категория, цена и себестоимость берутся
+    из снимка в позициях заказа, поэтому таблица dishes в запросе не участвует.
+    Себестоимость - средняя по проданным порциям.
+    orders и order_dish - сущности заказов и позиций из order_sources.
+    """
+    query = (
+        db.query(
+            order_dish.dish_id.label("dishId"),
+            func.max(order_dish.dish_name).label("dishName"),
+            Category.id.label("categoryId"),
+            Category.name.label("categoryName"),
+            func.sum(order_dish.quantity).label("salesCount"),
+            func.sum(order_dish.quantity * order_dish.price).label("revenue"),
+            (func.sum(order_dish.quantity * order_dish.cost_price) / func.sum(order_dish.quantity)).label("costPrice")
+        )
+        .join(orders, order_dish.order_id == orders.id)
+        .join(Category, order_dish.category_id == Category.id)
+        .filter(orders.created_at.between(start_date, end_date))
+    )
+    
+    if category_id:
+        query = query.filter(order_dish.category_id == category_id)
+    if dish_id:
+        query = query.filter(order_dish.dish_id == dish_id)
+    
+    return query.group_by(order_dish.dish_id, Category.id)
+
+
 def get_menu_metrics(
     db: Session, 
     start_date: datetime = None, 
@@ -537,33 +585,15 @@ def get_menu_metrics(
         return get_mock_menu_metrics(start_date, end_date)
     try:
         print(f"Пытаемся получить реальные данные о меню за период {start_date} - {end_date}")
+        orders, order_dish = order_sources(db, start_date, end_date)
         
         # Получаем топ продаваемых блюд
         top_dishes_query = (
-            db.query(
-                Dish.id.label("dishId"),
-                Dish.name.label("dishName"),
-                Category.id.label("categoryId"),
-                Category.name.label("categoryName"),
-                func.sum(OrderItem.quantity).label("salesCount"),
-                func.sum(OrderItem.quantity * OrderItem.price).label("revenue"),
-                Dish.cost_price.label("costPrice")
-            )
-            .join(OrderItem, Dish.id == OrderItem.dish_id)
-            .join(Order, OrderItem.order_id == Order.id)
-            .join(Category, Dish.category_id == Category.id)
-            .filter(Order.created_at.between(start_date, end_date))
-            .group_by(Dish.id, Category.id)
-            .order_by(func.sum(OrderItem.quantity).desc())
+            _menu_dishes_query(db, orders, order_dish, start_date, end_date, category_id, dish_id)
+            .order_by(func.sum(order_dish.quantity).desc())
             .limit(10)
         )
         
-        # Добавляем фильтры, если указаны
-        if category_id:
-            top_dishes_query = top_dishes_query.filter(Category.id == category_id)
-        if dish_id:
-            top_dishes_query = top_dishes_query.filter(Dish.id == dish_id)
-            
         top_dishes_results = top_dishes_query.all()
         print(f"Получено {len(top_dishes_results)} записей о топ блюдах")
         
@@ -597,29 +627,11 @@ def get_menu_metrics(
                 
         # Получаем наименее продаваемые блюда с такой же логикой
         least_selling_dishes_query = (
-            db.query(
-                Dish.id.label("dishId"),
-                Dish.name.label("dishName"),
-                Category.id.label("categoryId"),
-                Category.name.label("categoryName"),
-                func.sum(OrderItem.quantity).label("salesCount"),
-                func.sum(OrderItem.quantity * OrderItem.price).label("revenue"),
-                Dish.cost_price.label("costPrice")
-            )
-            .join(OrderItem, Dish.id == OrderItem.dish_id)
-            .join(Order, OrderItem.order_id == Order.id)
-            .join(Category, Dish.category_id == Category.id)
-            .filter(Order.created_at.between(start_date, end_date))
-            .group_by(Dish.id, Category.id)
-            .order_by(func.sum(OrderItem.quantity).asc())
+            _menu_dishes_query(db, orders, order_dish, start_date, end_date, category_id, dish_id)
+            .order_by(func.sum(order_dish.quantity).asc())
             .limit(5)
         )
         
-        if category_id:
-            least_selling_dishes_query = least_selling_dishes_query.filter(Category.id == category_id)
-        if dish_id:
-            least_selling_dishes_query = least_selling_dishes_query.filter(Dish.id == dish_id)
-            
         least_selling_dishes_results = least_selling_dishes_query.all()
         
         # Формируем список наименее продаваемых блюд
@@ -642,30 +654,12 @@ def get_menu_metrics(
                 
         # Получаем самые прибыльные блюда
         profitable_dishes_query = (
-            db.query(
-                Dish.id.label("dishId"),
-                Dish.name.label("dishName"),
-                Category.id.label("categoryId"),
-                Category.name.label("categoryName"),
-                func.sum(OrderItem.quantity).label("salesCount"),
-                func.sum(OrderItem.quantity * OrderItem.price).label("revenue"),
-                Dish.cost_price.label("costPrice")
-            )
-            .join(OrderItem, Dish.id == OrderItem.dish_id)
-            .join(Order, OrderItem.order_id == Order.id)
-            .join(Category, Dish.category_id == Category.id)
-            .filter(Order.created_at.between(start_date, end_date))
-            .filter(Dish.cost_price.isnot(None))
-            .group_by(Dish.id, Category.id)
-            .order_by(func.sum(OrderItem.quantity * (OrderItem.price - Dish.cost_price)).desc())
+            _menu_dishes_query(db, orders, order_dish, start_date, end_date, category_id, dish_id)
+            .filter(order_dish.cost_price.isnot(None))
+            .order_by(func.sum(order_dish.quantity * (order_dish.price - order_dish.cost_price)).desc())
             .limit(5)
         )
         
-        if category_id:
-            profitable_dishes_query = profitable_dishes_query.filter(Category.id == category_id)
-        if dish_id:
-            profitable_dishes_query = profitable_dishes_query.filter(Dish.id == dish_id)
-            
         profitable_dishes_results = profitable_dishes_query.all()
         
         # Формируем список самых прибыльных блюд
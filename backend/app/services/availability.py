@@ -0,0 +1,222 @@
+"""
+Движок доступности столов.
+
+Для каждого стола и дня хранится отсортированный список начал активных бронирований.
+Все бронирования длятся RESERVATION_DURATION_MINUTES, поэтому бронь, начавшаяся в момент t,
+занимает интервал [t, t + D), и пересечение с запрошенным интервалом [start, end)
+означает, что t попадает в (start - D, end). Проверка стола - бинарный поиск (bisect)
+по спискам одного-двух дней, подбор столов по вместимости - бинарный поиск по столам,
+отсортированным по capacity.
+
+Индекс строится из таблиц reservations и restaurant_tables при первом обращении
+и обновляется точечно при создании, изменении, отмене и удалении брони. Время в индексе
+и в проверках - наивное, как в БД: время с часовым поясом переводится в UTC (to_naive).
+
+При нескольких воркерах блокировка индекса межпроцессная (SharedLock), а изменение брони
+увеличивает общую версию индекса (SharedVersion): остальные процессы перестраивают индекс
+при следующем обращении, поэтому проверка свободного стола видит брони всех воркеров.
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.process_sync import SharedLock, SharedVersion
+from app.models.reservation import Reservation, ReservationStatus
+from app.models.table import RestaurantTable
+from app.utils.date_utils import to_naive
+
+logger = logging.getLogger(__name__)
+
+# Статусы, при которых бронь занимает стол
+ACTIVE_STATUSES = {ReservationStatus.PENDING.value, ReservationStatus.CONFIRMED.value}
+
+
+class ReservationConflictError(ValueError):
+    """Стол уже занят на запрошенное время"""
+
+    def __init__(self, message: str, status_code: int = 409):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _status_value(value: Any) -> str:
+    return str(getattr(value, "value", value) or "").lower()
+
+
+class TableAvailability:
+    """Индекс занятости столов: {номер стола: {день: [(начало брони, id брони), ...]}}"""
+
+    def __init__(self, duration_minutes: int):
+        self.duration = timedelta(minutes=duration_minutes)
+        # Блокировка для связки "проверка - запись - обновление индекса" в сервисе бронирований
+        self.lock = SharedLock("availability")
+        self._version = SharedVersion("availability")
+        self._loaded = False
+        self._schedule: Dict[int, Dict[date, List[Tuple[datetime, int]]]] = {}
+        self._by_id: Dict[int, Tuple[int, datetime]] = {}
+        self._tables: List[Dict[str, Any]] = []
+        self._capacities: List[int] = []
+
+    def invalidate(self) -> None:
+        """Сбрасывает индекс; он будет построен заново при следующем обращении (во всех воркерах)"""
+        with self.lock:
+            self._loaded = False
+        self._version.bump()
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._version.changed():
+            self._loaded = False
+        if not self._loaded:
+            self.load(db)
+
+    def load(self, db: Session) -> None:
+        """Строит индекс из активных бронирований (начиная с вчерашнего дня) и активных столов"""
+        with self.lock:
+            self._schedule = {}
+            self._by_id = {}
+
+            border = datetime.utcnow() - self.duration - timedelta(days=1)
+            rows = db.query(
+                Reservation.id, Reservation.table_number, Reservation.reservation_time
+            ).filter(
+                Reservation.table_number.isnot(None),
+                Reservation.status.in_(ACTIVE_STATUSES),
+                Reservation.reservation_time >= border
+            ).all()
+            for row in rows:
+                self._add(row.id, row.table_number, row.reservation_time)
+
+            tables = [
+                table.to_dict() for table in db.query(RestaurantTable).filter(RestaurantTable.is_active.is_(True)).all()
+            ]
+            self._tables = sorted(tables, key=lambda table: table.get("capacity") or 0)
+            self._capacities = [table.get("capacity") or 0 for table in self._tables]
+
+            self._loaded = True
+            logger.info(f"Индекс доступности столов построен: {len(rows)} бронирований, {len(self._tables)} столов")
+
+    def _add(self, reservation_id: int, table_number: int, start: datetime) -> None:
+        start = to_naive(start)
+        insort(self._schedule.setdefault(table_number, {}).setdefault(start.date(), []), (start, reservation_id))
+        self._by_id[reservation_id] = (table_number, start)
+
+    def remove(self, reservation_id: int) -> None:
+        """Убирает бронь из индекса (отмена, удаление, перенос)"""
+        with self.lock:
+            self._remove(reservation_id)
+        self._version.bump()
+
+    def _remove(self, reservation_id: int) -> None:
+        entry = self._by_id.pop(reservation_id, None)
+        if entry is None:
+            return
+        table_number, start = entry
+        day = self._schedule.get(table_number, {}).get(start.date())
+        if day:
+            index = bisect_left(day, (start, reservation_id))
+            if index < len(day) and day[index] == (start, reservation_id):
+                del day[index]
+
+    def apply(self, reservation: Reservation) -> None:
+        """Приводит индекс в соответствие с сохраненной бронью"""
+        with self.lock:
+            if self._loaded:
+                self._remove(reservation.id)
+                if reservation.table_number and _status_value(reservation.status) in ACTIVE_STATUSES:
+                    self._add(reservation.id, reservation.table_number, reservation.reservation_time)
+        self._version.bump()
+
+    def find_conflict(
+        self,
+        table_number: int,
+        start: datetime,
+        end: Optional[datetime] = None,
+        exclude_id: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Возвращает ID брони, занимающей стол в интервале [start, end), или None.
+        По умолчанию end = start + длительность брони.
+        """
+        start = to_naive(start)
+        end = to_naive(end) if end else start + self.duration
+        lower = start - self.duration
+        days = self._schedule.get(table_number, {})
+
+        day = lower.date()
+        while day <= end.date():
+            items = days.get(day)
+            if items:
+                # Первая бронь, начавшаяся строго позже lower
+                index = bisect_right(items, (lower, float("inf")))
+                while index < len(items) and items[index][0] < end:
+                    if items[index][1] != exclude_id:
+                        return items[index][1]
+                    index += 1
+            day += timedelta(days=1)
+        return None
+
+    def is_table_free(
+        self,
+        db: Session,
+        table_number: int,
+        start: datetime,
+        end: Optional[datetime] = None,
+        exclude_id: Optional[int] = None
+    ) -> bool:
+        """Свободен ли стол в интервале [start, end)"""
+        self.ensure_loaded(db)
+        return self.find_conflict(table_number, to_naive(start), end and to_naive(end), exclude_id) is None
+
+    def ensure_available(
+        self,
+        db: Session,
+        table_number: int,
+        start: datetime,
+        exclude_id: Optional[int] = None
+    ) -> None:
+        """Проверяет, что стол свободен на время брони; иначе ReservationConflictError"""
+        self.ensure_loaded(db)
+        conflict_id = self.find_conflict(table_number, to_naive(start), exclude_id=exclude_id)
+        if conflict_id is not None:
+            raise ReservationConflictError(
+                f"Стол {table_number} уже забронирован на это время (бронирование #{conflict_id})"
+            )
+
+    def get_tables(self, db: Session) -> List[Dict[str, Any]]:
+        """Активные столы по возрастанию вместимости"""
+        self.ensure_loaded(db)
+        return list(self._tables)
+
+    def next_free_time(self, table_number: int, start: datetime, max_steps: int = 50) -> datetime:
+        """Ближайшее время не раньше start, с которого стол свободен на длительность брони"""
+        start = to_naive(start)
+        for _ in range(max_steps):
+            conflict_id = self.find_conflict(table_number, start)
+            if conflict_id is None:
+                break
+            # Сдвигаемся на окончание мешающей брони
+            start = max(start, self._by_id[conflict_id][1] + self.duration)
+        return start
+
+    def free_tables(
+        self,
+        db: Session,
+        guests_count: int,
+        start: datetime,
+        end: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Свободные в интервале [start, end) столы, вмещающие guests_count гостей (по возрастанию вместимости)"""
+        self.ensure_loaded(db)
+        first = bisect_left(self._capacities, guests_count)
+        return [
+            table for table in self._tables[first:]
+            if self.find_conflict(table["number"], start, end) is None
+        ]
+
+
+availability = TableAvailability(settings.RESERVATION_DURATION_MINUTES)
@@ -1,47 +1,218 @@
-from datetime import datetime, date
-from sqlalchemy import func
-from app.models.order import Order
-from app.models.user import User
+"""
+Счетчики панели администратора.
+
+Вместо подсчета по таблицам orders, users, dishes и reservations при каждом запросе
+панель читает одну строку dashboard_counters. Строку обновляют сами пути записи
+в той же транзакции, что и изменение данных:
+- изменения через ORM (создание и удаление заказов, бронирований, пользователей и блюд,
+  смена статуса оплаты и суммы заказа, перенос брони) учитывает обработчик after_flush
+  сессий приложения (SessionLocal); сессии скриптов и других движков строку не трогают;
+- смены статусов одним UPDATE (app.services.order_state) вызывают apply_counter_deltas сами.
+
+Поля "за сегодня" относятся к дню в колонке day - дню по UTC, как created_at заказов
+и время броней в базе. Первая запись нового дня (или первый
+запрос панели) пересчитывает строку целиком по таблицам - это и ежедневный сброс,
+и исправление возможного расхождения после изменений в обход ORM (исправления данных,
+ручные правки в базе). Архивация заказов (app.services.order_archive) счетчики не меняет:
+перенесенные заказы остаются в общем числе заказов.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Union
+import logging
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.database.session import SessionLocal, insert_ignore
+from app.models.dashboard import DashboardCounters
 from app.models.menu import Dish
+from app.models.order import Order, PaymentStatus, PAYMENT_STATUS_ALIASES, normalize_status_value
+from app.models.order_archive import ArchivedOrder
 from app.models.reservation import Reservation
-from app.database.session import get_db
-
-def get_dashboard_stats():
-    db = next(get_db())
-    
-    # Получаем текущую дату
-    today = date.today()
-    
-    # Заказы за сегодня
-    orders_today = db.query(Order).filter(
-        func.date(Order.created_at) == today
-    ).count()
-    
-    # Всего заказов
-    orders_total = db.query(Order).count()
-    
-    # Выручка за сегодня
-    revenue = db.query(func.sum(Order.total_amount)).filter(
-        func.date(Order.created_at) == today,
-        Order.payment_status == 'paid'
-    ).scalar() or 0
-    
-    # Бронирования на сегодня
-    reservations_today = db.query(Reservation).filter(
-        func.date(Reservation.reservation_time) == today
-    ).count()
-    
-    # Количество пользователей
-    users_count = db.query(User).count()
-    
-    # Количество блюд
-    dishes_count = db.query(Dish).count()
-    
+from app.models.user import User
+from app.utils.date_utils import day_bounds, to_naive
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_ID = 1
+
+# Счетчики, которые меняются приращениями
+COUNTER_FIELDS = ("orders_today", "orders_total", "revenue_today", "reservations_today", "users", "dishes")
+
+
+def _today() -> date:
+    """Текущий день по UTC (время в базе хранится в UTC)"""
+    return datetime.utcnow().date()
+
+
+def _count(executor: Union[Session, Connection], stmt) -> int:
+    return executor.execute(stmt).scalar() or 0
+
+
+def recount_counters(executor: Union[Session, Connection], today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Пересчитывает строку счетчиков по таблицам в текущей транзакции (фиксирует вызывающий).
+    Изменения этой транзакции, уже отправленные в базу, входят в результат.
+
+    Returns:
+        Новые значения счетчиков
+    """
+    today = today or _today()
+    start, end = day_bounds(today)
+    values = {
+        "day": today,
+        "orders_today": _count(executor, select(func.count(Order.id)).where(
+            Order.created_at >= start, Order.created_at < end
+        )),
+        "orders_total": (
+            _count(executor, select(func.count(Order.id)))
+            + _count(executor, select(func.count(ArchivedOrder.order_id)))
+        ),
+        "revenue_today": float(executor.execute(select(func.sum(Order.total_amount)).where(
+            Order.created_at >= start, Order.created_at < end,
+            Order.payment_status == PaymentStatus.PAID.value
+        )).scalar() or 0),
+        "reservations_today": _count(executor, select(func.count(Reservation.id)).where(
+            Reservation.reservation_time >= start, Reservation.reservation_time < end
+        )),
+        "users": _count(executor, select(func.count(User.id))),
+        "dishes": _count(executor, select(func.count(Dish.id))),
+        "updated_at": datetime.utcnow(),
+    }
+
+    updated = executor.execute(
+        update(DashboardCounters).where(DashboardCounters.id == COUNTERS_ID).values(**values)
+    ).rowcount
+    if not updated:
+        executor.execute(insert_ignore(DashboardCounters.__table__), [{"id": COUNTERS_ID, **values}])
+    logger.info(f"Счетчики панели администратора пересчитаны за {today}")
+    return values
+
+
+def apply_counter_deltas(executor: Union[Session, Connection], **deltas: float) -> None:
+    """
+    Прибавляет приращения к счетчикам в текущей транзакции (фиксирует вызывающий).
+    Вызывается после изменения данных: если строка относится к прошлому дню или ее еще нет,
+    она пересчитывается целиком, и пересчет уже учитывает это изменение.
+
+    Args:
+        executor: Сессия или соединение транзакции, в которой изменены данные
+        deltas: Приращения полей из COUNTER_FIELDS
+    """
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    today = _today()
+    values: Dict[str, Any] = {
+        name: getattr(DashboardCounters, name) + value for name, value in deltas.items()
+    }
+    values["updated_at"] = datetime.utcnow()
+    updated = executor.execute(
+        update(DashboardCounters)
+        .where(DashboardCounters.id == COUNTERS_ID, DashboardCounters.day == today)
+        .values(**values)
+    ).rowcount
+    if not updated:
+        recount_counters(executor, today)
+
+
+def paid_amount_today(payment_status: Any, total_amount: Optional[float], created_at: Optional[datetime]) -> float:
+    """Вклад заказа в выручку за сегодня: сумма оплаченного заказа, созданного сегодня"""
+    if normalize_status_value(payment_status, PAYMENT_STATUS_ALIASES) != PaymentStatus.PAID.value:
+        return 0.0
+    if created_at is not None:
+        start, end = day_bounds(_today())
+        if not start <= to_naive(created_at) < end:
+            return 0.0
+    return float(total_amount or 0)
+
+
+def _is_today(moment: Optional[datetime]) -> bool:
+    start, end = day_bounds(_today())
+    return moment is not None and start <= to_naive(moment) < end
+
+
+def _change(obj: Any, name: str):
+    """Значения атрибута до и после flush (без загрузки из базы; None - значение не загружено)"""
+    history = inspect(obj).attrs[name].history
+    before = (history.deleted or history.unchanged or [None])[0]
+    after = (history.added or history.unchanged or [None])[0]
+    return before, after
+
+
+def _order_revenue(obj: Order, after: bool) -> float:
+    index = 1 if after else 0
+    return paid_amount_today(
+        _change(obj, "payment_status")[index],
+        _change(obj, "total_amount")[index],
+        _change(obj, "created_at")[index]
+    )
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _track_counters(session: Session, flush_context) -> None:
+    """Переносит изменения заказов, бронирований, пользователей и блюд из flush в счетчики"""
+    deltas = dict.fromkeys(COUNTER_FIELDS, 0)
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            deltas["orders_total"] += 1
+            # Дата создания заполняется значением по умолчанию при вставке
+            created_at = _change(obj, "created_at")[1]
+            deltas["orders_today"] += 1 if created_at is None or _is_today(created_at) else 0
+            deltas["revenue_today"] += _order_revenue(obj, after=True)
+        elif isinstance(obj, Reservation):
+            deltas["reservations_today"] += _is_today(obj.reservation_time)
+        elif isinstance(obj, User):
+            deltas["users"] += 1
+        elif isinstance(obj, Dish):
+            deltas["dishes"] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            deltas["orders_total"] -= 1
+            deltas["orders_today"] -= _is_today(_change(obj, "created_at")[0])
+            deltas["revenue_today"] -= _order_revenue(obj, after=False)
+        elif isinstance(obj, Reservation):
+            deltas["reservations_today"] -= _is_today(_change(obj, "reservation_time")[0])
+        elif isinstance(obj, User):
+            deltas["users"] -= 1
+        elif isinstance(obj, Dish):
+            deltas["dishes"] -= 1
+
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            deltas["revenue_today"] += _order_revenue(obj, after=True) - _order_revenue(obj, after=False)
+        elif isinstance(obj, Reservation):
+            before, after = _change(obj, "reservation_time")
+            deltas["reservations_today"] += _is_today(after) - _is_today(before)
+
+    apply_counter_deltas(session.connection(), **deltas)
+
+
+def refresh_counters(db: Session) -> Dict[str, Any]:
+    """Пересчитывает счетчики и фиксирует транзакцию (подготовка базы, запрос панели в новый день)"""
+    values = recount_counters(db)
+    db.commit()
+    return values
+
+
+def get_dashboard_stats(db: Session) -> Dict[str, Any]:
+    """
+    Статистика для панели администратора из строки счетчиков.
+    Если строка относится к прошлому дню (за сегодня еще не было записей), она пересчитывается.
+    """
+    counters = db.get(DashboardCounters, COUNTERS_ID)
+    if counters is None or counters.day != _today():
+        refresh_counters(db)
+        counters = db.get(DashboardCounters, COUNTERS_ID, populate_existing=True)
+
     return {
-        "ordersToday": orders_today,
-        "ordersTotal": orders_total,
-        "revenue": float(revenue),
-        "reservationsToday": reservations_today,
-        "users": users_count,
-        "dishes": dishes_count
-    } 
\ No newline at end of file
+        "ordersToday": counters.orders_today,
+        "ordersTotal": counters.orders_total,
+        "revenue": float(counters.revenue_today),
+        "reservationsToday": counters.reservations_today,
+        "users": counters.users,
+        "dishes": counters.dishes
+    }
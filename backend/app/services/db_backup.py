@@ -0,0 +1,252 @@
+"""
+Резервные копии SQLite через online backup API.
+
+Копирование файла работающей базы в режиме WAL небезопасно: последние транзакции лежат
+в файле -wal, а файл базы может меняться во время копирования. Снимок создается через
+sqlite3 backup API (sqlite3_backup_step) шагами по DB_BACKUP_PAGES_PER_STEP страниц
+с паузой DB_BACKUP_STEP_SLEEP_MS между шагами, поэтому копирование не занимает диск
+и блокировки надолго.
+
+Пока идет копирование, исходное соединение держит открытую читающую транзакцию: все шаги
+читают один и тот же снимок базы. Без нее каждая фиксация другого соединения перезапускала бы
+копирование с начала, и при постоянной записи заказов оно не завершалось бы. Читающая
+транзакция не мешает писателям (WAL), но контрольная точка не продвинется дальше снимка,
+пока копирование не закончится.
+
+Снимок - каталог data/backups/<YYYYMMDD_HHMMSS>/ с копией основной базы и месячных архивов
+заказов (app.services.order_archive). Основная база копируется первой: заказ, перенесенный
+в архив между копированиями, окажется в обеих копиях, но не потеряется. Копия проверяется
+PRAGMA quick_check и переводится в journal_mode=DELETE (один файл без -wal); каталог
+появляется под окончательным именем только после проверки. Хранятся последние
+DB_BACKUP_RETENTION снимков.
+
+Восстановление (restore_backup, scripts/db_backup.py restore) выполняется при остановленном
+приложении: текущая база сначала сохраняется отдельным снимком, затем содержимое снимка
+записывается в файлы базы через тот же backup API.
+
+Для PostgreSQL резервные копии делаются средствами сервера (pg_dump, PITR).
+"""
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import logging
+import shutil
+import sqlite3
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.session import IS_SQLITE, engine
+from app.services import order_archive
+
+logger = logging.getLogger(__name__)
+
+DATABASE_PATH = Path(engine.url.database).resolve() if IS_SQLITE else None
+BACKUP_DIR = DATABASE_PATH.parent / "backups" if IS_SQLITE else None
+SNAPSHOT_NAME_FORMAT = "%Y%m%d_%H%M%S"
+
+# Один снимок за раз; состояние последнего снимка - под отдельной блокировкой,
+# чтобы GET /api/v1/health/db не ждал окончания копирования
+_backup_lock = threading.Lock()
+_state_lock = threading.Lock()
+_last_backup: Dict[str, Any] = {}
+
+
+def _copy_database(source_path: Path, target_path: Path) -> Dict[str, Any]:
+    """
+    Копирует базу source_path в target_path через backup API шагами с паузами.
+
+    Returns:
+        Количество страниц и шагов копирования
+    """
+    source = sqlite3.connect(f"file:{source_path.as_posix()}?mode=ro", uri=True, timeout=30, isolation_level=None)
+    target = sqlite3.connect(target_path, timeout=30, isolation_level=None)
+    steps = 0
+    pages = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps, pages
+        steps += 1
+        pages = total
+        if remaining:
+            time.sleep(settings.DB_BACKUP_STEP_SLEEP_MS / 1000)
+
+    try:
+        # Читающая транзакция фиксирует снимок, который копируют все шаги
+        source.execute("BEGIN")
+        source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        source.backup(target, pages=settings.DB_BACKUP_PAGES_PER_STEP, progress=progress)
+        source.execute("ROLLBACK")
+    finally:
+        source.close()
+        target.close()
+    return {"pages": pages, "steps": steps}
+
+
+def _finalize_snapshot(path: Path) -> None:
+    """Проверяет копию и переводит ее в journal_mode=DELETE (один файл без -wal)"""
+    _verify(path)
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        connection.close()
+
+
+def _verify(path: Path) -> None:
+    connection = sqlite3.connect(path)
+    try:
+        result = connection.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        connection.close()
+    if result != "ok":
+        raise RuntimeError(f"Копия {path.name} не прошла проверку: {result}")
+
+
+def list_backups() -> List[Dict[str, Any]]:
+    """Снимки от новых к старым: имя, время создания, размер"""
+    if BACKUP_DIR is None or not BACKUP_DIR.is_dir():
+        return []
+    backups = []
+    for path in sorted(BACKUP_DIR.iterdir(), reverse=True):
+        try:
+            created_at = datetime.strptime(path.name, SNAPSHOT_NAME_FORMAT)
+        except ValueError:
+            # Незавершенные снимки (*.partial) и посторонние файлы
+            continue
+        backups.append({
+            "name": path.name,
+            "created_at": created_at,
+            "bytes": sum(file.stat().st_size for file in path.rglob("*.db")),
+        })
+    return backups
+
+
+def _apply_retention() -> List[str]:
+    """Удаляет снимки сверх DB_BACKUP_RETENTION; возвращает имена удаленных"""
+    removed = []
+    for backup in list_backups()[max(settings.DB_BACKUP_RETENTION, 1):]:
+        shutil.rmtree(BACKUP_DIR / backup["name"], ignore_errors=True)
+        removed.append(backup["name"])
+    return removed
+
+
+def create_backup(db: Optional[Session] = None, apply_retention: bool = True) -> Dict[str, Any]:
+    """
+    Создает снимок базы и архивов заказов (см. описание модуля).
+    Параметр db не используется: копирование идет через отдельные соединения sqlite3.
+    apply_retention=False - не удалять старые снимки (перед восстановлением из одного из них).
+
+    Returns:
+        Имя снимка, размер, длительность и количество шагов копирования
+    """
+    if not IS_SQLITE:
+        return {}
+
+    with _backup_lock:
+        started = time.monotonic()
+        BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+        name = datetime.utcnow().strftime(SNAPSHOT_NAME_FORMAT)
+        while (BACKUP_DIR / name).exists():
+            # Снимок в эту секунду уже создан - ждем следующую, имя должно быть уникальным
+            time.sleep(0.1)
+            name = datetime.utcnow().strftime(SNAPSHOT_NAME_FORMAT)
+        partial_dir = BACKUP_DIR / f"{name}.partial"
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        (partial_dir / "archive").mkdir(parents=True)
+
+        try:
+            # Основная база - первой (см. описание модуля)
+            result = _copy_database(DATABASE_PATH, partial_dir / DATABASE_PATH.name)
+            _finalize_snapshot(partial_dir / DATABASE_PATH.name)
+            for month in order_archive.archive_months():
+                target = partial_dir / "archive" / order_archive.archive_path(month).name
+                _copy_database(order_archive.archive_path(month), target)
+                _finalize_snapshot(target)
+            partial_dir.rename(BACKUP_DIR / name)
+        except Exception:
+            shutil.rmtree(partial_dir, ignore_errors=True)
+            raise
+
+        removed = _apply_retention() if apply_retention else []
+        backup = {
+            "name": name,
+            "bytes": sum(file.stat().st_size for file in (BACKUP_DIR / name).rglob("*.db")),
+            "duration_seconds": round(time.monotonic() - started, 3),
+            "steps": result["steps"],
+            "pages": result["pages"],
+            "removed": removed,
+            "created_at": datetime.utcnow(),
+        }
+        with _state_lock:
+            _last_backup.clear()
+            _last_backup.update(backup)
+
+    logger.info(
+        f"Создана резервная копия {name}: {backup['bytes']} байт за {backup['duration_seconds']} с "
+        f"({backup['steps']} шагов), удалено старых копий: {len(removed)}"
+    )
+    return backup
+
+
+def run_scheduled_backup(db: Optional[Session] = None) -> Dict[str, Any]:
+    """
+    Создает снимок, если последний старше DB_BACKUP_INTERVAL_SECONDS.
+    Возраст определяется по каталогам снимков, поэтому перезапуск приложения
+    не приводит к лишнему снимку.
+    """
+    if not IS_SQLITE or settings.DB_BACKUP_INTERVAL_SECONDS <= 0:
+        return {}
+    backups = list_backups()
+    if backups and (datetime.utcnow() - backups[0]["created_at"]).total_seconds() < settings.DB_BACKUP_INTERVAL_SECONDS:
+        return {}
+    return create_backup(db)
+
+
+def get_last_backup() -> Optional[Dict[str, Any]]:
+    """Результат последнего снимка в этом процессе или самый новый снимок на диске"""
+    with _state_lock:
+        if _last_backup:
+            return dict(_last_backup)
+    backups = list_backups()
+    return backups[0] if backups else None
+
+
+def restore_backup(name: str) -> Dict[str, Any]:
+    """
+    Восстанавливает базу и архивы заказов из снимка name. Приложение должно быть остановлено:
+    открытые соединения других процессов продолжили бы работать со старыми данными.
+
+    Returns:
+        Имя восстановленного снимка и снимка текущей базы, сделанного перед восстановлением
+    """
+    if not IS_SQLITE:
+        raise RuntimeError("Восстановление из снимка поддерживается только для SQLite")
+    snapshot_dir = BACKUP_DIR / name
+    snapshot_database = snapshot_dir / DATABASE_PATH.name
+    if not snapshot_database.is_file():
+        raise FileNotFoundError(f"Снимок {name} не найден в {BACKUP_DIR}")
+    _verify(snapshot_database)
+
+    # Текущее состояние сохраняется, чтобы восстановление можно было отменить
+    previous = create_backup(apply_retention=False) if DATABASE_PATH.exists() else {}
+
+    engine.dispose()
+    # Режим WAL файла базы сохраняется; приложение включает его и при подключении
+    _copy_database(snapshot_database, DATABASE_PATH)
+
+    restored_months = []
+    for archive_file in sorted((snapshot_dir / "archive").glob("orders_*.db")):
+        order_archive.ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+        _copy_database(archive_file, order_archive.ARCHIVE_DIR / archive_file.name)
+        restored_months.append(archive_file.name)
+    # Архивы месяцев, которых не было на момент снимка, в восстановленной базе не упоминаются
+    snapshot_archives = set(restored_months)
+    for archive_file in order_archive.ARCHIVE_DIR.glob("orders_*.db") if order_archive.ARCHIVE_DIR.is_dir() else ():
+        if archive_file.name not in snapshot_archives:
+            archive_file.unlink()
+
+    logger.info(f"База восстановлена из снимка {name}, предыдущее состояние сохранено в {previous.get('name')}")
+    return {"restored": name, "archives": restored_months, "previous_backup": previous.get("name")}
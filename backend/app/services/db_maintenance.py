@@ -0,0 +1,172 @@
+"""
+Фоновое обслуживание SQLite.
+
+Автоматическая контрольная точка SQLite (wal_autocheckpoint) выполняется в режиме PASSIVE
+и не завершается, пока открыты читающие транзакции, поэтому при постоянной записи файл
+-wal растет, а чтение замедляется. Файл базы после удалений не уменьшается.
+
+За один запуск (раз в DB_MAINTENANCE_INTERVAL_SECONDS):
+- в период затишья (нет фиксаций дольше DB_MAINTENANCE_QUIET_SECONDS) incremental_vacuum
+  на DB_INCREMENTAL_VACUUM_PAGES страниц, если в базе включен auto_vacuum=INCREMENTAL
+  и есть свободные страницы;
+- wal_checkpoint(PASSIVE), не мешающий читателям и писателям, а в период затишья вместо
+  него wal_checkpoint(TRUNCATE), который обнуляет файл -wal.
+
+Затишье определяется по фиксациям в текущем процессе; при нескольких воркерах
+обслуживание выполняет один из них (см. app.main), и записи других воркеров он не видит,
+поэтому TRUNCATE может подождать их транзакций (busy_timeout).
+
+Метрики последнего запуска (размер -wal, свободные страницы, результат контрольной точки)
+доступны через get_metrics() и GET /api/v1/health/db.
+
+Для PostgreSQL обслуживание не требуется (контрольные точки и autovacuum выполняет сервер):
+run_maintenance ничего не делает, а метрики содержат только размер базы.
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.session import IS_SQLITE, engine
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+_lock = threading.Lock()
+_last_commit = time.monotonic()
+_last_run: Dict[str, Any] = {}
+
+
+@event.listens_for(engine, "commit")
+def _mark_commit(conn) -> None:
+    global _last_commit
+    _last_commit = time.monotonic()
+
+
+def is_quiet() -> bool:
+    """Не было ли фиксаций транзакций дольше DB_MAINTENANCE_QUIET_SECONDS"""
+    return time.monotonic() - _last_commit >= settings.DB_MAINTENANCE_QUIET_SECONDS
+
+
+def _wal_size() -> int:
+    try:
+        return os.path.getsize(f"{engine.url.database}-wal")
+    except OSError:
+        return 0
+
+
+def collect_metrics(conn=None) -> Dict[str, Any]:
+    """Размер файла -wal, размер базы и свободные страницы"""
+    if conn is None:
+        with engine.connect() as own_conn:
+            return collect_metrics(own_conn)
+
+    if not IS_SQLITE:
+        metrics: Dict[str, Any] = {"backend": engine.dialect.name}
+        if engine.dialect.name == "postgresql":
+            metrics["db_bytes"] = conn.execute(text("SELECT pg_database_size(current_database())")).scalar()
+        return metrics
+
+    def pragma(name: str) -> int:
+        return conn.execute(text(f"PRAGMA {name}")).scalar() or 0
+
+    page_size = pragma("page_size")
+    page_count = pragma("page_count")
+    freelist_count = pragma("freelist_count")
+    return {
+        "wal_bytes": _wal_size(),
+        "db_bytes": page_size * page_count,
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_count": freelist_count,
+        "freelist_bytes": page_size * freelist_count,
+        "auto_vacuum": AUTO_VACUUM_MODES.get(pragma("auto_vacuum"), "unknown"),
+    }
+
+
+def run_maintenance(db: Optional[Session] = None) -> Dict[str, Any]:
+    """
+    Выполняет один запуск обслуживания (см. описание модуля).
+    Параметр db не используется: PRAGMA выполняются на отдельном соединении вне транзакции.
+
+    Returns:
+        Метрики и результат запуска
+    """
+    if not IS_SQLITE:
+        return {}
+
+    with _lock, engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        quiet = is_quiet()
+        wal_before = _wal_size()
+
+        vacuumed_pages = 0
+        metrics = collect_metrics(conn)
+        if quiet and metrics["auto_vacuum"] == "incremental" and metrics["freelist_count"]:
+            # Драйвер sqlite3 выполняет только первый шаг PRAGMA incremental_vacuum(N), а каждый
+            # шаг освобождает одну страницу, поэтому освобождаем по одной странице за вызов
+            for _ in range(min(settings.DB_INCREMENTAL_VACUUM_PAGES, metrics["freelist_count"])):
+                conn.execute(text("PRAGMA incremental_vacuum(1)"))
+            vacuumed_pages = metrics["freelist_count"] - (conn.execute(text("PRAGMA freelist_count")).scalar() or 0)
+
+        # Контрольная точка после освобождения страниц, чтобы в -wal не остались и его изменения
+        mode = "TRUNCATE" if quiet else "PASSIVE"
+        busy, wal_frames, checkpointed = conn.execute(text(f"PRAGMA wal_checkpoint({mode})")).one()
+        metrics = collect_metrics(conn)
+
+    result = {
+        **metrics,
+        "quiet": quiet,
+        "checkpoint_mode": mode,
+        "checkpoint_busy": bool(busy),
+        "checkpoint_wal_frames": wal_frames,
+        "checkpoint_checkpointed_frames": checkpointed,
+        "vacuumed_pages": vacuumed_pages,
+        "run_at": datetime.utcnow(),
+    }
+    with _lock:
+        _last_run.clear()
+        _last_run.update(result)
+
+    if wal_before != metrics["wal_bytes"] or vacuumed_pages:
+        logger.info(
+            f"Обслуживание БД: контрольная точка {mode}, -wal {wal_before} -> {metrics['wal_bytes']} байт, "
+            f"освобождено страниц {vacuumed_pages}, свободных осталось {metrics['freelist_count']}"
+        )
+    if busy:
+        logger.warning(f"Контрольная точка WAL ({mode}) не завершена: база занята")
+    return result
+
+
+def get_metrics() -> Dict[str, Any]:
+    """Текущие метрики базы и результат последнего запуска обслуживания"""
+    with _lock:
+        last_run = dict(_last_run)
+    return {**collect_metrics(), "quiet": is_quiet(), "last_run": last_run or None}
+
+
+def enable_incremental_vacuum(db: Optional[Session] = None) -> bool:
+    """
+    Переводит существующую базу в auto_vacuum=INCREMENTAL. Для уже созданной базы режим
+    меняется только после VACUUM (перезапись всего файла), поэтому шаг выполняется один раз
+    при подготовке базы. Новые базы создаются сразу в этом режиме (см. app.database.session).
+
+    Returns:
+        True, если база была переведена в новый режим
+    """
+    if not IS_SQLITE:
+        return False
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+            return False
+        started = time.monotonic()
+        conn.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+    logger.info(f"База переведена в режим auto_vacuum=INCREMENTAL за {time.monotonic() - started:.1f} с")
+    return True
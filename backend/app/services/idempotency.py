@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import logging
+import re
+import time
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.session import SessionLocal
+from app.models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Мутирующие запросы, для которых поддерживается Idempotency-Key:
+# создание заказа, изменение статуса и статуса оплаты (включая все алиасы из main.py)
+IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH"}
+IDEMPOTENT_PATHS = [
+    re.compile(r"^/api/(v1/)?orders/?$"),
+    re.compile(r"^/api/(v1/)?orders/.+"),
+    re.compile(r"^/api/v1/waiter/orders/.+"),
+    re.compile(r"^/api/(v1/)?direct/order-status/.+"),
+    re.compile(r"^/api/simple-update/.+"),
+    re.compile(r"^/api/simple/orders/.+"),
+]
+
+MAX_KEY_LENGTH = 128
+
+# Время последней очистки устаревших ключей (монотонные часы процесса)
+_last_cleanup = 0.0
+
+
+def is_idempotent_request(method: str, path: str) -> bool:
+    """Проверяет, поддерживает ли запрос заголовок Idempotency-Key"""
+    if method.upper() not in IDEMPOTENT_METHODS:
+        return False
+    return any(pattern.match(path) for pattern in IDEMPOTENT_PATHS)
+
+
+def _expiration_border() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+
+
+def _lease_border() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+
+
+def get_stored_key(db: Session, key: str) -> Optional[IdempotencyKey]:
+    """Возвращает сохраненную запись для ключа, если она не устарела"""
+    record = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+    if record and record.created_at < _expiration_border():
+        # Устаревший ключ считается отсутствующим
+        db.delete(record)
+        db.commit()
+        return None
+    return record
+
+
+def reserve_key(db: Session, key: str, endpoint: str) -> bool:
+    """
+    Резервирует ключ перед выполнением запроса.
+
+    Returns:
+        True, если ключ зарезервирован этим запросом; False, если ключ уже занят
+        (параллельный запрос с тем же ключом)
+    """
+    try:
+        db.add(IdempotencyKey(key=key, endpoint=endpoint, created_at=datetime.utcnow()))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+
+
+def take_over_key(db: Session, key: str, endpoint: str) -> bool:
+    """
+    Занимает ключ, запрос по которому начался раньше IDEMPOTENCY_LEASE_SECONDS и так и не
+    сохранил ответ (процесс упал во время запроса). Условный UPDATE гарантирует, что брошенный
+    ключ займет только один из параллельных повторов.
+
+    Returns:
+        True, если ключ занят этим запросом
+    """
+    taken = db.query(IdempotencyKey).filter(
+        IdempotencyKey.key == key,
+        IdempotencyKey.status_code.is_(None),
+        IdempotencyKey.created_at < _lease_border()
+    ).update({"endpoint": endpoint, "created_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return bool(taken)
+
+
+def save_response(db: Session, key: str, status_code: int, body: bytes, media_type: Optional[str]) -> None:
+    """Сохраняет ответ для зарезервированного ключа"""
+    db.query(IdempotencyKey).filter(IdempotencyKey.key == key).update({
+        "status_code": status_code,
+        "response_body": body.decode("utf-8", errors="replace"),
+        "media_type": media_type
+    }, synchronize_session=False)
+    db.commit()
+
+
+def release_key(db: Session, key: str) -> None:
+    """Освобождает ключ, если запрос завершился ошибкой сервера (клиент может повторить запрос)"""
+    db.query(IdempotencyKey).filter(IdempotencyKey.key == key).delete(synchronize_session=False)
+    db.commit()
+
+
+def purge_expired_keys(db: Session, force: bool = False) -> int:
+    """
+    Удаляет устаревшие ключи. Без force выполняется не чаще, чем раз в
+    IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS.
+
+    Returns:
+        Количество удаленных записей
+    """
+    global _last_cleanup
+
+    now = time.monotonic()
+    if not force and now - _last_cleanup < settings.IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS:
+        return 0
+    _last_cleanup = now
+
+    deleted = db.query(IdempotencyKey).filter(
+        IdempotencyKey.created_at < _expiration_border()
+    ).delete(synchronize_session=False)
+    db.commit()
+
+    if deleted:
+        logger.info(f"Удалено {deleted} устаревших ключей идемпотентности")
+    return deleted
+
+
+def begin_request(key: str, endpoint: str) -> Optional[IdempotencyKey]:
+    """
+    Находит сохраненный ответ для ключа или резервирует ключ под текущий запрос.
+    Работает в собственной сессии и синхронно обращается к БД - из middleware
+    вызывается через пул потоков, чтобы не блокировать цикл событий.
+
+    Запись без ответа старше IDEMPOTENCY_LEASE_SECONDS считается брошенной и занимается
+    текущим запросом.
+
+    Returns:
+        Запись ключа, если он уже использован (ответ сохранен или запрос еще выполняется);
+        None, если ключ зарезервирован этим запросом
+    """
+    db = SessionLocal()
+    try:
+        purge_expired_keys(db)
+        stored = get_stored_key(db, key)
+        if stored is None and not reserve_key(db, key, endpoint):
+            # Ключ успели зарезервировать параллельным запросом
+            stored = get_stored_key(db, key)
+        if stored is not None and stored.status_code is None and take_over_key(db, key, endpoint):
+            logger.warning(f"Запрос по Idempotency-Key не завершился за {settings.IDEMPOTENCY_LEASE_SECONDS} с, ключ занят повтором")
+            stored = None
+        return stored
+    finally:
+        db.close()
+
+
+def finish_request(key: str, status_code: Optional[int], body: bytes = b"", media_type: Optional[str] = None) -> None:
+    """
+    Сохраняет ответ для зарезервированного ключа. Если запрос завершился исключением
+    (status_code=None) или ошибкой сервера, ключ освобождается - клиент может повторить запрос.
+    """
+    db = SessionLocal()
+    try:
+        if status_code is None or status_code >= 500:
+            release_key(db, key)
+        else:
+            save_response(db, key, status_code, body, media_type)
+    finally:
+        db.close()
@@ -0,0 +1,105 @@
+"""
+Очередь исходящих уведомлений.
+
+Уведомления сохраняются в таблицу notifications и отправляются фоновым планировщиком
+пакетами. Email отправляется через SMTP из настроек ресторана (Settings.smtp_*, через кэш настроек).
+SMS-уведомления ставятся в очередь с отправителем Settings.sms_sender и остаются
+в статусе pending до подключения SMS-шлюза.
+"""
+from datetime import datetime
+from email.message import EmailMessage
+from typing import Any, Dict, List
+import logging
+import smtplib
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.notification import Notification, NotificationStatus
+from app.services.settings_cache import settings_cache
+
+logger = logging.getLogger(__name__)
+
+EMAIL = "email"
+SMS = "sms"
+
+
+def queue_notifications(db: Session, notifications: List[Dict[str, Any]]) -> int:
+    """
+    Ставит уведомления в очередь одной пакетной вставкой (без фиксации транзакции).
+
+    Args:
+        notifications: Словари с полями channel, recipient, subject, body, reservation_id
+    """
+    if not notifications:
+        return 0
+    now = datetime.utcnow()
+    db.execute(
+        insert(Notification.__table__),
+        [{**notification, "status": NotificationStatus.PENDING, "created_at": now} for notification in notifications]
+    )
+    return len(notifications)
+
+
+def _send_email(db_settings: Any, recipient: str, subject: str, body: str) -> None:
+    message = EmailMessage()
+    message["From"] = f"{db_settings.smtp_from_name or ''} <{db_settings.smtp_from_email or db_settings.smtp_user}>"
+    message["To"] = recipient
+    message["Subject"] = subject or ""
+    message.set_content(body)
+
+    smtp_class = smtplib.SMTP_SSL if db_settings.smtp_port == 465 else smtplib.SMTP
+    with smtp_class(db_settings.smtp_host, db_settings.smtp_port or 25, timeout=10) as smtp:
+        if smtp_class is smtplib.SMTP:
+            smtp.starttls()
+        if db_settings.smtp_user:
+            smtp.login(db_settings.smtp_user, db_settings.smtp_password or "")
+        smtp.send_message(message)
+
+
+def deliver_pending_emails(db: Session, batch_size: int = 50) -> int:
+    """
+    Отправляет пакет ожидающих email-уведомлений, если в настройках задан SMTP-сервер.
+    Результат отправки фиксируется одним UPDATE на каждый исход (отправлено / ошибка).
+
+    Returns:
+        Количество отправленных писем
+    """
+    db_settings = settings_cache.get(db)
+    if not db_settings.smtp_host:
+        return 0
+
+    rows = db.execute(
+        select(Notification.id, Notification.recipient, Notification.subject, Notification.body)
+        .where(Notification.status == NotificationStatus.PENDING, Notification.channel == EMAIL)
+        .order_by(Notification.created_at)
+        .limit(batch_size)
+    ).all()
+
+    sent_ids, errors = [], {}
+    for row in rows:
+        try:
+            _send_email(db_settings, row.recipient, row.subject, row.body)
+            sent_ids.append(row.id)
+        except Exception as e:
+            errors[row.id] = str(e)
+
+    if sent_ids:
+        db.execute(
+            update(Notification)
+            .where(Notification.id.in_(sent_ids))
+            .values(status=NotificationStatus.SENT, sent_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+    for notification_id, error in errors.items():
+        db.execute(
+            update(Notification)
+            .where(Notification.id == notification_id)
+            .values(status=NotificationStatus.FAILED, error=error)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+    if errors:
+        logger.warning(f"Не удалось отправить {len(errors)} уведомлений")
+    return len(sent_ids)
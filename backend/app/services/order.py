@@ -2,7 +2,7 @@ from typing import List, Optional, Dict, Union, Any, Type, TypeVar, Tuple
 from datetime import datetime
 import uuid
 from sqlalchemy.orm import Session
-from sqlalchemy import func, exc, text, String, select, and_, desc, or_
+from sqlalchemy import func, exc, text, String, select, and_, desc, or_, bindparam, inspect
 import logging
 import traceback
 import enum
@@ -10,13 +10,19 @@ from fastapi import HTTPException
 from sqlalchemy.sql import or_, desc
 from decimal import Decimal
 
-from app.models.order import Order, Feedback, OrderStatus, PaymentStatus, OrderDish, PaymentMethod
+from app.models.order import (
+    Order, Feedback, OrderStatus, PaymentStatus, OrderDish, PaymentMethod,
+    ORDER_STATUS_ALIASES, PAYMENT_STATUS_ALIASES, normalize_status_value, dish_snapshot
+)
 from app.models.menu import Dish
 from app.models.user import User
 from app.schemas.order import OrderCreate, OrderUpdate, FeedbackCreate, OrderUpdateSchema
 from app.services.order_code import get_order_code_by_code, mark_code_as_used
+from app.services.order_archive import get_archived_order
 from app.services.user import get_user
 from app.services.reservation import get_reservation_by_code
+from app.services.waitlist import waitlist
+from app.utils.fields import FieldSet, build_fields, filter_fields, nested_fields, wants
 
 logger = logging.getLogger(__name__)
 
@@ -39,8 +45,11 @@ def get_order(db: Session, order_id: int) -> Optional[Dict[str, Any]]:
         db_order = db.query(Order).filter(Order.id == order_id).first()
         
         if not db_order:
-            logger.warning(f"Заказ с ID {order_id} не найден")
-            return None
+            # Давно закрытые заказы лежат в месячных архивах
+            archived_order = get_archived_order(db, order_id)
+            if archived_order is None:
+                logger.warning(f"Заказ с ID {order_id} не найден")
+            return archived_order
         
         # Безопасно обрабатываем payment_method
         payment_method = None
@@ -132,7 +141,8 @@ def get_orders(
     status: Optional[str] = None,
     user_id: Optional[int] = None,
     waiter_id: Optional[int] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    fields: Optional[FieldSet] = None
 ) -> List[Dict[str, Any]]:
     """
     Получение списка заказов с возможностью фильтрации
@@ -145,6 +155,7 @@ def get_orders(
         user_id: Фильтр по ID пользователя (если указан)
         waiter_id: Фильтр по ID официанта (если указан)
         search: Поисковая строка (если указана)
+        fields: Набор запрошенных полей (см. app.utils.fields), None - все поля
 
     Returns:
         Список словарей с данными заказов
@@ -187,65 +198,7 @@ def get_orders(
         # Форматируем результаты
         formatted_orders = []
         for order in orders:
-            # Получаем информацию о блюдах в заказе
-            order_dishes = db.query(OrderDish).filter(OrderDish.order_id == order.id).all()
-            
-            # Форматируем данные о блюдах
-            items = []
-            for order_dish in order_dishes:
-                # Получаем информацию о блюде
-                dish = db.query(Dish).filter(Dish.id == order_dish.dish_id).first()
-                
-                # Формируем данные о блюде в заказе
-                if dish:
-                    dish_data = {
-                        "id": order_dish.id,
-                        "dish_id": dish.id,
-                        "name": dish.name,
-                        "price": float(order_dish.price),
-                        "quantity": order_dish.quantity,
-                        "special_instructions": order_dish.special_instructions,
-                        "total_price": float(order_dish.price * order_dish.quantity),
-                        "category_id": dish.category_id,
-                        "image_url": dish.image_url,
-                        "description": dish.description
-                    }
-                    items.append(dish_data)
-            
-            # Безопасно обрабатываем payment_method
-            payment_method = None
-            if order.payment_method:
-                if isinstance(order.payment_method, str):
-                    # Для строковых значений приводим к верхнему регистру
-                    payment_method = order.payment_method.upper()
-                else:
-                    # Для enum берем значение
-                    payment_method = order.payment_method.value
-            
-            # Форматируем данные заказа
-            order_data = {
-                "id": order.id,
-                "user_id": order.user_id,
-                "waiter_id": order.waiter_id,
-                "table_number": order.table_number,
-                "status": order.status,
-                "payment_status": order.payment_status,
-                "payment_method": payment_method,
-                "total_amount": float(order.total_amount) if order.total_amount is not None else sum(item["total_price"] for item in items),
-                "comment": order.comment,
-                "special_instructions": order.comment,
-                "created_at": order.created_at.isoformat() if order.created_at else None,
-                "updated_at": order.updated_at.isoformat() if order.updated_at else None,
-                "completed_at": order.completed_at.isoformat() if order.completed_at else None,
-                "customer_name": order.customer_name or "",
-                "customer_phone": order.customer_phone or "",
-                "order_code": order.order_code or "",
-                "is_urgent": order.is_urgent or False,
-                "is_group_order": order.is_group_order or False,
-                "items": items
-            }
-            
-            formatted_orders.append(order_data)
+            formatted_orders.append(_format_order_list_entry(db, order, fields))
         
         # Если не удалось получить ни одного заказа, возвращаем тестовый заказ
         if not formatted_orders:
@@ -297,7 +250,7 @@ def get_orders(
                     }
                 ]
             }
-            return [test_order]
+            return [filter_fields(test_order, fields)]
         
         logger.info(f"Успешно отформатировано {len(formatted_orders)} заказов")
         return formatted_orders
@@ -308,6 +261,92 @@ def get_orders(
         return []
 
 
+def _format_order_items(db: Session, order: Order, fields: Optional[FieldSet] = None) -> List[Dict[str, Any]]:
+    """Форматирует блюда заказа; вычисляются только запрошенные поля позиций"""
+    order_dishes = db.query(OrderDish).filter(OrderDish.order_id == order.id).all()
+    if not order_dishes:
+        return []
+
+    # Загружаем все блюда заказа одним запросом
+    dish_ids = {order_dish.dish_id for order_dish in order_dishes}
+    dishes = {dish.id: dish for dish in db.query(Dish).filter(Dish.id.in_(dish_ids)).all()}
+
+    items = []
+    for order_dish in order_dishes:
+        dish = dishes.get(order_dish.dish_id)
+        if not dish:
+            continue
+        items.append(build_fields({
+            "id": lambda: order_dish.id,
+            "dish_id": lambda: dish.id,
+            "name": lambda: dish.name,
+            "price": lambda: float(order_dish.price),
+            "quantity": lambda: order_dish.quantity,
+            "special_instructions": lambda: order_dish.special_instructions,
+            "total_price": lambda: float(order_dish.price * order_dish.quantity),
+            "category_id": lambda: dish.category_id,
+            "image_url": lambda: dish.image_url,
+            "description": lambda: dish.description
+        }, fields))
+    return items
+
+
+def _format_order_list_entry(db: Session, order: Order, fields: Optional[FieldSet] = None) -> Dict[str, Any]:
+    """
+    Форматирует заказ для списка заказов.
+
+    Позиции заказа загружаются только если запрошено поле items
+    (или сумма заказа не сохранена и её нужно пересчитать).
+    """
+    items_cache: Dict[str, List[Dict[str, Any]]] = {}
+
+    def get_items() -> List[Dict[str, Any]]:
+        if "items" not in items_cache:
+            items_cache["items"] = _format_order_items(db, order, nested_fields(fields, "items"))
+        return items_cache["items"]
+
+    def get_total_amount() -> float:
+        if order.total_amount is not None:
+            return float(order.total_amount)
+        # Для пересчета суммы нужны цены и количества всех позиций
+        return sum(
+            float(order_dish.price * order_dish.quantity)
+            for order_dish in db.query(OrderDish).filter(OrderDish.order_id == order.id).all()
+        )
+
+    def get_payment_method() -> Optional[str]:
+        # Безопасно обрабатываем payment_method
+        if not order.payment_method:
+            return None
+        if isinstance(order.payment_method, str):
+            # Для строковых значений приводим к верхнему регистру
+            return order.payment_method.upper()
+        # Для enum берем значение
+        return order.payment_method.value
+
+    return build_fields({
+        "id": lambda: order.id,
+        "user_id": lambda: order.user_id,
+        "waiter_id": lambda: order.waiter_id,
+        "table_number": lambda: order.table_number,
+        "status": lambda: order.status,
+        "payment_status": lambda: order.payment_status,
+        "payment_method": get_payment_method,
+        "total_amount": get_total_amount,
+        "comment": lambda: order.comment,
+        "special_instructions": lambda: order.comment,
+        "created_at": lambda: order.created_at.isoformat() if order.created_at else None,
+        "updated_at": lambda: order.updated_at.isoformat() if order.updated_at else None,
+        "completed_at": lambda: order.completed_at.isoformat() if order.completed_at else None,
+        "customer_name": lambda: order.customer_name or "",
+        "customer_phone": lambda: order.customer_phone or "",
+        "order_code": lambda: order.order_code or "",
+        "is_urgent": lambda: order.is_urgent or False,
+        "is_group_order": lambda: order.is_group_order or False,
+        "items": get_items
+    }, fields)
+
+
 def get_orders_for_user(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Order]:
     """Получение списка заказов конкретного пользователя"""
     try:
@@ -441,13 +480,14 @@ def format_order_for_response(db: Session, db_order: Order) -> Dict[str, Any]:
     return order_dict
 
 
-def create_order(db: Session, order_data: Dict) -> Dict:
+def create_order(db: Session, order_data: Dict, commit: bool = True) -> Dict:
     """
     Создание нового заказа
     
     Args:
         db: Сессия базы данных
         order_data: Словарь с данными заказа
+        commit: Фиксировать ли транзакцию (False - для очереди записи, см. app.services.write_queue)
         
     Returns:
         Словарь с данными созданного заказа
@@ -483,6 +523,34 @@ def create_order(db: Session, order_data: Dict) -> Dict:
                 logger.warning(f"Не удалось преобразовать payment_method '{order_data['payment_method']}' в enum, удаляем поле")
                 order_data.pop('payment_method', None)
         
+        # Загружаем все блюда заказа одним запросом
+        dish_ids = {item_data.get('dish_id') for item_data in order_data['items'] if item_data.get('dish_id')}
+        dishes = {dish.id: dish for dish in db.query(Dish).filter(Dish.id.in_(dish_ids)).all()} if dish_ids else {}
+        
+        # Готовим позиции заказа и считаем сумму до вставки заказа,
+        # чтобы не обновлять заказ повторно после flush
+        line_items = []
+        total_amount = 0.0
+        
+        for item_data in order_data['items']:
+            dish_id = item_data.get('dish_id')
+            if not dish_id:
+                logger.warning(f"Пропускаем блюдо без dish_id: {item_data}")
+                continue
+                
+            dish = dishes.get(dish_id)
+            if not dish:
+                logger.warning(f"Блюдо с ID {dish_id} не найдено, пропускаем")
+                continue
+                
+            quantity = item_data.get('quantity', 1)
+            special_instructions = item_data.get('special_instructions', '')
+            
+            line_items.append((dish, quantity, special_instructions))
+            
+            # Увеличиваем общую сумму заказа
+            total_amount += float(dish.price) * quantity
+        
         # Создаем объект заказа
         new_order = Order(
             user_id=order_data.get('user_id'),
@@ -499,6 +567,7 @@ def create_order(db: Session, order_data: Dict) -> Dict:
             is_urgent=order_data.get('is_urgent', False),
             is_group_order=order_data.get('is_group_order', False),
             customer_age_group=order_data.get('customer_age_group'),
+            total_amount=total_amount,
             created_at=datetime.utcnow()
         )
         
@@ -508,57 +577,106 @@ def create_order(db: Session, order_data: Dict) -> Dict:
         
         logger.info(f"Создан новый заказ с ID {new_order.id}")
         
-        # Добавляем блюда к заказу
-        total_amount = 0.0
-        
-        for item_data in order_data['items']:
-            # Получаем информацию о блюде
-            dish_id = item_data.get('dish_id')
-            if not dish_id:
-                logger.warning(f"Пропускаем блюдо без dish_id: {item_data}")
-                continue
-                
-            dish = db.query(Dish).filter(Dish.id == dish_id).first()
-            if not dish:
-                logger.warning(f"Блюдо с ID {dish_id} не найдено, пропускаем")
-                continue
-                
-            quantity = item_data.get('quantity', 1)
-            special_instructions = item_data.get('special_instructions', '')
-            
-            # Создаем запись в order_dish
-            order_dish = OrderDish(
-                order_id=new_order.id,
-                dish_id=dish.id,
-                quantity=quantity,
-                special_instructions=special_instructions,
-                price=dish.price  # Сохраняем текущую цену блюда
-            )
-            
-            db.add(order_dish)
-            
-            # Увеличиваем общую сумму заказа
-            total_amount += float(dish.price) * quantity
-        
-        # Обновляем общую сумму заказа
-        new_order.total_amount = total_amount
+        # Добавляем блюда к заказу одной пакетной вставкой
+        if line_items:
+            db.bulk_insert_mappings(OrderDish, [
+                {
+                    **dish_snapshot(dish),  # Текущая цена, название и категория блюда
+                    "order_id": new_order.id,
+                    "quantity": quantity,
+                    "special_instructions": special_instructions
+                }
+                for dish, quantity, special_instructions in line_items
+            ])
         
         # Фиксируем изменения в базе данных
-        db.commit()
-        db.refresh(new_order)
+        if commit:
+            db.commit()
         
-        # Преобразуем объект заказа в словарь
-        result = get_order_detailed(db, new_order.id)
+        # Учитываем заказ в оценке освобождения столов для листа ожидания
+        waitlist.on_order_opened(
+            new_order.id, new_order.table_number, new_order.created_at,
+            max((dish.cooking_time or 0 for dish, _, _ in line_items), default=None)
+        )
         
-        return result
+        # Формируем ответ из объектов в памяти, без повторного чтения заказа
+        return _format_created_order(db, new_order, line_items)
         
     except Exception as e:
-        db.rollback()
+        if commit:
+            db.rollback()
         logger.error(f"Ошибка при создании заказа: {str(e)}")
         logger.exception(e)
         raise e
 
 
+def _format_created_order(db: Session, order: Order, line_items: List[Tuple[Dish, int, str]]) -> Dict[str, Any]:
+    """
+    Формирует ответ для только что созданного заказа в том же формате,
+    что и get_order_detailed, но из объектов в памяти
+    """
+    created_at = order.created_at.isoformat() if order.created_at else datetime.utcnow().isoformat()
+    
+    items = []
+    for dish, quantity, special_instructions in line_items:
+        price = float(dish.price) if dish.price is not None else 0.0
+        quantity = quantity or 1
+        items.append({
+            "id": dish.id,
+            "dish_id": dish.id,
+            "name": dish.name,
+            "dish_name": dish.name,
+            "price": price,
+            "quantity": quantity,
+            "special_instructions": special_instructions or "",
+            "category_id": dish.category_id,
+            "image_url": dish.image_url or "",
+            "dish_image": dish.image_url or "",
+            "description": dish.description or "",
+            "total_price": price * quantity,
+            "order_id": order.id,
+            "created_at": created_at
+        })
+    
+    # Данные пользователя - один запрос по первичному ключу
+    user = {}
+    if order.user_id:
+        user_row = db.query(User.id, User.email, User.full_name, User.phone, User.role).filter(User.id == order.user_id).first()
+        if user_row:
+            user = dict(user_row._mapping)
+    
+    def enum_text(value: Any, enum_class: Type[T], default: T) -> str:
+        value = value.value if isinstance(value, enum.Enum) else value
+        return value if value in [e.value for e in enum_class] else default.value
+    
+    total_amount = float(order.total_amount) if order.total_amount is not None else 0.0
+    
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "waiter_id": order.waiter_id,
+        "table_number": order.table_number,
+        "status": enum_text(order.status, OrderStatus, OrderStatus.PENDING),
+        "payment_status": enum_text(order.payment_status, PaymentStatus, PaymentStatus.PENDING),
+        "payment_method": enum_text(order.payment_method, PaymentMethod, PaymentMethod.CASH),
+        "created_at": created_at,
+        "updated_at": order.updated_at.isoformat() if order.updated_at else created_at,
+        "completed_at": order.completed_at.isoformat() if order.completed_at else None,
+        "total_amount": total_amount,
+        "total_price": total_amount,
+        "customer_name": order.customer_name or "",
+        "customer_phone": order.customer_phone or "",
+        "comment": order.comment or "",
+        "special_instructions": order.comment or "",
+        "order_code": order.order_code or "",
+        "reservation_code": order.reservation_code or "",
+        "is_urgent": order.is_urgent or False,
+        "is_group_order": order.is_group_order or False,
+        "items": items,
+        "user": user
+    }
+
+
 def update_order(db: Session, order_id: int, order_update: Union[OrderUpdate, OrderUpdateSchema, Dict[str, Any]]) -> Optional[Dict]:
     """
     Обновление заказа по ID
@@ -675,11 +793,10 @@ def update_order(db: Session, order_id: int, order_update: Union[OrderUpdate, Or
                     if dish:
                         # Создаем связь между заказом и блюдом
                         order_dish = OrderDish(
+                            **dish_snapshot(dish),  # Цена, название и категория блюда
                             order_id=order_id,
-                            dish_id=dish_id,
                             quantity=quantity,
-                            special_instructions=special_instructions,
-                            price=dish.price  # Добавляем цену из блюда
+                            special_instructions=special_instructions
                         )
                         db.add(order_dish)
                         
@@ -836,13 +953,156 @@ def fix_payment_method_case(db: Session) -> int:
         return 0
 
 
-def get_order_detailed(db: Session, order_id: int) -> Optional[Dict[str, Any]]:
+def normalize_order_statuses(db: Session, batch_size: int = 500) -> int:
+    """
+    Приводит status и payment_status всех заказов к каноническому виду
+    (значение enum в верхнем регистре). Записи обрабатываются пакетами по первичному ключу,
+    каждый пакет фиксируется отдельно, чтобы не держать длинную блокировку на запись.
+    
+    Args:
+        db: Сессия базы данных
+        batch_size: Размер пакета
+        
+    Returns:
+        Количество обновленных записей
+    """
+    status_list = ", ".join(f"'{status.value}'" for status in OrderStatus)
+    payment_list = ", ".join(f"'{status.value}'" for status in PaymentStatus)
+    select_query = text(f"""
+        SELECT id, status, payment_status FROM orders
+        WHERE id > :last_id
+          AND (status NOT IN ({status_list}) OR payment_status NOT IN ({payment_list}))
+        ORDER BY id
+        LIMIT :limit
+    """)
+    
+    total_updated = 0
+    last_id = 0
+    try:
+        while True:
+            rows = db.execute(select_query, {"last_id": last_id, "limit": batch_size}).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            
+            # Группируем записи по новым значениям, чтобы обновить пакет несколькими UPDATE ... WHERE id IN
+            groups: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+            for row in rows:
+                new_status = normalize_status_value(row.status, ORDER_STATUS_ALIASES)
+                new_payment_status = normalize_status_value(row.payment_status, PAYMENT_STATUS_ALIASES)
+                if new_status == row.status and new_payment_status == row.payment_status:
+                    # Нестандартное значение, которое нормализация не меняет
+                    continue
+                groups.setdefault((new_status, new_payment_status), []).append(row.id)
+            
+            for (new_status, new_payment_status), ids in groups.items():
+                db.execute(
+                    text("UPDATE orders SET status = :status, payment_status = :payment_status WHERE id IN :ids")
+                    .bindparams(bindparam("ids", expanding=True)),
+                    {"status": new_status, "payment_status": new_payment_status, "ids": ids}
+                )
+                total_updated += len(ids)
+            db.commit()
+        
+        if total_updated:
+            logger.info(f"Нормализовано статусов заказов: {total_updated}")
+        return total_updated
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка при нормализации статусов заказов: {str(e)}")
+        logger.exception(e)
+        return total_updated
+
+
+def backfill_order_line_items(db: Session, batch_size: int = 500) -> int:
+    """
+    Переводит позиции заказов на единую таблицу order_dish:
+    переносит записи из упраздненной таблицы order_items (для заказов, у которых
+    нет позиций в order_dish) и заполняет снимок блюда (dish_name, category_id, cost_price)
+    у старых позиций. Обе операции выполняются пакетами, каждый пакет фиксируется отдельно.
+    
+    Args:
+        db: Сессия базы данных
+        batch_size: Размер пакета
+        
+    Returns:
+        Количество перенесенных и дополненных позиций
+    """
+    total_updated = 0
+    try:
+        if "order_items" in inspect(db.get_bind()).get_table_names():
+            # Пакет - набор заказов, чтобы позиции одного заказа переносились одним INSERT
+            select_orders = text("""
+                SELECT DISTINCT order_id FROM order_items
+                WHERE order_id > :last_id
+                ORDER BY order_id
+                LIMIT :limit
+            """)
+            copy_items = text("""
+                INSERT INTO order_dish (order_id, dish_id, quantity, price, dish_name, category_id, cost_price)
+                SELECT oi.order_id, oi.dish_id, oi.quantity, oi.price, d.name, d.category_id, d.cost_price
+                FROM order_items oi
+                LEFT JOIN dishes d ON d.id = oi.dish_id
+                WHERE oi.order_id IN :ids
+                  AND oi.order_id NOT IN (SELECT order_id FROM order_dish WHERE order_id IN :ids)
+            """).bindparams(bindparam("ids", expanding=True))
+            
+            last_id = 0
+            while True:
+                order_ids = [row.order_id for row in db.execute(select_orders, {"last_id": last_id, "limit": batch_size})]
+                if not order_ids:
+                    break
+                last_id = order_ids[-1]
+                total_updated += db.execute(copy_items, {"ids": order_ids}).rowcount
+                db.commit()
+            
+            db.execute(text("DROP TABLE order_items"))
+            db.commit()
+            logger.info("Таблица order_items перенесена в order_dish и удалена")
+        
+        # Снимок блюда для позиций, созданных до появления колонок
+        select_items = text("""
+            SELECT id FROM order_dish
+            WHERE id > :last_id AND dish_name IS NULL
+            ORDER BY id
+            LIMIT :limit
+        """)
+        fill_snapshot = text("""
+            UPDATE order_dish SET
+                dish_name = (SELECT name FROM dishes WHERE dishes.id = order_dish.dish_id),
+                category_id = (SELECT category_id FROM dishes WHERE dishes.id = order_dish.dish_id),
+                cost_price = (SELECT cost_price FROM dishes WHERE dishes.id = order_dish.dish_id)
+            WHERE id IN :ids
+        """).bindparams(bindparam("ids", expanding=True))
+        
+        last_id = 0
+        while True:
+            item_ids = [row.id for row in db.execute(select_items, {"last_id": last_id, "limit": batch_size})]
+            if not item_ids:
+                break
+            last_id = item_ids[-1]
+            total_updated += db.execute(fill_snapshot, {"ids": item_ids}).rowcount
+            db.commit()
+        
+        if total_updated:
+            logger.info(f"Обновлено позиций заказов: {total_updated}")
+        return total_updated
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка при переносе позиций заказов: {str(e)}")
+        logger.exception(e)
+        return total_updated
+
+
+def get_order_detailed(db: Session, order_id: int, fields: Optional[FieldSet] = None) -> Optional[Dict[str, Any]]:
     """
     Получение подробной информации о заказе по ID
     
     Args:
         db: сессия базы данных
         order_id: ID заказа
+        fields: набор запрошенных полей (см. app.utils.fields); позиции заказа и данные
+            пользователя запрашиваются из БД только если они входят в этот набор
         
     Returns:
         Данные заказа в виде словаря или None, если заказ не найден
@@ -870,8 +1130,12 @@ def get_order_detailed(db: Session, order_id: int) -> Optional[Dict[str, Any]]:
         try:
             check_order = db.query(Order).filter(Order.id == order_id).first()
             if not check_order:
-                logger.warning(f"Заказ с ID {order_id} не найден")
-                return None
+                # Давно закрытые заказы лежат в месячных архивах
+                archived_order = get_archived_order(db, order_id)
+                if archived_order is None:
+                    logger.warning(f"Заказ с ID {order_id} не найден")
+                    return None
+                return filter_fields(archived_order, fields)
                 
             # Создаем базовый словарь из ORM объекта в самом начале
             fallback_order.update({
@@ -964,100 +1228,101 @@ def get_order_detailed(db: Session, order_id: int) -> Optional[Dict[str, Any]]:
         
         # Получаем элементы заказа
         items = []
-        try:
-            # Используем LEFT JOIN вместо обычного JOIN, чтобы получить элементы даже если нет блюд
-            items_query = """
-                SELECT 
-                    d.id, d.name, d.price, d.description, d.image_url, d.category_id,
-                    od.quantity, od.special_instructions, od.dish_id
-                FROM order_dish od
-                LEFT JOIN dishes d ON od.dish_id = d.id
-                WHERE od.order_id = :order_id
-            """
+        if wants(fields, "items"):
+            try:
+                # Используем LEFT JOIN вместо обычного JOIN, чтобы получить элементы даже если нет блюд
+                items_query = """
+                    SELECT 
+                        d.id, d.name, d.price, d.description, d.image_url, d.category_id,
+                        od.quantity, od.special_instructions, od.dish_id
+                    FROM order_dish od
+                    LEFT JOIN dishes d ON od.dish_id = d.id
+                    WHERE od.order_id = :order_id
+                """
             
-            items_result = db.execute(text(items_query), {"order_id": order_id}).fetchall()
+                items_result = db.execute(text(items_query), {"order_id": order_id}).fetchall()
             
-            if items_result:
-                for item_row in items_result:
-                    try:
-                        item_dict = {}
-                        item_column_names = item_row._mapping.keys()
+                if items_result:
+                    for item_row in items_result:
+                        try:
+                            item_dict = {}
+                            item_column_names = item_row._mapping.keys()
                         
-                        for key in item_column_names:
-                            item_dict[key] = item_row._mapping[key]
+                            for key in item_column_names:
+                                item_dict[key] = item_row._mapping[key]
                         
-                        # Если dish_id есть, но имя блюда отсутствует, это означает, что блюдо было удалено
-                        # В этом случае создаем заглушку с минимальной информацией
-                        if item_dict.get("dish_id") and not item_dict.get("name"):
-                            item_dict["name"] = f"Блюдо #{item_dict['dish_id']} (удалено)"
-                            item_dict["price"] = 0.0
+                            # Если dish_id есть, но имя блюда отсутствует, это означает, что блюдо было удалено
+                            # В этом случае создаем заглушку с минимальной информацией
+                            if item_dict.get("dish_id") and not item_dict.get("name"):
+                                item_dict["name"] = f"Блюдо #{item_dict['dish_id']} (удалено)"
+                                item_dict["price"] = 0.0
                         
-                        price = float(item_dict.get("price", 0)) if item_dict.get("price") is not None else 0.0
-                        quantity = item_dict.get("quantity", 1) or 1
+                            price = float(item_dict.get("price", 0)) if item_dict.get("price") is not None else 0.0
+                            quantity = item_dict.get("quantity", 1) or 1
                         
-                        items.append({
-                            "id": item_dict.get("dish_id", item_dict.get("id")),
-                            "dish_id": item_dict.get("dish_id", item_dict.get("id")),
-                            "name": item_dict.get("name", f"Блюдо #{item_dict.get('dish_id', 'неизвестно')}"),
-                            "dish_name": item_dict.get("name", f"Блюдо #{item_dict.get('dish_id', 'неизвестно')}"),
-                            "price": price,
-                            "quantity": quantity,
-                            "special_instructions": item_dict.get("special_instructions") or "",
-                            "category_id": item_dict.get("category_id"),
-                            "image_url": item_dict.get("image_url") or "",
-                            "dish_image": item_dict.get("image_url") or "",
-                            "description": item_dict.get("description") or "",
-                            "total_price": price * quantity,
-                            "order_id": order_id,
-                            "created_at": order_dict.get("created_at")
-                        })
-                    except Exception as item_error:
-                        logger.error(f"Ошибка при обработке элемента заказа: {str(item_error)}")
-                        continue
+                            items.append({
+                                "id": item_dict.get("dish_id", item_dict.get("id")),
+                                "dish_id": item_dict.get("dish_id", item_dict.get("id")),
+                                "name": item_dict.get("name", f"Блюдо #{item_dict.get('dish_id', 'неизвестно')}"),
+                                "dish_name": item_dict.get("name", f"Блюдо #{item_dict.get('dish_id', 'неизвестно')}"),
+                                "price": price,
+                                "quantity": quantity,
+                                "special_instructions": item_dict.get("special_instructions") or "",
+                                "category_id": item_dict.get("category_id"),
+                                "image_url": item_dict.get("image_url") or "",
+                                "dish_image": item_dict.get("image_url") or "",
+                                "description": item_dict.get("description") or "",
+                                "total_price": price * quantity,
+                                "order_id": order_id,
+                                "created_at": order_dict.get("created_at")
+                            })
+                        except Exception as item_error:
+                            logger.error(f"Ошибка при обработке элемента заказа: {str(item_error)}")
+                            continue
             
-            # Если элементы не найдены, пробуем другой запрос для получения ID блюд
-            if not items:
-                logger.warning(f"Не удалось получить полные данные элементов заказа {order_id}, пробуем получить только id блюд")
+                # Если элементы не найдены, пробуем другой запрос для получения ID блюд
+                if not items:
+                    logger.warning(f"Не удалось получить полные данные элементов заказа {order_id}, пробуем получить только id блюд")
                 
-                basic_items_query = """
-                    SELECT dish_id, quantity, special_instructions 
-                    FROM order_dish 
-                    WHERE order_id = :order_id
-                """
-                basic_items_result = db.execute(text(basic_items_query), {"order_id": order_id}).fetchall()
+                    basic_items_query = """
+                        SELECT dish_id, quantity, special_instructions 
+                        FROM order_dish 
+                        WHERE order_id = :order_id
+                    """
+                    basic_items_result = db.execute(text(basic_items_query), {"order_id": order_id}).fetchall()
                 
-                if basic_items_result:
-                    for basic_item in basic_items_result:
-                        dish_id = basic_item._mapping.get("dish_id")
-                        quantity = basic_item._mapping.get("quantity", 1) or 1
-                        special_instructions = basic_item._mapping.get("special_instructions", "")
+                    if basic_items_result:
+                        for basic_item in basic_items_result:
+                            dish_id = basic_item._mapping.get("dish_id")
+                            quantity = basic_item._mapping.get("quantity", 1) or 1
+                            special_instructions = basic_item._mapping.get("special_instructions", "")
                         
-                        # Добавляем простой элемент с минимальной информацией
-                        items.append({
-                            "id": dish_id,
-                            "dish_id": dish_id,
-                            "name": f"Блюдо #{dish_id}",
-                            "dish_name": f"Блюдо #{dish_id}",
-                            "price": 0.0,
-                            "quantity": quantity,
-                            "special_instructions": special_instructions or "",
-                            "image_url": "",
-                            "dish_image": "",
-                            "description": "",
-                            "total_price": 0.0,
-                            "order_id": order_id,
-                            "created_at": order_dict.get("created_at")
-                        })
+                            # Добавляем простой элемент с минимальной информацией
+                            items.append({
+                                "id": dish_id,
+                                "dish_id": dish_id,
+                                "name": f"Блюдо #{dish_id}",
+                                "dish_name": f"Блюдо #{dish_id}",
+                                "price": 0.0,
+                                "quantity": quantity,
+                                "special_instructions": special_instructions or "",
+                                "image_url": "",
+                                "dish_image": "",
+                                "description": "",
+                                "total_price": 0.0,
+                                "order_id": order_id,
+                                "created_at": order_dict.get("created_at")
+                            })
                 
-        except Exception as items_error:
-            logger.error(f"Ошибка при получении элементов заказа {order_id}: {str(items_error)}")
+            except Exception as items_error:
+                logger.error(f"Ошибка при получении элементов заказа {order_id}: {str(items_error)}")
         
         # Добавляем элементы к заказу
         order_dict["items"] = items
         
         # Получаем информацию о пользователе
         user = None
-        if order_dict.get("user_id"):
+        if wants(fields, "user") and order_dict.get("user_id"):
             try:
                 user_query = """
                     SELECT id, email, full_name, phone, role
@@ -1127,7 +1392,7 @@ def get_order_detailed(db: Session, order_id: int) -> Optional[Dict[str, Any]]:
             order_dict["updated_at"] = order_dict.get("created_at", datetime.utcnow().isoformat())
         
         logger.info(f"Заказ {order_id} успешно получен и преобразован")
-        return order_dict
+        return filter_fields(order_dict, fields)
         
     except Exception as e:
         logger.error(f"Критическая ошибка при получении заказа {order_id}: {str(e)}")
@@ -1135,4 +1400,4 @@ def get_order_detailed(db: Session, order_id: int) -> Optional[Dict[str, Any]]:
         
         # Гарантируем, что вернем хотя бы минимальную структуру заказа
         fallback_order["items"] = [] # Гарантируем пустой массив элементов
-        return fallback_order 
\ No newline at end of file
+        return filter_fields(fallback_order, fields) 
\ No newline at end of file
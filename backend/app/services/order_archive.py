@@ -0,0 +1,385 @@
+"""
+Архив заказов: горячие и холодные данные (только SQLite).
+
+Закрытые заказы навсегда оставались в таблицах orders, order_dish и payments, и каждый
+список, поиск и отчет платил за всю историю. Задача archive_orders переносит заказы
+в статусах COMPLETED и CANCELLED, закрытые больше ORDER_ARCHIVE_AFTER_DAYS дней назад,
+в месячные файлы SQLite data/archive/orders_YYYY_MM.db (по месяцу создания заказа) пакетами
+по ORDER_ARCHIVE_BATCH_SIZE. В основной базе остается строка archived_orders с месяцем архива,
+а освободившиеся страницы возвращает incremental_vacuum (app.services.db_maintenance).
+
+Перенос пакета - две транзакции: копирование в архив (INSERT OR REPLACE, повтор безопасен)
+и удаление из основной базы. В режиме WAL транзакция над несколькими файлами не атомарна,
+поэтому копирование фиксируется первым: при сбое между транзакциями заказ остается в основной
+базе и переносится повторно на следующем запуске.
+
+Не переносятся:
+- заказ с наибольшим id: SQLite без AUTOINCREMENT выдал бы его id следующему заказу;
+- заказы, на которые ссылаются отзывы и коды заказов (внешние ключи основной базы).
+
+Архив читается через ATTACH DATABASE:
+- get_archived_order - заказ с позициями и пользователем на соединении пула только для чтения
+  (блюда и пользователи - из основной базы); используется в get_order / get_order_detailed,
+  если заказа нет в orders;
+- order_sources - для аналитики: сущности Order и OrderDish над UNION ALL основных таблиц
+  и архивов месяцев периода.
+Подключенные архивы отключаются при возврате соединения в пул. SQLite подключает к соединению
+не больше 10 баз (SQLITE_MAX_ATTACHED), поэтому для длинных периодов берутся последние месяцы.
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import os
+import re
+import sqlite3
+
+from sqlalchemy import Column, Index, MetaData, Table, delete, event, exists, func, insert, select, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.database.session import IS_SQLITE, engine, insert_ignore, read_engine
+from app.models.menu import Dish
+from app.models.order import Order, OrderDish, OrderStatus
+from app.models.order_archive import ArchivedOrder
+from app.models.order_code import OrderCode
+from app.models.payment import Payment
+from app.models.review import Review
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = Path(engine.url.database).resolve().parent / "archive" if IS_SQLITE else None
+# Таблицы заказа, переносимые в архив (ключ - колонка с id заказа)
+ARCHIVED_TABLES = (
+    (Order.__table__, "id"),
+    (OrderDish.__table__, "order_id"),
+    (Payment.__table__, "order_id"),
+)
+CLOSED_STATUSES = (OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value)
+# Сколько баз можно подключить к одному соединению (SQLITE_MAX_ATTACHED по умолчанию)
+MAX_ATTACHED = 10
+
+_ARCHIVE_FILE_RE = re.compile(r"^orders_(\d{4}_\d{2})\.db$")
+
+
+def month_of(value: datetime) -> str:
+    return value.strftime("%Y_%m")
+
+
+def archive_path(month: str) -> Path:
+    return ARCHIVE_DIR / f"orders_{month}.db"
+
+
+def archive_months() -> List[str]:
+    """Месяцы, для которых есть файлы архива, по возрастанию"""
+    if ARCHIVE_DIR is None or not ARCHIVE_DIR.is_dir():
+        return []
+    return sorted(match.group(1) for match in map(_ARCHIVE_FILE_RE.match, os.listdir(ARCHIVE_DIR)) if match)
+
+
+@lru_cache(maxsize=None)
+def archive_tables(month: str) -> Dict[str, Table]:
+    """Таблицы архива месяца в схеме archive_YYYY_MM: колонки основных таблиц без внешних ключей"""
+    metadata = MetaData(schema=f"archive_{month}")
+    tables = {
+        table.name: Table(
+            table.name, metadata,
+            *[Column(column.name, column.type, primary_key=column.primary_key) for column in table.columns]
+        )
+        for table, _ in ARCHIVED_TABLES
+    }
+    Index("ix_orders_created_at", tables["orders"].c.created_at)
+    Index("ix_order_dish_order_id", tables["order_dish"].c.order_id)
+    Index("ix_payments_order_id", tables["payments"].c.order_id)
+    return tables
+
+
+def _attach(conn: Connection, month: str) -> str:
+    """Подключает архив месяца к соединению, если он еще не подключен; возвращает имя схемы"""
+    schema = f"archive_{month}"
+    attached = conn.connection.info.setdefault("archives", set())
+    if schema not in attached:
+        if len(attached) >= MAX_ATTACHED:
+            raise OperationalError(f"ATTACH {schema}", None, Exception("too many attached databases"))
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {schema}", (str(archive_path(month)),))
+        attached.add(schema)
+    return schema
+
+
+def _detach_archives(dbapi_connection, connection_record) -> None:
+    """Отключает архивы при возврате соединения в пул"""
+    for schema in connection_record.info.pop("archives", ()):
+        if dbapi_connection is None:
+            continue
+        try:
+            dbapi_connection.execute(f"DETACH DATABASE {schema}")
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось отключить архив {schema}: {e}")
+
+
+if IS_SQLITE:
+    for _engine in (engine, read_engine):
+        event.listen(_engine, "checkin", _detach_archives)
+
+
+def _ensure_archive_schema(conn: Connection, month: str) -> None:
+    """Создает таблицы архива и добавляет колонки, появившиеся в моделях после его создания"""
+    tables = archive_tables(month)
+    schema = f"archive_{month}"
+    tables["orders"].metadata.create_all(conn)
+    for table in tables.values():
+        existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA {schema}.table_info({table.name})")}
+        for column in table.columns:
+            if column.name not in existing:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {schema}.{table.name} ADD COLUMN {column.name} "
+                    f"{column.type.compile(dialect=conn.dialect)}"
+                )
+
+
+def _copy_to_archive(month: str, order_ids: List[int]) -> None:
+    """Копирует заказы с позициями и платежами в архив месяца (отдельная транзакция)"""
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    with engine.connect() as conn:
+        _attach(conn, month)
+        _ensure_archive_schema(conn, month)
+        tables = archive_tables(month)
+        for table, key in ARCHIVED_TABLES:
+            conn.execute(
+                insert(tables[table.name]).prefix_with("OR REPLACE").from_select(
+                    [column.name for column in table.columns],
+                    select(table).where(table.c[key].in_(order_ids))
+                )
+            )
+        conn.commit()
+
+
+def _remove_from_archive(month: str, order_ids: List[int]) -> None:
+    """Удаляет из архива копии заказов, которые остались в основной базе"""
+    with engine.connect() as conn:
+        _attach(conn, month)
+        tables = archive_tables(month)
+        for table, key in ARCHIVED_TABLES:
+            conn.execute(delete(tables[table.name]).where(tables[table.name].c[key].in_(order_ids)))
+        conn.commit()
+
+
+def archive_orders(db: Session, batch_size: Optional[int] = None, max_batches: int = 20) -> int:
+    """
+    Переносит в архив закрытые заказы старше ORDER_ARCHIVE_AFTER_DAYS дней (см. описание модуля).
+    За один запуск обрабатывается не больше max_batches пакетов по batch_size заказов.
+
+    Returns:
+        Количество перенесенных заказов
+    """
+    if not IS_SQLITE or settings.ORDER_ARCHIVE_AFTER_DAYS <= 0:
+        return 0
+
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    border = datetime.utcnow() - timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS)
+    archivable = (
+        Order.status.in_(CLOSED_STATUSES),
+        func.coalesce(Order.completed_at, Order.updated_at, Order.created_at) < border,
+        Order.id < select(func.max(Order.id)).scalar_subquery(),
+        ~exists().where(Review.order_id == Order.id),
+        ~exists().where(OrderCode.order_id == Order.id),
+    )
+    candidates = select(Order.id, Order.created_at).where(*archivable).order_by(Order.id).limit(batch_size)
+
+    total_archived = 0
+    try:
+        for _ in range(max_batches):
+            rows = db.execute(candidates).all()
+            db.rollback()
+            if not rows:
+                break
+
+            by_month: Dict[str, List[int]] = {}
+            for order_id, created_at in rows:
+                by_month.setdefault(month_of(created_at or border), []).append(order_id)
+
+            for month, order_ids in by_month.items():
+                _copy_to_archive(month, order_ids)
+
+                # Условия проверяются повторно: за время копирования на заказ мог появиться отзыв
+                archived_ids = db.execute(
+                    delete(Order)
+                    .where(Order.id.in_(order_ids), *archivable)
+                    .returning(Order.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+                if archived_ids:
+                    # Позиции и платежи удаляются каскадно; явно - на случай выключенных внешних ключей
+                    db.execute(delete(OrderDish).where(OrderDish.order_id.in_(archived_ids)))
+                    db.execute(delete(Payment).where(Payment.order_id.in_(archived_ids)))
+                    db.execute(
+                        insert_ignore(ArchivedOrder.__table__),
+                        [{"order_id": order_id, "month": month, "archived_at": datetime.utcnow()} for order_id in archived_ids]
+                    )
+                db.commit()
+
+                skipped_ids = sorted(set(order_ids) - set(archived_ids))
+                if skipped_ids:
+                    _remove_from_archive(month, skipped_ids)
+                total_archived += len(archived_ids)
+
+            if len(rows) < batch_size:
+                break
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка при архивации заказов: {str(e)}")
+        logger.exception(e)
+
+    if total_archived:
+        logger.info(f"Перенесено в архив заказов: {total_archived}")
+    return total_archived
+
+
+def get_archived_order(db: Session, order_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Заказ из архива в том же виде, что и get_order_detailed (с позициями и пользователем).
+    Цены и названия позиций - сохраненные в заказе на момент оформления.
+
+    Returns:
+        Словарь заказа или None, если заказа нет в архиве
+    """
+    if not IS_SQLITE:
+        return None
+    month = db.execute(select(ArchivedOrder.month).where(ArchivedOrder.order_id == order_id)).scalar()
+    if month is None:
+        return None
+
+    tables = archive_tables(month)
+    orders, order_dish = tables["orders"], tables["order_dish"]
+    with read_engine.connect() as conn:
+        _attach(conn, month)
+        order = conn.execute(select(orders).where(orders.c.id == order_id)).mappings().first()
+        if order is None:
+            logger.warning(f"Заказ {order_id} не найден в архиве {month}")
+            return None
+        items = conn.execute(
+            select(
+                order_dish,
+                Dish.name.label("current_name"), Dish.description, Dish.image_url,
+                Dish.category_id.label("current_category_id")
+            )
+            .outerjoin(Dish.__table__, Dish.id == order_dish.c.dish_id)
+            .where(order_dish.c.order_id == order_id)
+            .order_by(order_dish.c.id)
+        ).mappings().all()
+        user = None
+        if order["user_id"]:
+            user = conn.execute(
+                select(User.id, User.email, User.full_name, User.phone, User.role).where(User.id == order["user_id"])
+            ).mappings().first()
+
+    def isoformat(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+
+    created_at = isoformat(order["created_at"])
+    total_amount = float(order["total_amount"] or 0.0)
+    order_items = []
+    for item in items:
+        name = item["dish_name"] or item["current_name"] or f"Блюдо #{item['dish_id']} (удалено)"
+        price = float(item["price"] or 0.0)
+        quantity = item["quantity"] or 1
+        order_items.append({
+            "id": item["dish_id"],
+            "dish_id": item["dish_id"],
+            "name": name,
+            "dish_name": name,
+            "price": price,
+            "quantity": quantity,
+            "special_instructions": item["special_instructions"] or "",
+            "category_id": item["category_id"] or item["current_category_id"],
+            "image_url": item["image_url"] or "",
+            "dish_image": item["image_url"] or "",
+            "description": item["description"] or "",
+            "total_price": price * quantity,
+            "order_id": order_id,
+            "created_at": created_at,
+        })
+
+    return {
+        "id": order["id"],
+        "user_id": order["user_id"],
+        "waiter_id": order["waiter_id"],
+        "table_number": order["table_number"],
+        "status": order["status"] or OrderStatus.COMPLETED.value,
+        "payment_status": order["payment_status"] or "",
+        "payment_method": order["payment_method"] or "cash",
+        "created_at": created_at,
+        "updated_at": isoformat(order["updated_at"]) or created_at,
+        "completed_at": isoformat(order["completed_at"]),
+        "total_amount": total_amount,
+        "total_price": total_amount,
+        "comment": order["comment"] or "",
+        "special_instructions": order["comment"] or "",
+        "customer_name": order["customer_name"] or "",
+        "customer_phone": order["customer_phone"] or "",
+        "customer_age_group": order["customer_age_group"] or "",
+        "order_code": order["order_code"] or "",
+        "reservation_code": order["reservation_code"] or "",
+        "is_urgent": bool(order["is_urgent"]),
+        "is_group_order": bool(order["is_group_order"]),
+        "items": order_items,
+        "user": dict(user) if user else {},
+        "archived": True,
+    }
+
+
+def order_sources(
+    db: Session,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Tuple[Any, Any]:
+    """
+    Сущности заказов и позиций для отчетов за период: Order и OrderDish, если период
+    не затрагивает архив, иначе их псевдонимы над UNION ALL основной таблицы и архивов
+    месяцев периода, подключенных к соединению сессии.
+
+    Returns:
+        (сущность заказов, сущность позиций заказов)
+    """
+    if not IS_SQLITE:
+        return Order, OrderDish
+    months = [
+        month for month in archive_months()
+        if (start_date is None or month >= month_of(start_date))
+        and (end_date is None or month <= month_of(end_date))
+    ]
+    if not months:
+        return Order, OrderDish
+
+    conn = db.connection()
+    attached = conn.connection.info.get("archives", set())
+    capacity = MAX_ATTACHED - len(attached - {f"archive_{month}" for month in months})
+    if len(months) > capacity:
+        logger.warning(
+            f"Период отчета затрагивает {len(months)} месяцев архива, подключаются последние {max(capacity, 0)}"
+        )
+        months = months[len(months) - max(capacity, 0):]
+
+    attached_months = []
+    for month in months:
+        try:
+            _attach(conn, month)
+        except OperationalError as e:
+            # Например, у сессии уже открыта транзакция записи
+            logger.warning(f"Архив {month} не подключен к отчету: {e}")
+            break
+        attached_months.append(month)
+    if not attached_months:
+        return Order, OrderDish
+
+    orders = union_all(
+        select(Order.__table__), *[select(archive_tables(month)["orders"]) for month in attached_months]
+    ).subquery("orders")
+    order_dish = union_all(
+        select(OrderDish.__table__), *[select(archive_tables(month)["order_dish"]) for month in attached_months]
+    ).subquery("order_dish")
+    return aliased(Order, orders, adapt_on_names=True), aliased(OrderDish, order_dish, adapt_on_names=True)
@@ -1,22 +1,226 @@
 import random
-import string
-from typing import List, Optional
-from sqlalchemy.orm import Session
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from sqlalchemy import delete, exists, or_, select, update
+from sqlalchemy.orm import Session, aliased
 
-from app.models.order_code import OrderCode
+from app.core.config import settings
+from app.database.session import insert_ignore
+from app.models.order import Order, OrderStatus
+from app.models.order_code import OrderCode, OrderCodePool
 from app.schemas.order_code import OrderCodeCreate, OrderCodeUpdate
 
+logger = logging.getLogger(__name__)
 
-def generate_unique_code(db: Session, length: int = 6) -> str:
-    """Генерирует уникальный код для заказа"""
-    while True:
-        # Генерируем случайный код из цифр
-        code = ''.join(random.choices(string.digits, k=length))
-        
-        # Проверяем, что такого кода еще нет в базе
-        existing_code = db.query(OrderCode).filter(OrderCode.code == code).first()
-        if not existing_code:
+# Диапазон случайных позиций кодов в пуле
+_POSITION_RANGE = 2 ** 31
+
+# Статусы закрытых заказов: их коды возвращаются в пул
+_CLOSED_STATUSES = [OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value]
+
+
+def refill_code_pool(db: Session, length: int = 6, size: Optional[int] = None) -> int:
+    """
+    Добавляет в пул свободные коды: случайная выборка без повторений из всех кодов
+    заданной длины за вычетом выданных и указанных в orders.order_code. Занятость
+    проверяется двумя запросами на пакет.
+    
+    Returns:
+        Количество добавленных кодов
+    """
+    size = min(size or settings.ORDER_CODE_POOL_REFILL_SIZE, 10 ** length)
+    candidates = {str(number).zfill(length) for number in random.sample(range(10 ** length), size)}
+    
+    issued = set(db.execute(select(OrderCode.code).where(OrderCode.code.in_(candidates))).scalars())
+    issued.update(db.execute(select(Order.order_code).where(Order.order_code.in_(candidates))).scalars())
+    free_codes = candidates - issued
+    if not free_codes:
+        return 0
+    
+    # Код мог попасть в пул параллельно или вернуться в него после закрытия заказа - пропускаем
+    result = db.execute(
+        insert_ignore(OrderCodePool.__table__),
+        [{"code": code, "position": random.randrange(_POSITION_RANGE)} for code in free_codes]
+    )
+    logger.info(f"Пул кодов заказов пополнен: {result.rowcount} кодов")
+    return result.rowcount
+
+
+def allocate_code(db: Session, length: int = 6) -> str:
+    """
+    Выдает свободный код из пула одним атомарным DELETE ... RETURNING.
+    Параллельные запросы не могут получить один и тот же код: строку пула удаляет
+    (и получает) только один из них. Удаление фиксируется вместе с транзакцией вызывающего.
+    """
+    next_code = select(OrderCodePool.code).order_by(OrderCodePool.position).limit(1).scalar_subquery()
+    stmt = delete(OrderCodePool).where(OrderCodePool.code == next_code).returning(OrderCodePool.code)
+    
+    for _ in range(3):
+        code = db.execute(stmt).scalar()
+        if code:
             return code
+        # Пул пуст (или первый код забрал параллельный запрос) - пополняем и повторяем
+        refill_code_pool(db, length)
+    
+    raise ValueError("Нет свободных кодов заказа")
+
+
+def release_order_codes(db: Session, order_ids: Iterable[int]) -> int:
+    """
+    Возвращает в пул коды закрытых заказов: коды, привязанные к заказам через order_id
+    или совпадающие с order_code заказа. Записи кодов удаляются, у закрытых заказов
+    order_code очищается, коды снова становятся свободными и попадают в пул на случайную
+    позицию. Транзакцию фиксирует вызывающий.
+    
+    Returns:
+        Количество возвращенных кодов
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    
+    codes = db.execute(
+        delete(OrderCode)
+        .where(or_(
+            OrderCode.order_id.in_(order_ids),
+            OrderCode.code.in_(select(Order.order_code).where(Order.id.in_(order_ids)))
+        ))
+        .returning(OrderCode.code)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    
+    _return_to_pool(db, codes)
+    if codes:
+        logger.info(f"В пул возвращено кодов заказов: {len(codes)}")
+    return len(codes)
+
+
+def _return_to_pool(db: Session, codes: List[str]) -> None:
+    """
+    Возвращает коды в пул свободных кодов на случайные позиции. В той же транзакции
+    код снимается с закрытых заказов (orders.order_code): иначе поиск заказа по коду
+    находил бы закрытый заказ вместо нового, получившего этот код. Код, который еще
+    указан у открытого заказа, в пул не возвращается.
+    """
+    if not codes:
+        return
+    db.execute(
+        update(Order)
+        .where(Order.order_code.in_(codes), Order.status.in_(_CLOSED_STATUSES))
+        .values(order_code=None)
+        .execution_options(synchronize_session=False)
+    )
+    held = set(db.execute(select(Order.order_code).where(Order.order_code.in_(codes))).scalars())
+    free_codes = [code for code in codes if code not in held]
+    if free_codes:
+        db.execute(
+            insert_ignore(OrderCodePool.__table__),
+            [{"code": code, "position": random.randrange(_POSITION_RANGE)} for code in free_codes]
+        )
+
+
+def clear_closed_order_codes(db: Session) -> int:
+    """
+    Снимает с закрытых заказов коды, уже возвращенные в пул (исправление данных,
+    записанных до очистки order_code при возврате кода).
+
+    Returns:
+        Количество исправленных заказов
+    """
+    cleared = db.execute(
+        update(Order)
+        .where(Order.status.in_(_CLOSED_STATUSES), Order.order_code.in_(select(OrderCodePool.code)))
+        .values(order_code=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if cleared:
+        logger.info(f"Сняты коды, возвращенные в пул, с закрытых заказов: {cleared}")
+    return cleared
+
+
+def _expiration_border() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=settings.ORDER_CODE_TTL_SECONDS)
+
+
+def is_code_expired(db_code: OrderCode) -> bool:
+    """Проверяет, истек ли срок действия неиспользованного кода"""
+    return not db_code.is_used and db_code.created_at is not None and db_code.created_at < _expiration_border()
+
+
+def _held_by_open_order():
+    """Условие выборки из order_codes: код указан в orders.order_code открытого заказа"""
+    holder = aliased(Order)
+    return exists().where(
+        holder.order_code == OrderCode.code,
+        or_(holder.status.is_(None), holder.status.notin_(_CLOSED_STATUSES))
+    )
+
+
+def sweep_expired_codes(db: Session, batch_size: Optional[int] = None, max_batches: int = 20) -> int:
+    """
+    Удаляет устаревшие коды заказов и возвращает их в пул:
+    неиспользованные коды старше ORDER_CODE_TTL_SECONDS и использованные коды того же
+    возраста, заказ которых закрыт или удален. Коды, которые указаны в orders.order_code
+    открытого заказа, не трогаются; с закрытых заказов код снимается при возврате в пул
+    (см. _return_to_pool). Выборка идет по индексу (is_used, created_at)
+    пакетами не больше batch_size строк, каждый пакет фиксируется отдельно; за один вызов
+    обрабатывается не больше max_batches пакетов.
+    
+    Returns:
+        Количество удаленных кодов
+    """
+    batch_size = batch_size or settings.ORDER_CODE_SWEEP_BATCH_SIZE
+    border = _expiration_border()
+    
+    queries = [
+        # Неиспользованные коды с истекшим сроком
+        select(OrderCode.id, OrderCode.code)
+        .where(OrderCode.is_used == False, OrderCode.created_at < border, ~_held_by_open_order())
+        .order_by(OrderCode.created_at),
+        # Использованные коды, заказ которых уже закрыт или удален
+        select(OrderCode.id, OrderCode.code)
+        .outerjoin(Order, Order.id == OrderCode.order_id)
+        .where(
+            OrderCode.is_used == True,
+            OrderCode.created_at < border,
+            or_(Order.id.is_(None), Order.status.in_(_CLOSED_STATUSES)),
+            ~_held_by_open_order()
+        )
+        .order_by(OrderCode.created_at),
+    ]
+    
+    total_deleted = 0
+    batches = 0
+    try:
+        for query in queries:
+            while batches < max_batches:
+                rows = db.execute(query.limit(batch_size)).all()
+                if not rows:
+                    break
+                db.execute(
+                    delete(OrderCode)
+                    .where(OrderCode.id.in_([row.id for row in rows]))
+                    .execution_options(synchronize_session=False)
+                )
+                _return_to_pool(db, [row.code for row in rows])
+                db.commit()
+                total_deleted += len(rows)
+                batches += 1
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка при очистке устаревших кодов заказов: {str(e)}")
+        return total_deleted
+    
+    if total_deleted:
+        logger.info(f"Удалено устаревших кодов заказов: {total_deleted}")
+    return total_deleted
+
+
+def generate_unique_code(db: Session, length: int = 6) -> str:
+    """Выдает уникальный код для заказа из пула свободных кодов"""
+    return allocate_code(db, length)
 
 
 def create_order_code(db: Session, order_code: OrderCodeCreate) -> OrderCode:
@@ -26,6 +230,8 @@ def create_order_code(db: Session, order_code: OrderCodeCreate) -> OrderCode:
         code = generate_unique_code(db)
     else:
         code = order_code.code
+        # Заданный вручную код больше не должен выдаваться из пула
+        db.execute(delete(OrderCodePool).where(OrderCodePool.code == code))
     
     db_order_code = OrderCode(
         code=code,
@@ -0,0 +1,431 @@
+"""
+Машина состояний заказа.
+
+Переход статуса выполняется одним условным UPDATE:
+
+    UPDATE orders SET status = ..., version = version + 1, ...
+    WHERE id = :id AND status IN (<допустимые исходные статусы>) [AND version = :expected_version]
+    RETURNING id, status, payment_status, version, updated_at, completed_at, total_amount, created_at
+
+Если два официанта меняют статус одного заказа одновременно, второй UPDATE не найдет
+строку в допустимом состоянии (или с ожидаемой версией) и получит конфликт,
+а не перезапишет результат первого.
+"""
+from functools import partial
+from typing import Any, Dict, List, Optional, Set, Tuple
+import logging
+
+from sqlalchemy import func, or_, update, select
+from sqlalchemy.orm import Session
+
+from app.database.session import run_after_commit
+from app.models.order import (
+    Order, OrderStatus, PaymentStatus,
+    ORDER_STATUS_ALIASES, PAYMENT_STATUS_ALIASES, normalize_status_value
+)
+from app.services.dashboard import apply_counter_deltas, paid_amount_today
+from app.services.order_code import release_order_codes
+from app.services.waitlist import waitlist
+
+logger = logging.getLogger(__name__)
+
+_ACTIVE_STATUSES = {
+    OrderStatus.COOKING, OrderStatus.PREPARING, OrderStatus.IN_PROGRESS
+}
+
+# Закрытые заказы: их коды возвращаются в пул свободных кодов
+CLOSED_STATUSES = {OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value}
+
+# Допустимые переходы статуса заказа: текущий статус -> новые статусы
+ORDER_TRANSITIONS: Dict[OrderStatus, Set[OrderStatus]] = {
+    OrderStatus.PENDING: {
+        OrderStatus.NEW, OrderStatus.CONFIRMED, *_ACTIVE_STATUSES, OrderStatus.READY,
+        OrderStatus.DELIVERED, OrderStatus.COMPLETED, OrderStatus.CANCELLED
+    },
+    OrderStatus.NEW: {
+        OrderStatus.PENDING, OrderStatus.CONFIRMED, *_ACTIVE_STATUSES, OrderStatus.READY,
+        OrderStatus.DELIVERED, OrderStatus.COMPLETED, OrderStatus.CANCELLED
+    },
+    OrderStatus.CONFIRMED: {
+        *_ACTIVE_STATUSES, OrderStatus.READY, OrderStatus.DELIVERED,
+        OrderStatus.COMPLETED, OrderStatus.CANCELLED
+    },
+    OrderStatus.COOKING: {
+        *_ACTIVE_STATUSES, OrderStatus.READY, OrderStatus.DELIVERED,
+        OrderStatus.COMPLETED, OrderStatus.CANCELLED
+    },
+    OrderStatus.PREPARING: {
+        *_ACTIVE_STATUSES, OrderStatus.READY, OrderStatus.DELIVERED,
+        OrderStatus.COMPLETED, OrderStatus.CANCELLED
+    },
+    OrderStatus.IN_PROGRESS: {
+        *_ACTIVE_STATUSES, OrderStatus.READY, OrderStatus.DELIVERED,
+        OrderStatus.COMPLETED, OrderStatus.CANCELLED
+    },
+    OrderStatus.READY: {OrderStatus.DELIVERED, OrderStatus.COMPLETED, OrderStatus.CANCELLED},
+    OrderStatus.DELIVERED: {OrderStatus.COMPLETED},
+    OrderStatus.COMPLETED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+
+# Допустимые переходы статуса оплаты
+PAYMENT_TRANSITIONS: Dict[PaymentStatus, Set[PaymentStatus]] = {
+    PaymentStatus.PENDING: {PaymentStatus.PAID, PaymentStatus.FAILED},
+    PaymentStatus.FAILED: {PaymentStatus.PENDING, PaymentStatus.PAID},
+    PaymentStatus.PAID: {PaymentStatus.REFUNDED},
+    PaymentStatus.REFUNDED: set(),
+}
+
+
+class OrderTransitionError(ValueError):
+    """Ошибка перехода статуса заказа; status_code - HTTP-код для ответа"""
+
+    def __init__(self, message: str, status_code: int = 409):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def normalize_order_status(value: Any) -> OrderStatus:
+    """Приводит статус заказа из запроса к OrderStatus (регистр не важен)"""
+    if isinstance(value, OrderStatus):
+        return value
+    try:
+        return OrderStatus(normalize_status_value(value, ORDER_STATUS_ALIASES))
+    except ValueError:
+        raise OrderTransitionError(f"Недопустимый статус заказа: {value}", status_code=400)
+
+
+def normalize_payment_status(value: Any) -> PaymentStatus:
+    """Приводит статус оплаты из запроса к PaymentStatus (регистр не важен)"""
+    if isinstance(value, PaymentStatus):
+        return value
+    try:
+        return PaymentStatus(normalize_status_value(value, PAYMENT_STATUS_ALIASES))
+    except ValueError:
+        raise OrderTransitionError(f"Недопустимый статус оплаты: {value}", status_code=400)
+
+
+def allowed_sources(transitions: Dict[Any, Set[Any]], target: Any) -> Set[str]:
+    """
+    Статусы, из которых разрешен переход в target. Сам target не входит: UPDATE находит только
+    строки, которые действительно меняются, и побочные эффекты перехода (выручка, коды заказов,
+    лист ожидания) не повторяются. Повтор уже примененного статуса обрабатывается без UPDATE.
+    """
+    return {source.value for source, targets in transitions.items() if target in targets}
+
+
+def _source_condition(column, transitions: Dict[Any, Set[Any]], target: Any, default: Any):
+    """
+    Условие WHERE для исходного статуса. Статусы хранятся в каноническом виде,
+    поэтому сравнение идет напрямую по индексируемой колонке. Пустое и нестандартное
+    значение трактуется как статус по умолчанию, чтобы старые записи не блокировались навсегда.
+    """
+    sources = allowed_sources(transitions, target)
+    known = [status.value for status in transitions]
+    conditions = [column.in_(sources)]
+    if default.value in sources or target == default:
+        conditions.extend([column.is_(None), column.notin_(known)])
+    return or_(*conditions)
+
+
+def _transition_clauses(status: Optional[Any], payment_status: Optional[Any]) -> Tuple[Dict[str, Any], List[Any]]:
+    """
+    Формирует SET-часть и условия WHERE (кроме условия по id) для перехода статуса
+
+    Returns:
+        (значения для UPDATE, список условий на исходные статусы)
+    """
+    if status is None and payment_status is None:
+        raise OrderTransitionError("Не указаны данные для обновления", status_code=400)
+
+    values: Dict[str, Any] = {
+        "version": Order.version + 1,
+        "updated_at": func.current_timestamp()
+    }
+    conditions: List[Any] = []
+
+    if status is not None:
+        new_status = normalize_order_status(status)
+        values["status"] = new_status.value
+        if new_status == OrderStatus.COMPLETED:
+            values["completed_at"] = func.current_timestamp()
+        conditions.append(_source_condition(Order.status, ORDER_TRANSITIONS, new_status, OrderStatus.PENDING))
+
+    if payment_status is not None:
+        new_payment_status = normalize_payment_status(payment_status)
+        values["payment_status"] = new_payment_status.value
+        conditions.append(
+            _source_condition(Order.payment_status, PAYMENT_TRANSITIONS, new_payment_status, PaymentStatus.PENDING)
+        )
+
+    return values, conditions
+
+
+_RETURNING_COLUMNS = (
+    Order.id, Order.status, Order.payment_status,
+    Order.version, Order.updated_at, Order.completed_at,
+    Order.total_amount, Order.created_at
+)
+
+
+def _revenue_delta(rows: List[Any]) -> float:
+    """
+    Изменение выручки за сегодня после смены статуса оплаты. Исходный статус задан
+    допустимыми переходами: в PAID переходят только неоплаченные заказы, в REFUNDED - только оплаченные.
+    """
+    delta = 0.0
+    for row in rows:
+        amount = paid_amount_today(PaymentStatus.PAID.value, row.total_amount, row.created_at)
+        if row.payment_status == PaymentStatus.PAID.value:
+            delta += amount
+        elif row.payment_status == PaymentStatus.REFUNDED.value:
+            delta -= amount
+    return delta
+
+
+def _pending_changes(current: Optional[Any], values: Dict[str, Any]) -> Dict[str, str]:
+    """Запрошенные статусы (status, payment_status), которых у заказа current еще нет"""
+    return {
+        name: values[name] for name in ("status", "payment_status")
+        if name in values and (current is None or getattr(current, name) != values[name])
+    }
+
+
+def transition_order(
+    db: Session,
+    order_id: int,
+    status: Optional[Any] = None,
+    payment_status: Optional[Any] = None,
+    expected_version: Optional[int] = None,
+    commit: bool = True
+) -> Dict[str, Any]:
+    """
+    Применяет переход статуса и/или статуса оплаты одним условным UPDATE.
+
+    Args:
+        db: Сессия базы данных
+        order_id: ID заказа
+        status: Новый статус заказа (если меняется)
+        payment_status: Новый статус оплаты (если меняется)
+        expected_version: Ожидаемая версия заказа (для оптимистичной блокировки)
+        commit: Фиксировать ли транзакцию
+
+    Returns:
+        Словарь с обновленными полями заказа (id, status, payment_status, version, updated_at, completed_at,
+        total_amount, created_at)
+
+    Raises:
+        OrderTransitionError: 400 - некорректные данные, 404 - заказ не найден,
+            409 - переход недопустим или версия заказа изменилась
+    """
+    values, conditions = _transition_clauses(status, payment_status)
+    conditions.insert(0, Order.id == order_id)
+
+    if expected_version is not None:
+        conditions.append(Order.version == expected_version)
+
+    stmt = (
+        update(Order)
+        .where(*conditions)
+        .values(**values)
+        .returning(*_RETURNING_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+
+    row = db.execute(stmt).first()
+
+    if row is None:
+        # Строка не обновлена - выясняем причину (только на пути ошибки и повтора)
+        current = db.execute(select(*_RETURNING_COLUMNS).where(Order.id == order_id)).first()
+        if current is None:
+            if commit:
+                db.rollback()
+            raise OrderTransitionError(f"Заказ с ID {order_id} не найден", status_code=404)
+        if expected_version is not None and current.version != expected_version:
+            if commit:
+                db.rollback()
+            raise OrderTransitionError(
+                f"Заказ {order_id} был изменен другим пользователем (версия {current.version}, ожидалась {expected_version})"
+            )
+        changes = _pending_changes(current, values)
+        if not changes:
+            # Заказ уже в запрошенном состоянии (повтор запроса): ничего не меняем
+            if commit:
+                db.rollback()
+            logger.info(f"Заказ {order_id} уже в запрошенном состоянии, переход не требуется")
+            return dict(current._mapping)
+        if len(changes) < len(_pending_changes(None, values)):
+            # Часть полей уже в запрошенном состоянии - применяем переход только для остальных
+            return transition_order(db, order_id, **changes, expected_version=expected_version, commit=commit)
+        if commit:
+            db.rollback()
+        raise OrderTransitionError(
+            f"Недопустимый переход для заказа {order_id}: "
+            f"статус {current.status} -> {values.get('status', current.status)}, "
+            f"оплата {current.payment_status} -> {values.get('payment_status', current.payment_status)}"
+        )
+
+    if "status" in values and row.status in CLOSED_STATUSES:
+        release_order_codes(db, [order_id])
+    if "payment_status" in values:
+        apply_counter_deltas(db, revenue_today=_revenue_delta([row]))
+    if "status" in values and row.status in CLOSED_STATUSES:
+        # Лист ожидания обновляется только после фиксации (при commit=False - фиксации вызывающего)
+        run_after_commit(db, partial(waitlist.on_order_closed, order_id))
+
+    if commit:
+        db.commit()
+
+    result = dict(row._mapping)
+    logger.info(
+        f"Заказ {order_id}: статус={result['status']}, оплата={result['payment_status']}, версия={result['version']}"
+    )
+    return result
+
+
+def serialize_transition(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Формирует данные заказа для JSON-ответа после перехода статуса"""
+    return {
+        "id": result["id"],
+        "status": result["status"],
+        "payment_status": result["payment_status"],
+        "version": result["version"],
+        "updated_at": result["updated_at"].isoformat() if result.get("updated_at") else None,
+        "completed_at": result["completed_at"].isoformat() if result.get("completed_at") else None
+    }
+
+
+def bulk_transition_orders(
+    db: Session,
+    updates: List[Dict[str, Any]],
+    commit: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Применяет пакет переходов статусов в одной транзакции.
+
+    Обновления группируются по паре (status, payment_status), и для каждой группы
+    выполняется один условный UPDATE ... WHERE id IN (...) AND <допустимые исходные статусы>
+    RETURNING. Для заказов, которые не удалось обновить, причина определяется одним SELECT.
+
+    Args:
+        db: Сессия базы данных
+        updates: Список словарей {"order_id", "status", "payment_status"}
+        commit: Фиксировать ли транзакцию
+
+    Returns:
+        Результаты в порядке входного списка:
+        {"order_id", "success", "status_code", "message", "order"}
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(updates)
+    groups: Dict[Tuple[Optional[str], Optional[str]], Dict[str, Any]] = {}
+
+    # Проверяем данные и группируем обновления по целевым статусам
+    for index, item in enumerate(updates):
+        order_id = item.get("order_id")
+        try:
+            if order_id is None:
+                raise OrderTransitionError("Не указан order_id", status_code=400)
+            status = item.get("status") or None
+            payment_status = item.get("payment_status") or None
+            values, conditions = _transition_clauses(status, payment_status)
+        except OrderTransitionError as e:
+            results[index] = {
+                "order_id": order_id, "success": False,
+                "status_code": e.status_code, "message": e.message, "order": None
+            }
+            continue
+
+        key = (values.get("status"), values.get("payment_status"))
+        group = groups.setdefault(key, {"values": values, "conditions": conditions, "entries": []})
+        group["entries"].append((index, order_id))
+
+    try:
+        failed: List[Tuple[int, int, Tuple[Optional[str], Optional[str]]]] = []
+
+        for key, group in groups.items():
+            order_ids = {order_id for _, order_id in group["entries"]}
+            stmt = (
+                update(Order)
+                .where(Order.id.in_(order_ids), *group["conditions"])
+                .values(**group["values"])
+                .returning(*_RETURNING_COLUMNS)
+                .execution_options(synchronize_session=False)
+            )
+            rows = db.execute(stmt).all()
+            updated = {row.id: dict(row._mapping) for row in rows}
+
+            if key[0] in CLOSED_STATUSES and updated:
+                release_order_codes(db, updated)
+                # Лист ожидания обновляется только после фиксации (при commit=False - фиксации вызывающего)
+                for order_id in updated:
+                    run_after_commit(db, partial(waitlist.on_order_closed, order_id))
+            if key[1] is not None:
+                apply_counter_deltas(db, revenue_today=_revenue_delta(rows))
+
+            for index, order_id in group["entries"]:
+                if order_id in updated:
+                    results[index] = {
+                        "order_id": order_id, "success": True, "status_code": 200,
+                        "message": "Заказ успешно обновлен",
+                        "order": serialize_transition(updated[order_id])
+                    }
+                else:
+                    failed.append((index, order_id, key))
+
+        # Определяем причину отказа для необновленных заказов одним запросом
+        if failed:
+            current = {
+                row.id: row for row in db.execute(
+                    select(*_RETURNING_COLUMNS).where(Order.id.in_({order_id for _, order_id, _ in failed}))
+                )
+            }
+            for index, order_id, (new_status, new_payment_status) in failed:
+                row = current.get(order_id)
+                requested = groups[(new_status, new_payment_status)]["values"]
+                changes = _pending_changes(row, requested) if row is not None else {}
+                if row is None:
+                    results[index] = {
+                        "order_id": order_id, "success": False, "status_code": 404,
+                        "message": f"Заказ с ID {order_id} не найден", "order": None
+                    }
+                elif not changes:
+                    # Заказ уже в запрошенном состоянии (повтор): успех без изменений
+                    results[index] = {
+                        "order_id": order_id, "success": True, "status_code": 200,
+                        "message": "Заказ уже в запрошенном состоянии",
+                        "order": serialize_transition(dict(row._mapping))
+                    }
+                elif len(changes) < len(_pending_changes(None, requested)):
+                    # Часть полей уже в запрошенном состоянии - переход только для остальных
+                    try:
+                        result = transition_order(db, order_id, **changes, commit=False)
+                        results[index] = {
+                            "order_id": order_id, "success": True, "status_code": 200,
+                            "message": "Заказ успешно обновлен", "order": serialize_transition(result)
+                        }
+                    except OrderTransitionError as e:
+                        results[index] = {
+                            "order_id": order_id, "success": False,
+                            "status_code": e.status_code, "message": e.message, "order": None
+                        }
+                else:
+                    results[index] = {
+                        "order_id": order_id, "success": False, "status_code": 409,
+                        "message": (
+                            f"Недопустимый переход: статус {row.status} -> {new_status or row.status}, "
+                            f"оплата {row.payment_status} -> {new_payment_status or row.payment_status}"
+                        ),
+                        "order": None
+                    }
+
+        if commit:
+            db.commit()
+    except Exception:
+        if commit:
+            db.rollback()
+        raise
+
+    updated_count = sum(1 for result in results if result and result["success"])
+    logger.info(f"Пакетное обновление заказов: обновлено {updated_count} из {len(updates)}")
+    return results
@@ -2,16 +2,20 @@ from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import logging
+from app.database.session import run_after_commit
 from app.schemas.orders import OrderCreate
-from app.models.order import Order, OrderDish
+from app.models.order import Order, OrderDish, dish_snapshot
 from app.models.menu import Dish
+from app.services.waitlist import waitlist
 from sqlalchemy import and_, or_, func, desc
 import uuid
 
+from app.utils.fields import FieldSet, build_fields, nested_fields, wants
+
 # Настройка логгера
 logger = logging.getLogger(__name__)
 
-def create_order(db: Session, user_id: int, order_in: OrderCreate) -> Dict[str, Any]:
+def create_order(db: Session, user_id: int, order_in: OrderCreate, commit: bool = True) -> Dict[str, Any]:
     """
     Создание нового заказа в базе данных
     
@@ -19,6 +23,7 @@ def create_order(db: Session, user_id: int, order_in: OrderCreate) -> Dict[str,
         db: Сессия базы данных
         user_id: ID пользователя, создающего заказ
         order_in: Данные заказа
+        commit: Фиксировать ли транзакцию (False - для очереди записи, см. app.services.write_queue)
         
     Returns:
         Созданный заказ в виде словаря
@@ -46,14 +51,62 @@ def create_order(db: Session, user_id: int, order_in: OrderCreate) -> Dict[str,
             table_number = 1
             logger.info(f"Номер стола не найден, используем значение по умолчанию: {table_number}")
         
-        # Создаем объект заказа
+        # Собираем запрошенные позиции: dishes (только ID блюд, количество = 1) и items (с количеством)
+        requested_items = []
+        if order_in.dishes:
+            logger.info(f"Обработка блюд из dishes: {order_in.dishes}")
+            requested_items.extend((dish_id, 1, "") for dish_id in order_in.dishes)
+        if order_in.items:
+            logger.info(f"Обработка блюд из items: {[item.dict() for item in order_in.items]}")
+            requested_items.extend(
+                (item.dish_id, item.quantity, item.special_instructions or "") for item in order_in.items
+            )
+        
+        # Получаем все блюда заказа одним запросом
+        dish_ids = {dish_id for dish_id, _, _ in requested_items}
+        dishes = {dish.id: dish for dish in db.query(Dish).filter(Dish.id.in_(dish_ids)).all()} if dish_ids else {}
+        
+        # Вычисляем общую сумму заказа и готовим позиции для пакетной вставки
+        total_amount = 0.0
+        processed_dishes = []
+        order_dish_rows = []
+        
+        for dish_id, quantity, special_instructions in requested_items:
+            dish = dishes.get(dish_id)
+            if not dish:
+                continue
+            
+            # Добавляем стоимость блюда * количество к общей сумме
+            item_total = float(dish.price) * quantity
+            total_amount += item_total
+            
+            order_dish_rows.append({
+                **dish_snapshot(dish),  # Цена, название и категория блюда на момент заказа
+                "quantity": quantity,
+                "special_instructions": special_instructions
+            })
+            
+            # Добавляем информацию о блюде в список обработанных
+            processed_dishes.append({
+                "id": dish.id,
+                "dish_id": dish.id,
+                "name": dish.name,
+                "price": float(dish.price),
+                "quantity": quantity,
+                "special_instructions": special_instructions,
+                "total_price": item_total
+            })
+        
+        logger.info(f"Общая сумма заказа: {total_amount}")
+        
+        # Создаем объект заказа сразу с итоговой суммой
         db_order = Order(
             user_id=user_id,
             table_number=table_number,
             status=order_in.status,
             payment_status="pending",
             payment_method="cash",  # Значение по умолчанию
-            total_amount=0.0,
+            total_amount=total_amount,
             order_code=order_code,
             reservation_code=order_in.reservation_code,
             customer_name=order_in.customer_name,
@@ -66,80 +119,21 @@ def create_order(db: Session, user_id: int, order_in: OrderCreate) -> Dict[str,
         db.add(db_order)
         db.flush()  # Для получения ID заказа
         
-        # Вычисляем общую сумму заказа
-        total_amount = 0.0
-        processed_dishes = []
-        
-        # Обрабатываем обычные dishes (только ID блюд)
-        if order_in.dishes:
-            logger.info(f"Обработка блюд из dishes: {order_in.dishes}")
-            for dish_id in order_in.dishes:
-                # Получаем блюдо из базы данных
-                dish = db.query(Dish).filter(Dish.id == dish_id).first()
-                if dish:
-                    # Создаем связь между заказом и блюдом (количество = 1 по умолчанию)
-                    order_dish = OrderDish(
-                        order_id=db_order.id,
-                        dish_id=dish_id,
-                        quantity=1,  # По умолчанию 1
-                        price=dish.price,  # Цена из блюда
-                        special_instructions=""
-                    )
-                    db.add(order_dish)
-                    
-                    # Добавляем стоимость блюда к общей сумме
-                    total_amount += float(dish.price)
-                    
-                    # Добавляем информацию о блюде в список обработанных
-                    processed_dishes.append({
-                        "id": dish.id,
-                        "dish_id": dish.id,
-                        "name": dish.name,
-                        "price": float(dish.price),
-                        "quantity": 1,
-                        "special_instructions": "",
-                        "total_price": float(dish.price)
-                    })
-        
-        # Обрабатываем items (объекты с dish_id и quantity)
-        if order_in.items:
-            logger.info(f"Обработка блюд из items: {[item.dict() for item in order_in.items]}")
-            for item in order_in.items:
-                # Получаем блюдо из базы данных
-                dish = db.query(Dish).filter(Dish.id == item.dish_id).first()
-                if dish:
-                    # Создаем связь между заказом и блюдом с указанным количеством
-                    order_dish = OrderDish(
-                        order_id=db_order.id,
-                        dish_id=item.dish_id,
-                        quantity=item.quantity,
-                        price=dish.price,  # Цена из блюда
-                        special_instructions=item.special_instructions or ""
-                    )
-                    db.add(order_dish)
-                    
-                    # Добавляем стоимость блюда * количество к общей сумме
-                    item_total = float(dish.price) * item.quantity
-                    total_amount += item_total
-                    
-                    # Добавляем информацию о блюде в список обработанных
-                    processed_dishes.append({
-                        "id": dish.id,
-                        "dish_id": dish.id,
-                        "name": dish.name,
-                        "price": float(dish.price),
-                        "quantity": item.quantity,
-                        "special_instructions": item.special_instructions or "",
-                        "total_price": item_total
-                    })
+        # Создаем связи между заказом и блюдами одной пакетной вставкой
+        if order_dish_rows:
+            for row in order_dish_rows:
+                row["order_id"] = db_order.id
+            db.bulk_insert_mappings(OrderDish, order_dish_rows)
         
-        # Обновляем общую сумму заказа
-        db_order.total_amount = total_amount
-        logger.info(f"Общая сумма заказа: {total_amount}")
+        # Учитываем заказ в оценке освобождения столов для листа ожидания - после фиксации
+        cooking_minutes = max((dishes[row["dish_id"]].cooking_time or 0 for row in order_dish_rows), default=None)
+        run_after_commit(db, lambda: waitlist.on_order_opened(
+            db_order.id, db_order.table_number, db_order.created_at, cooking_minutes
+        ))
         
-        # Сохраняем изменения
-        db.commit()
-        db.refresh(db_order)
+        # Сохраняем изменения (объект остается актуальным, повторное чтение не нужно)
+        if commit:
+            db.commit()
         
         logger.info(f"Заказ успешно создан, ID: {db_order.id}")
         
@@ -169,10 +163,34 @@ def create_order(db: Session, user_id: int, order_in: OrderCreate) -> Dict[str,
         return result
         
     except Exception as e:
-        db.rollback()
+        if commit:
+            db.rollback()
         logger.error(f"Ошибка при создании заказа: {str(e)}")
         raise
 
+def get_items_for_orders(order_ids: List[int], db: Session, fields: Optional[FieldSet] = None) -> Dict[int, List[Dict[str, Any]]]:
+    """Загружает позиции для набора заказов и группирует их по ID заказа"""
+    order_dishes = db.query(OrderDish).filter(OrderDish.order_id.in_(order_ids)).all()
+    
+    dish_names = {}
+    if wants(fields, "name"):
+        dish_ids = {item.dish_id for item in order_dishes}
+        if dish_ids:
+            dish_names = dict(db.query(Dish.id, Dish.name).filter(Dish.id.in_(dish_ids)).all())
+    
+    items_by_order: Dict[int, List[Dict[str, Any]]] = {}
+    for item in order_dishes:
+        items_by_order.setdefault(item.order_id, []).append(build_fields({
+            "id": lambda: item.id,
+            "dish_id": lambda: item.dish_id,
+            "name": lambda: dish_names.get(item.dish_id) or f"Блюдо #{item.dish_id}",
+            "quantity": lambda: item.quantity,
+            "price": lambda: float(item.price),
+            "total_price": lambda: float(item.price * item.quantity),
+            "special_instructions": lambda: item.special_instructions or ""
+        }, fields))
+    return items_by_order
+
 def get_orders(
     db: Session,
     skip: int = 0,
@@ -180,7 +198,8 @@ def get_orders(
     status: Optional[str] = None,
     user_id: Optional[int] = None,
     start_date: Optional[str] = None,
-    end_date: Optional[str] = None
+    end_date: Optional[str] = None,
+    fields: Optional[FieldSet] = None
 ) -> List[Dict[str, Any]]:
     """
     Получение списка заказов с возможностью фильтрации
@@ -193,6 +212,7 @@ def get_orders(
         user_id: Фильтр по ID пользователя (если указан)
         start_date: Начальная дата для выборки (если указана)
         end_date: Конечная дата для выборки (если указана)
+        fields: Набор запрошенных полей (см. app.utils.fields), None - все поля
         
     Returns:
         Список словарей с данными заказов
@@ -205,7 +225,8 @@ def get_orders(
         
         # Добавляем условия фильтрации
         if status:
-            query = query.filter(func.lower(Order.status) == func.lower(status))
+            # Статус нормализуется типом колонки (OrderStatusType), поэтому фильтр использует индекс
+            query = query.filter(Order.status == status)
         
         if user_id:
             query = query.filter(Order.user_id == user_id)
@@ -235,50 +256,34 @@ def get_orders(
         orders = query.all()
         logger.info(f"Найдено {len(orders)} заказов")
         
+        # Позиции заказов загружаем только если они запрошены, двумя запросами на всю страницу
+        items_by_order: Dict[int, List[Dict[str, Any]]] = {}
+        if orders and wants(fields, "items"):
+            items_by_order = get_items_for_orders([order.id for order in orders], db, nested_fields(fields, "items"))
+        
         # Преобразуем объекты Order в словари
         result = []
         for order in orders:
-            # Получаем позиции заказа
-            order_dishes = db.query(OrderDish).filter(OrderDish.order_id == order.id).all()
-            
-            # Формируем список позиций
-            items = []
-            for item in order_dishes:
-                # Получаем связанное блюдо, чтобы извлечь его название
-                dish = db.query(Dish).filter(Dish.id == item.dish_id).first()
-                dish_name = dish.name if dish else f"Блюдо #{item.dish_id}"
-                
-                items.append({
-                    "id": item.id,
-                    "dish_id": item.dish_id,
-                    "name": dish_name,
-                    "quantity": item.quantity,
-                    "price": float(item.price),
-                    "total_price": float(item.price * item.quantity),
-                    "special_instructions": item.special_instructions or ""
-                })
-            
-            # Формируем словарь с данными заказа
-            order_dict = {
-                "id": order.id,
-                "user_id": order.user_id,
-                "waiter_id": order.waiter_id,
-                "table_number": order.table_number,
-                "status": order.status,
-                "payment_status": order.payment_status,
-                "payment_method": order.payment_method,
-                "total_amount": float(order.total_amount),
-                "comment": order.comment,
-                "special_instructions": order.comment,
-                "created_at": order.created_at.isoformat() if order.created_at else None,
-                "updated_at": order.updated_at.isoformat() if order.updated_at else None,
-                "completed_at": order.completed_at.isoformat() if order.completed_at else None,
-                "customer_name": order.customer_name or "",
-                "customer_phone": order.customer_phone or "",
-                "order_code": order.order_code or "",
-                "is_urgent": order.is_urgent or False,
-                "items": items
-            }
+            order_dict = build_fields({
+                "id": lambda: order.id,
+                "user_id": lambda: order.user_id,
+                "waiter_id": lambda: order.waiter_id,
+                "table_number": lambda: order.table_number,
+                "status": lambda: order.status,
+                "payment_status": lambda: order.payment_status,
+                "payment_method": lambda: order.payment_method,
+                "total_amount": lambda: float(order.total_amount),
+                "comment": lambda: order.comment,
+                "special_instructions": lambda: order.comment,
+                "created_at": lambda: order.created_at.isoformat() if order.created_at else None,
+                "updated_at": lambda: order.updated_at.isoformat() if order.updated_at else None,
+                "completed_at": lambda: order.completed_at.isoformat() if order.completed_at else None,
+                "customer_name": lambda: order.customer_name or "",
+                "customer_phone": lambda: order.customer_phone or "",
+                "order_code": lambda: order.order_code or "",
+                "is_urgent": lambda: order.is_urgent or False,
+                "items": lambda: items_by_order.get(order.id, [])
+            }, fields)
             
             result.append(order_dict)
         
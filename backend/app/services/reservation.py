@@ -7,6 +7,8 @@ from sqlalchemy.orm import Session
 
 from app.models.reservation import Reservation, ReservationStatus
 from app.schemas.reservation import ReservationCreate, ReservationUpdate
+from app.services.availability import availability, ACTIVE_STATUSES
+from app.utils.date_utils import day_bounds
 
 
 def get_reservation(db: Session, reservation_id: int) -> Optional[Reservation]:
@@ -30,14 +32,13 @@ def get_reservations_by_date(
     db: Session, date: datetime, skip: int = 0, limit: int = 100
 ) -> List[Reservation]:
     """Получение списка бронирований на определенную дату"""
-    # Извлекаем только дату (без времени)
-    start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_day = date.replace(hour=23, minute=59, second=59, microsecond=999999)
+    # Полуоткрытый интервал дня - фильтр по индексу ix_reservations_time_status
+    start_of_day, next_day = day_bounds(date)
     
     return db.query(Reservation).filter(
         Reservation.reservation_time >= start_of_day,
-        Reservation.reservation_time <= end_of_day
-    ).offset(skip).limit(limit).all()
+        Reservation.reservation_time < next_day
+    ).order_by(Reservation.reservation_time).offset(skip).limit(limit).all()
 
 
 def get_reservations_by_status(
@@ -50,7 +51,24 @@ def get_reservations_by_status(
 def create_reservation(
     db: Session, user_id: int, reservation_in: ReservationCreate
 ) -> Reservation:
-    """Создание новой брони"""
+    """
+    Создание новой брони. Если указан стол, он должен быть свободен на время брони,
+    иначе ReservationConflictError.
+    """
+    with availability.lock:
+        if reservation_in.table_number:
+            availability.ensure_available(db, reservation_in.table_number, reservation_in.reservation_time)
+        
+        db_reservation = _insert_reservation(db, user_id, reservation_in)
+        availability.apply(db_reservation)
+    
+    return db_reservation
+
+
+def _insert_reservation(
+    db: Session, user_id: int, reservation_in: ReservationCreate
+) -> Reservation:
+    """Сохранение новой брони в базе данных"""
     # Сохраняем исходный код бронирования для логирования
     original_code = reservation_in.reservation_code
     
@@ -123,11 +141,34 @@ def create_reservation(
 def update_reservation(
     db: Session, reservation_id: int, reservation_in: ReservationUpdate
 ) -> Optional[Reservation]:
-    """Обновление брони"""
-    db_reservation = get_reservation(db, reservation_id)
+    """
+    Обновление брони. Если после изменения бронь активна и привязана к столу,
+    стол должен быть свободен на новое время, иначе ReservationConflictError.
+    """
+    with availability.lock:
+        db_reservation = get_reservation(db, reservation_id)
+        
+        if not db_reservation:
+            return None
+        
+        changes = reservation_in.dict(exclude_unset=True)
+        table_number = changes.get("table_number", db_reservation.table_number)
+        reservation_time = changes.get("reservation_time") or db_reservation.reservation_time
+        new_status = changes.get("status") or db_reservation.status
+        if table_number and str(getattr(new_status, "value", new_status)).lower() in ACTIVE_STATUSES:
+            availability.ensure_available(db, table_number, reservation_time, exclude_id=reservation_id)
+        
+        db_reservation = _apply_reservation_update(db, db_reservation, reservation_in)
+        availability.apply(db_reservation)
     
-    if not db_reservation:
-        return None
+    return db_reservation
+
+
+def _apply_reservation_update(
+    db: Session, db_reservation: Reservation, reservation_in: ReservationUpdate
+) -> Reservation:
+    """Сохранение изменений брони (код бронирования не изменяется)"""
+    reservation_id = db_reservation.id
     
     # Сохраняем текущий код бронирования
     original_code = db_reservation.reservation_code
@@ -178,5 +219,6 @@ def delete_reservation(db: Session, reservation_id: int) -> bool:
     
     db.delete(db_reservation)
     db.commit()
+    availability.remove(reservation_id)
     
     return True 
\ No newline at end of file
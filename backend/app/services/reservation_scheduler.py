@@ -0,0 +1,129 @@
+"""
+Фоновый планировщик бронирований.
+
+За один запуск (тик):
+- брони в статусе pending/confirmed, время которых прошло больше чем на
+  RESERVATION_NO_SHOW_GRACE_MINUTES, помечаются как no_show одним UPDATE по пакету;
+- для ближайших броней (в пределах RESERVATION_REMINDER_MINUTES) ставятся в очередь
+  напоминания гостям (email пользователя и SMS на guest_phone).
+
+Обе выборки ограничены RESERVATION_SCHEDULER_BATCH_SIZE строк и интервалом времени
+по индексу ix_reservations_time_status, вся работа тика фиксируется одной транзакцией.
+Время броней хранится в UTC, поэтому сравнения идут с datetime.utcnow(); в местное
+время оно переводится только в тексте напоминания.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import logging
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.reservation import Reservation, ReservationStatus
+from app.models.user import User
+from app.services import notification as notification_service
+from app.services.availability import availability, ACTIVE_STATUSES
+from app.services.settings_cache import settings_cache
+from app.utils.date_utils import to_local
+
+logger = logging.getLogger(__name__)
+
+
+def _reminder_text(restaurant_name: str, reservation_time: datetime, table_number: Optional[int]) -> str:
+    table = f", стол {table_number}" if table_number else ""
+    return (
+        f"Напоминаем о бронировании в ресторане «{restaurant_name}» "
+        f"{to_local(reservation_time).strftime('%d.%m.%Y в %H:%M')}{table}."
+    )
+
+
+def run_tick(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Выполняет один тик планировщика.
+
+    Args:
+        db: Сессия базы данных
+        now: Текущее время в UTC без часового пояса (по умолчанию datetime.utcnow())
+
+    Returns:
+        {"no_show": количество броней, отмеченных неявкой, "reminders": количество уведомлений}
+    """
+    now = now or datetime.utcnow()
+    batch_size = settings.RESERVATION_SCHEDULER_BATCH_SIZE
+    active_statuses = list(ACTIVE_STATUSES)
+
+    try:
+        # Неявки: пакет просроченных броней обновляется одним UPDATE ... WHERE id IN (подзапрос)
+        overdue = (
+            select(Reservation.id)
+            .where(
+                Reservation.reservation_time >= now - timedelta(hours=settings.RESERVATION_NO_SHOW_LOOKBACK_HOURS),
+                Reservation.reservation_time < now - timedelta(minutes=settings.RESERVATION_NO_SHOW_GRACE_MINUTES),
+                Reservation.status.in_(active_statuses)
+            )
+            .order_by(Reservation.reservation_time)
+            .limit(batch_size)
+        )
+        no_show_ids = db.execute(
+            update(Reservation)
+            .where(Reservation.id.in_(overdue.scalar_subquery()))
+            .values(status=ReservationStatus.NO_SHOW.value, updated_at=datetime.utcnow())
+            .returning(Reservation.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        # Напоминания о ближайших бронях, которым напоминание еще не отправлялось
+        upcoming = db.execute(
+            select(
+                Reservation.id, Reservation.reservation_time, Reservation.table_number,
+                Reservation.guest_phone, User.email
+            )
+            .outerjoin(User, User.id == Reservation.user_id)
+            .where(
+                Reservation.reservation_time >= now,
+                Reservation.reservation_time < now + timedelta(minutes=settings.RESERVATION_REMINDER_MINUTES),
+                Reservation.status.in_(active_statuses),
+                Reservation.reminder_sent_at.is_(None)
+            )
+            .order_by(Reservation.reservation_time)
+            .limit(batch_size)
+        ).all()
+
+        reminders = []
+        if upcoming:
+            db_settings = settings_cache.get(db)
+            restaurant_name = db_settings.restaurant_name or settings.PROJECT_NAME
+            subject = f"Напоминание о бронировании: {restaurant_name}"
+            for row in upcoming:
+                text = _reminder_text(restaurant_name, row.reservation_time, row.table_number)
+                if row.email:
+                    reminders.append({
+                        "channel": notification_service.EMAIL, "recipient": row.email,
+                        "subject": subject, "body": text, "reservation_id": row.id
+                    })
+                if row.guest_phone and db_settings.sms_sender:
+                    reminders.append({
+                        "channel": notification_service.SMS, "recipient": row.guest_phone,
+                        "subject": db_settings.sms_sender, "body": text, "reservation_id": row.id
+                    })
+            notification_service.queue_notifications(db, reminders)
+            db.execute(
+                update(Reservation)
+                .where(Reservation.id.in_([row.id for row in upcoming]))
+                .values(reminder_sent_at=now)
+                .execution_options(synchronize_session=False)
+            )
+
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка планировщика бронирований: {str(e)}")
+        raise
+
+    for reservation_id in no_show_ids:
+        availability.remove(reservation_id)
+
+    if no_show_ids or reminders:
+        logger.info(f"Планировщик бронирований: неявок {len(no_show_ids)}, напоминаний {len(reminders)}")
+    return {"no_show": len(no_show_ids), "reminders": len(reminders)}
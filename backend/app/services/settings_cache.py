@@ -0,0 +1,150 @@
+"""
+Кэш настроек ресторана.
+
+Настройки загружаются из БД один раз (при запуске или при первом обращении) и хранятся
+в памяти процесса: сервисы читают валюту, налог, часы работы и SMTP через
+settings_cache.get() без запроса к БД. PUT /settings перечитывает кэш, смена статуса
+стола обновляет в нем только этот стол.
+
+Для GET /settings кэш хранит готовый ответ (с замаскированными секретами) и его ETag,
+так что повторный запрос клиента с If-None-Match получает 304 без сериализации.
+
+При нескольких воркерах изменение настроек в одном процессе увеличивает общую версию
+(SharedVersion), и остальные процессы перечитывают кэш при следующем обращении.
+"""
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import logging
+import threading
+
+from sqlalchemy.orm import Session
+
+from app.core.process_sync import SharedVersion
+from app.database.session import SessionLocal
+from app.models.settings import Settings
+from app.services import tables as tables_service
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("restaurant_name", "email", "phone", "address", "currency", "currency_symbol")
+SECRET_FIELDS = ("smtp_password", "sms_api_key")
+
+
+def _ensure_settings_row(db: Session) -> Settings:
+    """Возвращает строку настроек, создавая ее и дополняя обязательные поля дефолтами"""
+    db_settings = db.query(Settings).first()
+    if not db_settings:
+        logger.info("Настройки не найдены, создаем дефолтные")
+        db_settings = Settings.create_default()
+        db.add(db_settings)
+        db.commit()
+        db.refresh(db_settings)
+
+    missing_fields = [field for field in REQUIRED_FIELDS if not getattr(db_settings, field)]
+    if missing_fields:
+        logger.error(f"Отсутствуют обязательные поля: {missing_fields}")
+        default_settings = Settings.create_default()
+        for field in missing_fields:
+            setattr(db_settings, field, getattr(default_settings, field))
+        db.commit()
+        db.refresh(db_settings)
+    return db_settings
+
+
+class SettingsCache:
+    """Снимок настроек ресторана в памяти процесса"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._version = SharedVersion("settings")
+        self._values: Optional[Dict[str, Any]] = None
+        self._public: Optional[Dict[str, Any]] = None
+        self._etag: Optional[str] = None
+
+    def invalidate(self) -> None:
+        """Сбрасывает кэш; настройки будут загружены заново при следующем обращении"""
+        with self.lock:
+            self._values = None
+
+    def load(self, db: Session) -> None:
+        """Читает настройки и столы из БД (создавая недостающие) и пересобирает снимок"""
+        with self.lock:
+            db_settings = _ensure_settings_row(db)
+            tables = tables_service.get_tables(db)
+            if not tables:
+                logger.warning("Отсутствуют данные о столах, переносим из настроек")
+                tables_service.seed_tables_from_settings(db)
+                tables = tables_service.get_tables(db)
+
+            values = {
+                column.name: getattr(db_settings, column.name)
+                for column in Settings.__table__.columns
+                if column.name != "tables"
+            }
+            values["tables"] = tables
+            self._set(values)
+            logger.info(f"Настройки ресторана загружены в кэш, ETag {self._etag}")
+
+    def _set(self, values: Dict[str, Any]) -> None:
+        public = dict(values)
+        for field in SECRET_FIELDS:
+            public[field] = "********" if values.get(field) else None
+        body = json.dumps(public, sort_keys=True, ensure_ascii=False, default=str)
+        self._values = values
+        self._public = public
+        self._etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+
+    def ensure_loaded(self, db: Optional[Session] = None) -> None:
+        if self._version.changed():
+            self.invalidate()
+        if self._values is not None:
+            return
+        with self.lock:
+            if self._values is not None:
+                return
+            if db is not None:
+                self.load(db)
+                return
+            own_db = SessionLocal()
+            try:
+                self.load(own_db)
+            finally:
+                own_db.close()
+
+    def get(self, db: Optional[Session] = None) -> SimpleNamespace:
+        """
+        Настройки ресторана с доступом через атрибуты (settings.currency, settings.tables...).
+        После первой загрузки запросов к БД нет; секреты не замаскированы.
+        """
+        self.ensure_loaded(db)
+        with self.lock:
+            return SimpleNamespace(**self._values)
+
+    def public(self, db: Optional[Session] = None) -> Tuple[Dict[str, Any], str]:
+        """Ответ для GET /settings (секреты замаскированы) и его ETag"""
+        self.ensure_loaded(db)
+        with self.lock:
+            return self._public, self._etag
+
+    def refresh(self, db: Session) -> Tuple[Dict[str, Any], str]:
+        """Перечитывает настройки после изменения и возвращает новый ответ и ETag"""
+        self.load(db)
+        self._version.bump()
+        return self.public(db)
+
+    def update_table(self, table: Dict[str, Any]) -> None:
+        """Обновляет в снимке один стол (после смены статуса) без чтения БД"""
+        with self.lock:
+            if self._values is not None:
+                values = dict(self._values)
+                values["tables"] = [
+                    dict(table) if item["id"] == table["id"] else item
+                    for item in values["tables"]
+                ]
+                self._set(values)
+        self._version.bump()
+
+
+settings_cache = SettingsCache()
@@ -0,0 +1,122 @@
+"""
+Столы ресторана.
+
+Каждый стол - отдельная строка restaurant_tables, поэтому смена статуса стола -
+один UPDATE одной строки по первичному ключу, без перезаписи настроек ресторана.
+Раскладка зала целиком меняется только через PUT /settings (replace_tables).
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import logging
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.models.settings import Settings
+from app.models.table import RestaurantTable, TableStatus
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_FIELDS = ("number", "name", "capacity", "is_active", "position_x", "position_y", "status")
+
+
+def _normalize(table: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """Заполняет отсутствующие поля стола так же, как раньше это делал GET /settings"""
+    table_id = table.get("id") or index
+    return {
+        "id": table_id,
+        "number": table.get("number") or table_id,
+        "name": table.get("name") or f"Стол {table_id}",
+        "capacity": table.get("capacity") or 2,
+        "is_active": table.get("is_active", True),
+        "position_x": table.get("position_x", 15 + (table_id - 1) * 20),
+        "position_y": table.get("position_y", 15 + (table_id % 2) * 20),
+        "status": getattr(table.get("status"), "value", table.get("status")) or TableStatus.AVAILABLE.value,
+    }
+
+
+def get_tables(
+    db: Session,
+    active_only: bool = False,
+    status: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Столы по возрастанию номера"""
+    query = db.query(RestaurantTable)
+    if active_only:
+        query = query.filter(RestaurantTable.is_active.is_(True))
+    if status:
+        query = query.filter(RestaurantTable.status == status)
+    return [table.to_dict() for table in query.order_by(RestaurantTable.number).all()]
+
+
+def update_table_status(db: Session, table_id: int, status: str) -> Optional[Dict[str, Any]]:
+    """
+    Меняет статус одного стола одним UPDATE ... RETURNING.
+
+    Returns:
+        Обновленный стол или None, если стола нет
+    """
+    table_columns = RestaurantTable.__table__.c
+    row = db.execute(
+        update(RestaurantTable)
+        .where(RestaurantTable.id == table_id)
+        .values(status=status, updated_at=datetime.utcnow())
+        .returning(*[table_columns[name] for name in ("id",) + LAYOUT_FIELDS])
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.commit()
+    return dict(row._mapping) if row else None
+
+
+def replace_tables(db: Session, tables: List[Dict[str, Any]]) -> None:
+    """
+    Приводит таблицу столов к переданной раскладке: существующие столы обновляются по id,
+    новые добавляются, отсутствующие в списке удаляются. Фиксацию выполняет вызывающий код.
+    """
+    incoming = [_normalize(table, index) for index, table in enumerate(tables, start=1)]
+    existing = {table.id: table for table in db.query(RestaurantTable).all()}
+
+    incoming_ids = {table["id"] for table in incoming}
+    for table_id, table in existing.items():
+        if table_id not in incoming_ids:
+            db.delete(table)
+    # Удаление раньше вставки: номер удаленного стола может перейти к новому
+    db.flush()
+
+    for data in incoming:
+        table = existing.get(data["id"])
+        if table is None:
+            db.add(RestaurantTable(**data))
+        else:
+            for field in LAYOUT_FIELDS:
+                setattr(table, field, data[field])
+
+
+def seed_tables_from_settings(db: Session) -> int:
+    """
+    Переносит столы из JSON-колонки Settings.tables в restaurant_tables, если таблица пуста.
+    Если JSON тоже пуст, создаются столы по умолчанию.
+
+    Returns:
+        Количество созданных столов
+    """
+    if db.query(RestaurantTable.id).first() is not None:
+        return 0
+
+    db_settings = db.query(Settings).first()
+    tables = db_settings.tables if db_settings and isinstance(db_settings.tables, list) else None
+    if not tables:
+        tables = Settings.create_default().tables
+
+    try:
+        replace_tables(db, tables)
+        if db_settings is not None:
+            db_settings.tables = None
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка при переносе столов из настроек: {str(e)}")
+        raise
+
+    logger.info(f"Перенесено столов из настроек: {len(tables)}")
+    return len(tables)
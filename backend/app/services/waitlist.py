@@ -0,0 +1,190 @@
+"""
+Лист ожидания гостей без брони.
+
+Очередь хранится в памяти процесса (heapq) и упорядочена по приоритету и времени
+постановки. Оценка времени, когда освободится стол, строится из открытых заказов
+за столом (Order.table_number, created_at и максимальное Dish.cooking_time блюд заказа
+плюс WAITLIST_DINING_MINUTES на сам прием пищи) и ближайших бронирований из индекса
+доступности столов.
+
+Открытые заказы загружаются одним запросом при первом обращении, дальше состояние
+столов обновляется точечно: при создании заказа добавляется его оценка, при закрытии
+заказа пересчитывается только его стол, без повторного чтения заказов.
+
+При нескольких воркерах открытие и закрытие заказа увеличивает общую версию состояния
+столов (SharedVersion), и остальные процессы перечитывают открытые заказы. Сама очередь
+гостей хранится в памяти процесса: в режиме нескольких воркеров лист ожидания ведется
+в каждом воркере отдельно.
+
+Все времена - в UTC без часового пояса, как created_at заказов и reservation_time
+в базе и в индексе доступности столов.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import heapq
+import itertools
+import logging
+import threading
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.process_sync import SharedVersion
+from app.models.menu import Dish
+from app.models.order import Order, OrderDish, OrderStatus
+from app.services.availability import availability
+
+logger = logging.getLogger(__name__)
+
+CLOSED_ORDER_STATUSES = [OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value]
+
+DEFAULT_COOKING_MINUTES = 15
+
+
+class Waitlist:
+    """Очередь ожидающих гостей и оценка освобождения столов"""
+
+    def __init__(self, dining_minutes: int):
+        self.dining = timedelta(minutes=dining_minutes)
+        self.lock = threading.RLock()
+        self._version = SharedVersion("waitlist")
+        self._loaded = False
+        # Очередь: (-приоритет, время постановки, id); удаленные записи пропускаются при обходе
+        self._heap: List[Tuple[int, datetime, int]] = []
+        self._parties: Dict[int, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        # Открытые заказы по столам: {стол: {id заказа: ожидаемое время освобождения}}
+        self._table_orders: Dict[int, Dict[int, datetime]] = {}
+        self._order_tables: Dict[int, int] = {}
+
+    def invalidate(self) -> None:
+        """Сбрасывает состояние столов; оно будет загружено заново при следующем обращении"""
+        with self.lock:
+            self._loaded = False
+
+    def _ensure_loaded(self, db: Session) -> None:
+        if self._version.changed():
+            self._loaded = False
+        if self._loaded:
+            return
+        rows = db.query(
+            Order.id,
+            Order.table_number,
+            Order.created_at,
+            func.max(Dish.cooking_time).label("cooking_time")
+        ).outerjoin(
+            OrderDish, OrderDish.order_id == Order.id
+        ).outerjoin(
+            Dish, Dish.id == OrderDish.dish_id
+        ).filter(
+            Order.table_number.isnot(None),
+            Order.status.notin_(CLOSED_ORDER_STATUSES)
+        ).group_by(Order.id).all()
+
+        self._table_orders = {}
+        self._order_tables = {}
+        for row in rows:
+            self._track_order(row.id, row.table_number, row.created_at, row.cooking_time)
+        self._loaded = True
+        logger.info(f"Лист ожидания: загружено {len(rows)} открытых заказов")
+
+    def _track_order(
+        self, order_id: int, table_number: int, created_at: Optional[datetime], cooking_minutes: Optional[int]
+    ) -> None:
+        created = created_at or datetime.utcnow()
+        ready_at = created + timedelta(minutes=cooking_minutes or DEFAULT_COOKING_MINUTES) + self.dining
+        self._table_orders.setdefault(table_number, {})[order_id] = ready_at
+        self._order_tables[order_id] = table_number
+
+    def on_order_opened(
+        self, order_id: int, table_number: Optional[int], created_at: Optional[datetime], cooking_minutes: Optional[int]
+    ) -> None:
+        """Учитывает новый заказ за столом"""
+        if not table_number:
+            return
+        with self.lock:
+            if self._loaded:
+                self._track_order(order_id, table_number, created_at, cooking_minutes)
+        self._version.bump()
+
+    def on_order_closed(self, order_id: int) -> None:
+        """Убирает закрытый заказ: пересчитывается только его стол"""
+        with self.lock:
+            table_number = self._order_tables.pop(order_id, None)
+            if table_number is not None:
+                self._table_orders.get(table_number, {}).pop(order_id, None)
+        self._version.bump()
+
+    def _table_ready_at(self, table_number: int, now: datetime) -> datetime:
+        orders = self._table_orders.get(table_number)
+        ready_at = max(orders.values()) if orders else now
+        # Стол должен быть свободен и от ближайших бронирований
+        return availability.next_free_time(table_number, max(ready_at, now))
+
+    def add_party(
+        self, guest_name: str, guests_count: int, guest_phone: Optional[str] = None, priority: int = 0
+    ) -> int:
+        """Ставит гостей в очередь и возвращает ID записи"""
+        with self.lock:
+            party_id = next(self._ids)
+            created_at = datetime.utcnow()
+            self._parties[party_id] = {
+                "id": party_id,
+                "guest_name": guest_name,
+                "guest_phone": guest_phone,
+                "guests_count": guests_count,
+                "priority": priority,
+                "created_at": created_at,
+            }
+            heapq.heappush(self._heap, (-priority, created_at, party_id))
+            return party_id
+
+    def remove_party(self, party_id: int) -> bool:
+        """Убирает гостей из очереди (посажены или ушли)"""
+        with self.lock:
+            return self._parties.pop(party_id, None) is not None
+
+    def entries(self, db: Session) -> List[Dict[str, Any]]:
+        """
+        Очередь с оценками: гости в порядке приоритета по очереди получают стол подходящей
+        вместимости, который освободится раньше других; после этого стол считается занятым
+        еще на длительность брони.
+        """
+        with self.lock:
+            self._ensure_loaded(db)
+            tables = availability.get_tables(db)
+            now = datetime.utcnow()
+
+            # Удаленные записи выбрасываем из кучи только при обходе
+            self._heap = [item for item in self._heap if item[2] in self._parties]
+            heapq.heapify(self._heap)
+
+            free_at = {table["number"]: self._table_ready_at(table["number"], now) for table in tables}
+            result = []
+            for position, (_, _, party_id) in enumerate(sorted(self._heap), start=1):
+                party = dict(self._parties[party_id])
+                candidates = [
+                    table["number"] for table in tables
+                    if (table.get("capacity") or 0) >= party["guests_count"]
+                ]
+                table_number = min(candidates, key=lambda number: free_at[number]) if candidates else None
+                eta = free_at[table_number] if table_number is not None else None
+                if table_number is not None:
+                    free_at[table_number] = availability.next_free_time(
+                        table_number, eta + availability.duration
+                    )
+                party.update({
+                    "position": position,
+                    "table_number": table_number,
+                    "eta": eta,
+                    "wait_minutes": max(0, round((eta - now).total_seconds() / 60)) if eta else None,
+                })
+                result.append(party)
+            return result
+
+    def get_entry(self, db: Session, party_id: int) -> Optional[Dict[str, Any]]:
+        return next((entry for entry in self.entries(db) if entry["id"] == party_id), None)
+
+
+waitlist = Waitlist(settings.WAITLIST_DINING_MINUTES)
@@ -0,0 +1,177 @@
+"""
+Очередь записи с групповой фиксацией (group commit).
+
+SQLite допускает одного писателя: при одновременном создании заказов и смене статусов
+каждый запрос фиксирует свою транзакцию (с synchronous=FULL - отдельный fsync) и ждет
+блокировку базы. При включенной настройке WRITE_QUEUE_ENABLED такие операции передаются
+одному потоку-писателю, который выполняет накопившиеся операции в одной транзакции
+и фиксирует их одним COMMIT. Вызывающий ждет результат своей операции через Future.
+
+Операция - функция сервиса вида fn(db, *args, commit=..., **kwargs), поддерживающая
+commit=False (без фиксации, как order_state.transition_order). Если операция завершилась
+ошибкой, не изменив данные (например, недопустимый переход статуса), остальные операции
+пакета продолжаются; если изменения успели попасть в транзакцию, пакет откатывается,
+а остальные операции выполняются заново.
+Изменения состояния в памяти процесса (лист ожидания) операции откладывают через
+run_after_commit: они выполняются только после COMMIT пакета и отбрасываются при его откате.
+
+Очередь своя у каждого процесса; при нескольких воркерах писатели разных процессов
+по-прежнему конкурируют за блокировку базы, но каждый фиксирует пакет, а не одну операцию.
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_Job = Tuple[Callable[..., Any], tuple, Dict[str, Any], Future]
+
+
+class WriteQueue:
+    """Поток-писатель, объединяющий операции записи в общие транзакции"""
+
+    def __init__(self, max_batch: int = 64, max_wait_seconds: float = 0.002):
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_seconds
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.operations = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+                self._thread.start()
+                logger.info(
+                    f"Очередь записи запущена: до {self.max_batch} операций в транзакции, "
+                    f"ожидание {self.max_wait_seconds * 1000:.1f} мс"
+                )
+
+    def stop(self, timeout: float = 30) -> None:
+        """Выполняет уже поставленные операции и останавливает поток-писатель"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, fn: Callable[..., T], *args, **kwargs) -> "Future[T]":
+        """Ставит операцию fn(db, *args, commit=False, **kwargs) в очередь"""
+        future: "Future[T]" = Future()
+        self.start()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            batch = [job]
+            stop = False
+            deadline = time.monotonic() + self.max_wait_seconds
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+
+            self._execute(batch)
+            if stop:
+                return
+
+    def _execute(self, batch: List[_Job]) -> None:
+        """Выполняет пакет операций в одной транзакции"""
+        pending = [job for job in batch if job[3].set_running_or_notify_cancel()]
+        db = SessionLocal()
+        try:
+            while pending:
+                done: List[Tuple[_Job, Any]] = []
+                retry: List[_Job] = []
+                for index, job in enumerate(pending):
+                    fn, args, kwargs, future = job
+                    changes = _total_changes(db)
+                    try:
+                        done.append((job, fn(db, *args, commit=False, **kwargs)))
+                    except Exception as e:
+                        future.set_exception(e)
+                        if db.is_active and changes is not None and _total_changes(db) == changes \
+                                and not (db.new or db.dirty or db.deleted):
+                            continue
+                        # Операция успела изменить данные - откатываем пакет и повторяем остальные
+                        db.rollback()
+                        retry = [done_job for done_job, _ in done] + pending[index + 1:]
+                        done = []
+                        break
+
+                if done:
+                    try:
+                        db.commit()
+                    except Exception as e:
+                        db.rollback()
+                        logger.error(f"Ошибка фиксации пакета из {len(done)} операций: {e}")
+                        for (_, _, _, future), _ in done:
+                            future.set_exception(e)
+                    else:
+                        self.batches += 1
+                        self.operations += len(done)
+                        for (_, _, _, future), result in done:
+                            future.set_result(result)
+                pending = retry
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Количество зафиксированных пакетов и операций"""
+        return {
+            "batches": self.batches,
+            "operations": self.operations,
+            "average_batch": self.operations / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+
+def _total_changes(db: Session) -> Optional[int]:
+    """Счетчик измененных строк соединения сессии (только SQLite)"""
+    return getattr(db.connection().connection.dbapi_connection, "total_changes", None)
+
+
+write_queue = WriteQueue(
+    max_batch=settings.WRITE_QUEUE_MAX_BATCH,
+    max_wait_seconds=settings.WRITE_QUEUE_MAX_WAIT_MS / 1000
+)
+
+
+def execute_write(db: Session, fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Выполняет операцию записи fn(db, *args, **kwargs): через очередь записи, если она включена
+    (тогда db не используется), иначе напрямую в сессии запроса.
+    Для синхронных обработчиков (выполняются в пуле потоков).
+    """
+    if not settings.WRITE_QUEUE_ENABLED:
+        return fn(db, *args, **kwargs)
+    return write_queue.submit(fn, *args, **kwargs).result()
+
+
+async def execute_write_async(db: Session, fn: Callable[..., T], *args, **kwargs) -> T:
+    """То же, что execute_write, для async-обработчиков: ожидание не блокирует цикл событий"""
+    if not settings.WRITE_QUEUE_ENABLED:
+        return fn(db, *args, **kwargs)
+    return await asyncio.wrap_future(write_queue.submit(fn, *args, **kwargs))
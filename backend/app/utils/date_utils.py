@@ -1,9 +1,33 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
+from typing import Tuple
 
 def is_weekend(date: datetime) -> bool:
     """Проверяет, является ли дата выходным днем (суббота или воскресенье)"""
     return date.weekday() >= 5  # 5 - суббота, 6 - воскресенье
 
+def day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """
+    Возвращает полуоткрытый интервал [начало дня, начало следующего дня).
+    Фильтр column >= start AND column < end использует индекс по колонке,
+    в отличие от func.date(column) == day.
+    """
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+def to_naive(moment: datetime) -> datetime:
+    """
+    Приводит время к виду, в котором оно хранится в БД: без часового пояса.
+    Время с часовым поясом (например, "2026-11-20T19:30:00.000Z" из toISOString()
+    на фронтенде) переводится в UTC; наивное время возвращается без изменений.
+    """
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+def to_local(moment: datetime) -> datetime:
+    """Переводит время из БД (UTC без часового пояса) в местное время сервера - для вывода людям"""
+    return moment.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
 def get_day_name(weekday: int) -> str:
     """Возвращает название дня недели на русском языке по номеру (0-6)"""
     days = {
@@ -0,0 +1,81 @@
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+# Набор запрошенных полей: имя поля -> вложенные поля (None - все вложенные поля)
+FieldSet = Dict[str, Optional[Set[str]]]
+
+
+def parse_fields(fields: Optional[str]) -> Optional[FieldSet]:
+    """
+    Разбирает параметр запроса fields (например, "id,status,items.name,items.quantity").
+
+    Returns:
+        None, если параметр не передан (нужны все поля), иначе словарь
+        {поле: множество вложенных полей или None}
+    """
+    if fields is None:
+        return None
+
+    result: FieldSet = {}
+    for raw_name in fields.split(","):
+        name = raw_name.strip()
+        if not name:
+            continue
+        if "." in name:
+            parent, child = name.split(".", 1)
+            nested = result.get(parent, set())
+            # Если родитель уже запрошен целиком, вложенный фильтр не сужаем
+            if nested is not None:
+                nested.add(child)
+                result[parent] = nested
+        else:
+            result[name] = None
+
+    return result or None
+
+
+def wants(fields: Optional[FieldSet], name: str) -> bool:
+    """Проверяет, запрошено ли поле"""
+    return fields is None or name in fields
+
+
+def nested_fields(fields: Optional[FieldSet], name: str) -> Optional[FieldSet]:
+    """Возвращает набор вложенных полей для составного поля (например, items)"""
+    if fields is None or fields.get(name) is None:
+        return None
+    return {child: None for child in fields[name]}
+
+
+def build_fields(builders: Dict[str, Callable[[], Any]], fields: Optional[FieldSet]) -> Dict[str, Any]:
+    """
+    Собирает словарь, вычисляя только запрошенные поля.
+
+    Args:
+        builders: словарь {имя поля: функция без аргументов, вычисляющая значение}
+        fields: результат parse_fields
+    """
+    return {name: build() for name, build in builders.items() if wants(fields, name)}
+
+
+def filter_fields(data: Dict[str, Any], fields: Optional[FieldSet]) -> Dict[str, Any]:
+    """Оставляет в уже собранном словаре только запрошенные поля (включая вложенные списки)"""
+    if fields is None:
+        return data
+
+    result = {}
+    for name, nested in fields.items():
+        if name not in data:
+            continue
+        value = data[name]
+        if nested is not None:
+            child_fields = {child: None for child in nested}
+            if isinstance(value, list):
+                value = [filter_fields(item, child_fields) if isinstance(item, dict) else item for item in value]
+            elif isinstance(value, dict):
+                value = filter_fields(value, child_fields)
+        result[name] = value
+    return result
+
+
+def filter_many(items: Iterable[Dict[str, Any]], fields: Optional[FieldSet]) -> list:
+    """Применяет filter_fields к списку словарей"""
+    return [filter_fields(item, fields) for item in items]
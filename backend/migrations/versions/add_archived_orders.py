@@ -0,0 +1,33 @@
+"""add_archived_orders
+
+Revision ID: add_archived_orders
+Revises: move_tables_from_settings
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_archived_orders'
+down_revision = 'move_tables_from_settings'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Указатели на заказы, перенесенные в месячные архивы data/archive/orders_YYYY_MM.db
+    op.create_table(
+        'archived_orders',
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.String(length=7), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('order_id')
+    )
+    op.create_index(op.f('ix_archived_orders_month'), 'archived_orders', ['month'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_archived_orders_month'), table_name='archived_orders')
+    op.drop_table('archived_orders')
@@ -0,0 +1,37 @@
+"""add_dashboard_counters
+
+Revision ID: add_dashboard_counters
+Revises: add_archived_orders
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_dashboard_counters'
+down_revision = 'add_archived_orders'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Счетчики панели администратора (одна строка); заполняются пересчетом при запуске приложения
+    op.create_table(
+        'dashboard_counters',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('orders_today', sa.Integer(), nullable=False),
+        sa.Column('orders_total', sa.Integer(), nullable=False),
+        sa.Column('revenue_today', sa.Float(), nullable=False),
+        sa.Column('reservations_today', sa.Integer(), nullable=False),
+        sa.Column('users', sa.Integer(), nullable=False),
+        sa.Column('dishes', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('dashboard_counters')
@@ -0,0 +1,38 @@
+"""add_idempotency_keys
+
+Revision ID: add_idempotency_keys
+Revises: add_review_types
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_idempotency_keys'
+down_revision = 'add_review_types'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Таблица сохраненных ответов для запросов с заголовком Idempotency-Key
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('key', sa.String(length=128), nullable=False),
+        sa.Column('endpoint', sa.String(length=255), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('response_body', sa.Text(), nullable=True),
+        sa.Column('media_type', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    
+    # Индекс для очистки устаревших ключей по TTL
+    op.create_index(op.f('ix_idempotency_keys_created_at'), 'idempotency_keys', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_idempotency_keys_created_at'), table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,25 @@
+"""add_order_code_expiry_index
+
+Revision ID: add_order_code_expiry_index
+Revises: add_order_code_pool
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_order_code_expiry_index'
+down_revision = 'add_order_code_pool'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Индекс для фоновой очистки устаревших кодов заказов
+    op.create_index('ix_order_codes_is_used_created_at', 'order_codes', ['is_used', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_order_codes_is_used_created_at', table_name='order_codes')
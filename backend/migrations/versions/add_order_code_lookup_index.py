@@ -0,0 +1,25 @@
+"""add_order_code_lookup_index
+
+Revision ID: add_order_code_lookup_index
+Revises: add_dashboard_counters
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_order_code_lookup_index'
+down_revision = 'add_dashboard_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Индекс для поиска заказа по коду и возврата кодов закрытых заказов в пул
+    op.create_index('ix_orders_order_code', 'orders', ['order_code'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_orders_order_code', table_name='orders')
@@ -0,0 +1,34 @@
+"""add_order_code_pool
+
+Revision ID: add_order_code_pool
+Revises: merge_order_line_items
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_order_code_pool'
+down_revision = 'merge_order_line_items'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Пул свободных кодов заказов (заполняется приложением при исчерпании)
+    op.create_table(
+        'order_code_pool',
+        sa.Column('code', sa.String(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('code')
+    )
+    
+    # Индекс для выдачи следующего кода по случайной позиции
+    op.create_index(op.f('ix_order_code_pool_position'), 'order_code_pool', ['position'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_order_code_pool_position'), table_name='order_code_pool')
+    op.drop_table('order_code_pool')
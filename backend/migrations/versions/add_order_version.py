@@ -0,0 +1,25 @@
+"""add_order_version
+
+Revision ID: add_order_version
+Revises: add_idempotency_keys
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_order_version'
+down_revision = 'add_idempotency_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Версия строки заказа для оптимистичной блокировки при смене статусов
+    op.add_column('orders', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    op.drop_column('orders', 'version')
@@ -0,0 +1,47 @@
+"""add_reservation_reminders
+
+Revision ID: add_reservation_reminders
+Revises: add_reservation_time_index
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_reservation_reminders'
+down_revision = 'add_reservation_time_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Отметка о поставленном в очередь напоминании о брони
+    op.add_column('reservations', sa.Column('reminder_sent_at', sa.DateTime(), nullable=True))
+    
+    # Очередь исходящих уведомлений
+    op.create_table(
+        'notifications',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('channel', sa.String(length=10), nullable=False),
+        sa.Column('recipient', sa.String(length=255), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=True),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('reservation_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['reservation_id'], ['reservations.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_notifications_id'), 'notifications', ['id'], unique=False)
+    op.create_index('ix_notifications_status_created_at', 'notifications', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_notifications_status_created_at', table_name='notifications')
+    op.drop_index(op.f('ix_notifications_id'), table_name='notifications')
+    op.drop_table('notifications')
+    op.drop_column('reservations', 'reminder_sent_at')
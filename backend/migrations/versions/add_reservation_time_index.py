@@ -0,0 +1,25 @@
+"""add_reservation_time_index
+
+Revision ID: add_reservation_time_index
+Revises: add_order_code_expiry_index
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_reservation_time_index'
+down_revision = 'add_order_code_expiry_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Индекс для выборок бронирований за день (интервал по времени) с фильтром по статусу
+    op.create_index('ix_reservations_time_status', 'reservations', ['reservation_time', 'status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reservations_time_status', table_name='reservations')
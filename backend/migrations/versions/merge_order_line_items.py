@@ -0,0 +1,94 @@
+"""merge_order_line_items
+
+Revision ID: merge_order_line_items
+Revises: normalize_order_statuses
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'merge_order_line_items'
+down_revision = 'normalize_order_statuses'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    # Снимок блюда на момент заказа
+    op.add_column('order_dish', sa.Column('dish_name', sa.String(), nullable=True))
+    op.add_column('order_dish', sa.Column('category_id', sa.Integer(), nullable=True))
+    op.add_column('order_dish', sa.Column('cost_price', sa.Float(), nullable=True))
+    op.create_index(op.f('ix_order_dish_order_id'), 'order_dish', ['order_id'], unique=False)
+    
+    conn = op.get_bind()
+    
+    # Переносим позиции из order_items для заказов, у которых нет позиций в order_dish.
+    # Пакет - набор заказов, чтобы позиции одного заказа переносились одним INSERT
+    if 'order_items' in sa.inspect(conn).get_table_names():
+        select_orders = sa.text(
+            "SELECT DISTINCT order_id FROM order_items WHERE order_id > :last_id "
+            "ORDER BY order_id LIMIT :limit"
+        )
+        copy_items = sa.text(
+            "INSERT INTO order_dish (order_id, dish_id, quantity, price, dish_name, category_id, cost_price) "
+            "SELECT oi.order_id, oi.dish_id, oi.quantity, oi.price, d.name, d.category_id, d.cost_price "
+            "FROM order_items oi LEFT JOIN dishes d ON d.id = oi.dish_id "
+            "WHERE oi.order_id IN :ids "
+            "AND oi.order_id NOT IN (SELECT order_id FROM order_dish WHERE order_id IN :ids)"
+        ).bindparams(sa.bindparam('ids', expanding=True))
+        
+        last_id = 0
+        while True:
+            order_ids = [row[0] for row in conn.execute(select_orders, {'last_id': last_id, 'limit': BATCH_SIZE})]
+            if not order_ids:
+                break
+            last_id = order_ids[-1]
+            conn.execute(copy_items, {'ids': order_ids})
+        
+        op.drop_table('order_items')
+    
+    # Заполняем снимок блюда у существующих позиций пакетами по первичному ключу
+    select_items = sa.text(
+        "SELECT id FROM order_dish WHERE id > :last_id AND dish_name IS NULL ORDER BY id LIMIT :limit"
+    )
+    fill_snapshot = sa.text(
+        "UPDATE order_dish SET "
+        "dish_name = (SELECT name FROM dishes WHERE dishes.id = order_dish.dish_id), "
+        "category_id = (SELECT category_id FROM dishes WHERE dishes.id = order_dish.dish_id), "
+        "cost_price = (SELECT cost_price FROM dishes WHERE dishes.id = order_dish.dish_id) "
+        "WHERE id IN :ids"
+    ).bindparams(sa.bindparam('ids', expanding=True))
+    
+    last_id = 0
+    while True:
+        item_ids = [row[0] for row in conn.execute(select_items, {'last_id': last_id, 'limit': BATCH_SIZE})]
+        if not item_ids:
+            break
+        last_id = item_ids[-1]
+        conn.execute(fill_snapshot, {'ids': item_ids})
+
+
+def downgrade():
+    op.create_table(
+        'order_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('dish_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=True),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['dish_id'], ['dishes.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_order_items_id'), 'order_items', ['id'], unique=False)
+    
+    op.drop_index(op.f('ix_order_dish_order_id'), table_name='order_dish')
+    op.drop_column('order_dish', 'cost_price')
+    op.drop_column('order_dish', 'category_id')
+    op.drop_column('order_dish', 'dish_name')
@@ -0,0 +1,91 @@
+"""move_tables_from_settings
+
+Revision ID: move_tables_from_settings
+Revises: add_reservation_reminders
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'move_tables_from_settings'
+down_revision = 'add_reservation_reminders'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'restaurant_tables',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('number', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=True),
+        sa.Column('capacity', sa.Integer(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('position_x', sa.Integer(), nullable=False),
+        sa.Column('position_y', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_restaurant_tables_id'), 'restaurant_tables', ['id'], unique=False)
+    op.create_index(op.f('ix_restaurant_tables_number'), 'restaurant_tables', ['number'], unique=True)
+    op.create_index(op.f('ix_restaurant_tables_status'), 'restaurant_tables', ['status'], unique=False)
+    
+    # Переносим столы из JSON-колонки settings.tables
+    conn = op.get_bind()
+    settings_row = conn.execute(sa.text("SELECT id, tables FROM settings ORDER BY id LIMIT 1")).first()
+    if settings_row is None or not settings_row.tables:
+        return
+    tables = settings_row.tables
+    if isinstance(tables, str):
+        tables = json.loads(tables)
+    
+    rows = []
+    for index, table in enumerate(tables, start=1):
+        table_id = table.get('id') or index
+        rows.append({
+            'id': table_id,
+            'number': table.get('number') or table_id,
+            'name': table.get('name') or f'Стол {table_id}',
+            'capacity': table.get('capacity') or 2,
+            'is_active': table.get('is_active', True),
+            'position_x': table.get('position_x', 15 + (table_id - 1) * 20),
+            'position_y': table.get('position_y', 15 + (table_id % 2) * 20),
+            'status': table.get('status') or 'available',
+        })
+    conn.execute(
+        sa.text(
+            "INSERT INTO restaurant_tables "
+            "(id, number, name, capacity, is_active, position_x, position_y, status, updated_at) "
+            "VALUES (:id, :number, :name, :capacity, :is_active, :position_x, :position_y, :status, CURRENT_TIMESTAMP)"
+        ),
+        rows
+    )
+    conn.execute(sa.text("UPDATE settings SET tables = NULL WHERE id = :id"), {'id': settings_row.id})
+
+
+def downgrade():
+    # Возвращаем столы в JSON-колонку settings.tables
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        "SELECT id, number, name, capacity, is_active, position_x, position_y, status "
+        "FROM restaurant_tables ORDER BY number"
+    )).mappings().all()
+    tables = [
+        {**dict(row), 'is_active': bool(row['is_active'])}
+        for row in rows
+    ]
+    conn.execute(
+        sa.text("UPDATE settings SET tables = :tables WHERE id = (SELECT MIN(id) FROM settings)"),
+        {'tables': json.dumps(tables, ensure_ascii=False)}
+    )
+    
+    op.drop_index(op.f('ix_restaurant_tables_status'), table_name='restaurant_tables')
+    op.drop_index(op.f('ix_restaurant_tables_number'), table_name='restaurant_tables')
+    op.drop_index(op.f('ix_restaurant_tables_id'), table_name='restaurant_tables')
+    op.drop_table('restaurant_tables')
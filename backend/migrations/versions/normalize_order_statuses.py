@@ -0,0 +1,83 @@
+"""normalize_order_statuses
+
+Revision ID: normalize_order_statuses
+Revises: add_order_version
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'normalize_order_statuses'
+down_revision = 'add_order_version'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+ORDER_STATUSES = [
+    'PENDING', 'NEW', 'CONFIRMED', 'COOKING', 'PREPARING',
+    'IN_PROGRESS', 'READY', 'DELIVERED', 'COMPLETED', 'CANCELLED'
+]
+PAYMENT_STATUSES = ['PENDING', 'PAID', 'FAILED', 'REFUNDED']
+
+ORDER_STATUS_ALIASES = {'CANCELED': 'CANCELLED', 'PROCESSING': 'IN_PROGRESS'}
+PAYMENT_STATUS_ALIASES = {'UNPAID': 'PENDING'}
+
+
+def _normalize(value, aliases):
+    if value is None:
+        return None
+    text_value = str(value).strip().upper().replace('-', '_').replace(' ', '_')
+    if not text_value:
+        return None
+    return aliases.get(text_value, text_value)
+
+
+def upgrade():
+    conn = op.get_bind()
+    
+    # Переписываем статусы пакетами по первичному ключу
+    select_query = sa.text(
+        "SELECT id, status, payment_status FROM orders "
+        "WHERE id > :last_id AND (status NOT IN :statuses OR payment_status NOT IN :payment_statuses) "
+        "ORDER BY id LIMIT :limit"
+    ).bindparams(
+        sa.bindparam('statuses', expanding=True),
+        sa.bindparam('payment_statuses', expanding=True)
+    )
+    update_query = sa.text(
+        "UPDATE orders SET status = :status, payment_status = :payment_status WHERE id = :id"
+    )
+    
+    last_id = 0
+    while True:
+        rows = conn.execute(select_query, {
+            'last_id': last_id,
+            'statuses': ORDER_STATUSES,
+            'payment_statuses': PAYMENT_STATUSES,
+            'limit': BATCH_SIZE
+        }).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        
+        updates = []
+        for row_id, status, payment_status in rows:
+            new_status = _normalize(status, ORDER_STATUS_ALIASES)
+            new_payment_status = _normalize(payment_status, PAYMENT_STATUS_ALIASES)
+            if new_status != status or new_payment_status != payment_status:
+                updates.append({'id': row_id, 'status': new_status, 'payment_status': new_payment_status})
+        if updates:
+            conn.execute(update_query, updates)
+    
+    # Индексы для фильтров по статусу
+    op.create_index(op.f('ix_orders_status'), 'orders', ['status'], unique=False)
+    op.create_index(op.f('ix_orders_payment_status'), 'orders', ['payment_status'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_orders_payment_status'), table_name='orders')
+    op.drop_index(op.f('ix_orders_status'), table_name='orders')
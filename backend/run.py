@@ -3,8 +3,6 @@ import uvicorn
 import os
 import sys
 
-from app.database.session import SessionLocal
-from app.core.init_db import init_db
 from app.core.config import settings
 
 # Настройка логгера
@@ -36,15 +34,7 @@ def main() -> None:
         os.chdir(backend_dir)
         logger.info(f"Изменена рабочая директория для запуска сервера: {os.getcwd()}")
             
-        # Инициализируем базу данных
-        logger.info("Инициализация базы данных...")
-        db = SessionLocal()
-        try:
-            init_db(db)
-        finally:
-            db.close()
-            
-        # Запускаем сервер
+        # Запускаем сервер (база данных готовится при его старте, в lifespan app.main)
         logger.info(f"Запуск сервера на {settings.SERVER_HOST}:{settings.SERVER_PORT}")
         uvicorn.run(
             "main:app",
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Задержка записи заказов во время резервного копирования (app.services.db_backup).
+
+Скрипт создает временную базу с меню и историей заказов (по умолчанию 200000), затем
+несколько потоков непрерывно создают заказы (app.services.orders.create_order), а в это время:
+- без копии: фон для сравнения;
+- копия шагами: create_backup с DB_BACKUP_PAGES_PER_STEP / DB_BACKUP_STEP_SLEEP_MS;
+- копия одним шагом: весь файл за один sqlite3_backup_step (pages=-1, без пауз).
+
+Для каждого режима выводит длительность, операций в секунду и задержки p50/p99/max
+создания заказа, измеренные только пока шло копирование.
+
+Использование:
+    python scripts/benchmark_backup.py [--orders 200000] [--writers 8] [--profile durable]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200000, help="заказов в истории")
+    parser.add_argument("--writers", type=int, default=8, help="потоков, создающих заказы")
+    parser.add_argument("--profile", default="durable", help="профиль SQLite (SQLITE_PROFILE)")
+    args = parser.parse_args()
+
+    # Настройки читаются при импорте приложения - задаем их заранее
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'backup.db')}"
+    os.environ["SQLITE_PROFILE"] = args.profile
+
+    from sqlalchemy import insert
+    from app.core.config import settings
+    from app.database.session import Base, SessionLocal, engine
+    import app.models  # noqa: F401 - регистрируем все модели в Base.metadata
+    from app.models.menu import Category, Dish
+    from app.models.order import Order, OrderDish
+    from app.models.user import User
+    from app.schemas.orders import OrderCreate
+    from app.services import db_backup
+    from app.services.orders import create_order
+
+    logging.disable(logging.WARNING)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(email="benchmark@example.com", hashed_password="-", full_name="Нагрузка", role="client")
+    category = Category(name="Горячее")
+    db.add_all([user, category])
+    db.flush()
+    dishes = [Dish(name=f"Блюдо {i}", price=500 + i * 10, category_id=category.id) for i in range(30)]
+    db.add_all(dishes)
+    db.commit()
+    dish_ids = [dish.id for dish in dishes]
+    user_id = user.id
+
+    print(f"Заполнение истории: {args.orders} заказов...")
+    for start in range(0, args.orders, 5000):
+        count = min(5000, args.orders - start)
+        first_id = start + 1
+        db.execute(insert(Order), [
+            {"id": first_id + i, "user_id": user_id, "status": "COMPLETED", "total_amount": 1500,
+             "comment": "Без лука, пожалуйста" * 3, "customer_name": "Гость", "customer_phone": "+70000000000"}
+            for i in range(count)
+        ])
+        db.execute(insert(OrderDish), [
+            {"order_id": first_id + i, "dish_id": random.choice(dish_ids), "quantity": 2, "price": 750,
+             "dish_name": "Блюдо", "category_id": category.id}
+            for i in range(count) for _ in range(3)
+        ])
+        db.commit()
+    db.close()
+    print(f"Размер базы: {os.path.getsize(engine.url.database) / 1024 / 1024:.1f} МБ")
+
+    def run(mode: str):
+        latencies = []
+        lock = threading.Lock()
+        stop = threading.Event()
+        measuring = threading.Event()
+
+        def writer():
+            own_latencies = []
+            order_in = OrderCreate(dishes=dish_ids[:3], status="pending")
+            while not stop.is_set():
+                session = SessionLocal()
+                started = time.perf_counter()
+                try:
+                    create_order(session, user_id, order_in)
+                finally:
+                    session.close()
+                if measuring.is_set():
+                    own_latencies.append(time.perf_counter() - started)
+            with lock:
+                latencies.extend(own_latencies)
+
+        threads = [threading.Thread(target=writer) for _ in range(args.writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+
+        measuring.set()
+        started = time.perf_counter()
+        steps = "-"
+        if mode == "без копии":
+            time.sleep(3)
+        else:
+            settings.DB_BACKUP_PAGES_PER_STEP = pages_per_step if mode == "шагами" else -1
+            settings.DB_BACKUP_STEP_SLEEP_MS = step_sleep_ms if mode == "шагами" else 0
+            steps = db_backup.create_backup()["steps"]
+        elapsed = time.perf_counter() - started
+        measuring.clear()
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return elapsed, latencies, steps
+
+    pages_per_step = settings.DB_BACKUP_PAGES_PER_STEP
+    step_sleep_ms = settings.DB_BACKUP_STEP_SLEEP_MS
+    print(
+        f"Профиль {args.profile}, потоков записи {args.writers}, "
+        f"шаг {pages_per_step} страниц, пауза {step_sleep_ms} мс"
+    )
+    print(f"{'режим':>12} {'время, с':>9} {'шагов':>7} {'операций/с':>11} {'p50, мс':>9} {'p99, мс':>9} {'max, мс':>9}")
+    for mode in ("без копии", "шагами", "одним шагом"):
+        elapsed, latencies, steps = run(mode)
+        print(
+            f"{mode:>12} {elapsed:>9.2f} {steps:>7} {len(latencies) / elapsed:>11.0f} "
+            f"{percentile(latencies, 0.5) * 1000:>9.1f} {percentile(latencies, 0.99) * 1000:>9.1f} "
+            f"{max(latencies, default=0) * 1000:>9.1f}"
+        )
+    engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Сравнение профилей настроек SQLite (SQLITE_PROFILES) на нагрузке заказов.
+
+Для каждого профиля скрипт создает временную базу по моделям приложения и выполняет:
+- запись: создание заказов с позициями, каждый заказ - отдельная транзакция, как в API;
+- чтение: заказ с позициями по id и выборка заказов за час по created_at.
+
+Выводит заказов в секунду и задержки p50/p99 для записи и чтения.
+
+Использование:
+    python scripts/benchmark_sqlite_profiles.py [--orders 3000] [--reads 5000] [--profiles durable balanced throughput]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database.session import Base, SQLITE_PROFILES, apply_sqlite_profile
+import app.models  # noqa: F401 - регистрируем все модели в Base.metadata
+from app.models.menu import Category, Dish
+from app.models.order import Order, OrderDish
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def make_engine(db_file: str, profile: str):
+    engine = create_engine(f"sqlite:///{db_file}", connect_args={"check_same_thread": False, "timeout": 30})
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        apply_sqlite_profile(dbapi_connection, profile)
+
+    return engine
+
+
+def run_profile(profile: str, orders: int, reads: int):
+    db_file = os.path.join(tempfile.mkdtemp(), f"{profile}.db")
+    engine = make_engine(db_file, profile)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    db = Session()
+    category = Category(name="Горячее")
+    db.add(category)
+    db.flush()
+    dishes = [Dish(name=f"Блюдо {i}", price=500 + i * 10, category_id=category.id) for i in range(30)]
+    db.add_all(dishes)
+    db.commit()
+
+    # Запись: один заказ с 1-5 позициями - одна транзакция
+    start_time = datetime.now() - timedelta(days=30)
+    write_latencies = []
+    write_started = time.perf_counter()
+    for number in range(orders):
+        started = time.perf_counter()
+        order = Order(
+            status="pending", payment_status="pending", total_amount=0,
+            created_at=start_time + timedelta(seconds=number * 60)
+        )
+        db.add(order)
+        db.flush()
+        items = random.sample(dishes, random.randint(1, 5))
+        db.add_all([
+            OrderDish(order_id=order.id, dish_id=dish.id, quantity=1, price=dish.price, dish_name=dish.name)
+            for dish in items
+        ])
+        order.total_amount = sum(dish.price for dish in items)
+        db.commit()
+        write_latencies.append(time.perf_counter() - started)
+    write_elapsed = time.perf_counter() - write_started
+
+    # Чтение: заказ с позициями по id и заказы за час
+    read_latencies = []
+    for number in range(reads):
+        started = time.perf_counter()
+        if number % 2:
+            order_id = random.randint(1, orders)
+            db.query(Order).filter(Order.id == order_id).first()
+            db.query(OrderDish).filter(OrderDish.order_id == order_id).all()
+        else:
+            since = start_time + timedelta(minutes=random.randint(0, orders))
+            db.query(Order).filter(Order.created_at >= since, Order.created_at < since + timedelta(hours=1)).all()
+        read_latencies.append(time.perf_counter() - started)
+    db.close()
+    engine.dispose()
+
+    return {
+        "orders_per_sec": orders / write_elapsed,
+        "write_p50": percentile(write_latencies, 0.5),
+        "write_p99": percentile(write_latencies, 0.99),
+        "read_p50": percentile(read_latencies, 0.5),
+        "read_p99": percentile(read_latencies, 0.99),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=3000, help="количество создаваемых заказов")
+    parser.add_argument("--reads", type=int, default=5000, help="количество операций чтения")
+    parser.add_argument("--profiles", nargs="+", default=list(SQLITE_PROFILES), choices=list(SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    print(
+        f"{'профиль':>11} {'заказов/с':>10} {'запись p50':>11} {'запись p99':>11} "
+        f"{'чтение p50':>11} {'чтение p99':>11}  (мс)"
+    )
+    for profile in args.profiles:
+        result = run_profile(profile, args.orders, args.reads)
+        print(
+            f"{profile:>11} {result['orders_per_sec']:>10.0f} "
+            f"{result['write_p50'] * 1000:>11.2f} {result['write_p99'] * 1000:>11.2f} "
+            f"{result['read_p50'] * 1000:>11.2f} {result['read_p99'] * 1000:>11.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Замер времени запуска приложения в зависимости от размера базы.
+
+Для каждого размера скрипт создает временную SQLite-базу и в отдельных процессах
+замеряет время от старта интерпретатора до готовности приложения (импорт app.main,
+выполнение startup-фазы lifespan):
+- первый запуск на пустой базе (полная подготовка);
+- повторный запуск после наполнения базы заказами (версия схемы совпадает,
+  подготовка пропускается);
+- запуск со сброшенной версией схемы (PRAGMA user_version = 0) - полная подготовка
+  на наполненной базе, для сравнения.
+
+Использование:
+    python scripts/benchmark_startup.py [--sizes 0 20000 200000] [--tolerance 0.5]
+
+Код возврата 1, если повторный запуск на самой большой базе медленнее, чем на самой
+маленькой, больше чем на tolerance секунд.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Код дочернего процесса: время от старта интерпретатора до завершения startup-фазы lifespan
+CHILD = """
+import time
+started = time.perf_counter()
+import asyncio
+import logging
+logging.disable(logging.CRITICAL)
+from app.main import app
+
+async def start():
+    async with app.router.lifespan_context(app):
+        print("READY", time.perf_counter() - started)
+
+asyncio.run(start())
+"""
+
+
+def measure(db_file: str) -> float:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_file}", ENVIRONMENT="production")
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith("READY "):
+            return float(line.split()[1])
+    raise RuntimeError(f"Приложение не запустилось:\n{result.stderr[-2000:]}")
+
+
+def fill_orders(db_file: str, count: int, batch_size: int = 10000) -> None:
+    """Добавляет count закрытых заказов с двумя позициями каждый"""
+    conn = sqlite3.connect(db_file)
+    try:
+        start = datetime.now() - timedelta(days=365)
+        first_id = (conn.execute("SELECT MAX(id) FROM orders").fetchone()[0] or 0) + 1
+        for offset in range(0, count, batch_size):
+            ids = range(first_id + offset, first_id + min(offset + batch_size, count))
+            conn.executemany(
+                "INSERT INTO orders (id, status, payment_status, total_amount, created_at, version) "
+                "VALUES (?, 'completed', 'paid', ?, ?, 1)",
+                [(order_id, random.randint(500, 20000), start + timedelta(minutes=order_id)) for order_id in ids]
+            )
+            conn.executemany(
+                "INSERT INTO order_dish (order_id, dish_id, quantity, price, dish_name) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (order_id, dish_id, 1, 1000.0, f"Блюдо {dish_id}")
+                    for order_id in ids for dish_id in (1, 2)
+                ]
+            )
+            conn.commit()
+        # Переносим WAL в основной файл, чтобы замер не включал разбор большого журнала
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+def reset_schema_version(db_file: str) -> None:
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.execute("PRAGMA user_version = 0")
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 20000, 200000], help="количество заказов в базе")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="допустимый рост времени повторного запуска, с")
+    args = parser.parse_args()
+
+    print(f"{'заказов':>10} {'размер, МБ':>11} {'первый':>8} {'повторный':>10} {'полный':>8}")
+    warm = []
+    for size in sorted(args.sizes):
+        db_file = os.path.join(tempfile.mkdtemp(), "startup.db")
+        cold_time = measure(db_file)
+        fill_orders(db_file, size)
+        warm_time = measure(db_file)
+        reset_schema_version(db_file)
+        full_time = measure(db_file)
+        warm.append(warm_time)
+        megabytes = os.path.getsize(db_file) / 1024 / 1024
+        print(f"{size:>10} {megabytes:>11.1f} {cold_time:>8.2f} {warm_time:>10.2f} {full_time:>8.2f}")
+
+    growth = warm[-1] - warm[0]
+    print(f"\nРост времени повторного запуска: {growth:+.2f} с (допустимо {args.tolerance:.2f} с)")
+    return 1 if growth > args.tolerance else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
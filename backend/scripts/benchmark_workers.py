@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+Замер пропускной способности API при разном количестве воркеров.
+
+Скрипт готовит временную SQLite-базу (меню из категорий и блюд), для каждого количества
+воркеров запускает uvicorn (WORKERS_COUNT=N, --workers N) и нагружает его параллельными
+клиентами в отдельных процессах: чтение меню (/api/v1/menu/dishes, /api/v1/menu/categories)
+и /api/v1/health. Выводит запросы в секунду и задержки p50/p95.
+
+Использование:
+    python scripts/benchmark_workers.py [--workers 1 2 4] [--clients 16] [--duration 10]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+PATHS = ["/api/v1/menu/dishes", "/api/v1/menu/categories", "/api/v1/health"]
+
+
+def prepare_database(db_file: str) -> None:
+    """Создает схему и наполняет меню"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_file}"
+    from app.database.bootstrap import bootstrap_database
+    from app.database.session import SessionLocal
+    from app.models.menu import Category, Dish
+
+    bootstrap_database()
+    db = SessionLocal()
+    try:
+        if db.query(Dish).count() == 0:
+            categories = [Category(name=f"Категория {i}") for i in range(1, 8)]
+            db.add_all(categories)
+            db.flush()
+            db.add_all([
+                Dish(
+                    name=f"Блюдо {i}", price=500 + i * 10, category_id=categories[i % len(categories)].id,
+                    description="Описание блюда " * 5, is_available=True
+                )
+                for i in range(1, 61)
+            ])
+            db.commit()
+    finally:
+        db.close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port: int, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/api/v1/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError("Сервер не запустился")
+
+
+def run_client(port: int, duration: float, offset: int):
+    """Один клиент: запросы по keep-alive соединению в течение duration секунд"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    index = offset
+    while time.monotonic() < deadline:
+        path = PATHS[index % len(PATHS)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+    return latencies, errors
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def benchmark(db_file: str, workers: int, clients: int, duration: float):
+    port = free_port()
+    env = dict(
+        os.environ, DATABASE_URL=f"sqlite:///{db_file}", WORKERS_COUNT=str(workers), ENVIRONMENT="production"
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log"
+        ],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(port)
+        with ProcessPoolExecutor(max_workers=clients) as pool:
+            results = list(pool.map(run_client, [port] * clients, [duration] * clients, range(clients)))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+    errors = sum(client_errors for _, client_errors in results)
+    return len(latencies) / duration, percentile(latencies, 0.5), percentile(latencies, 0.95), errors
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="количество воркеров")
+    parser.add_argument("--clients", type=int, default=16, help="параллельных клиентов")
+    parser.add_argument("--duration", type=float, default=10, help="длительность замера, с")
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(), "workers.db")
+    prepare_database(db_file)
+
+    print(f"Ядер CPU: {os.cpu_count()}, клиентов: {args.clients}, длительность: {args.duration:.0f} с")
+    print(f"{'воркеров':>9} {'запросов/с':>11} {'p50, мс':>9} {'p95, мс':>9} {'ошибок':>7}")
+    for workers in args.workers:
+        rps, p50, p95, errors = benchmark(db_file, workers, args.clients, args.duration)
+        print(f"{workers:>9} {rps:>11.0f} {p50 * 1000:>9.1f} {p95 * 1000:>9.1f} {errors:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Замер пропускной способности записи заказов с очередью записи (group commit) и без нее.
+
+Скрипт создает временную базу с меню, затем N параллельных потоков (по умолчанию 50)
+выполняют операции как обработчики API: создание заказа (app.services.orders.create_order)
+и перевод одного из своих заказов в следующий статус (order_state.transition_order).
+- напрямую: каждая операция - своя сессия и своя транзакция;
+- очередь: операции передаются потоку-писателю (app.services.write_queue), потоки ждут Future.
+
+Выводит операций в секунду, задержки p50/p99 и средний размер пакета.
+
+Использование:
+    python scripts/benchmark_write_queue.py [--waiters 50] [--operations 40] [--profile durable]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--waiters", type=int, default=50, help="параллельных потоков")
+    parser.add_argument("--operations", type=int, default=40, help="операций на поток")
+    parser.add_argument("--profile", default="durable", help="профиль SQLite (SQLITE_PROFILE)")
+    args = parser.parse_args()
+
+    # Настройки читаются при импорте приложения - задаем их заранее
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'write_queue.db')}"
+    os.environ["SQLITE_PROFILE"] = args.profile
+
+    from app.database.session import Base, SessionLocal, engine
+    import app.models  # noqa: F401 - регистрируем все модели в Base.metadata
+    from app.models.menu import Category, Dish
+    from app.models.user import User
+    from app.schemas.orders import OrderCreate
+    from app.services import order_state
+    from app.services.orders import create_order
+    from app.services.write_queue import WriteQueue
+
+    logging.disable(logging.WARNING)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(email="benchmark@example.com", hashed_password="-", full_name="Нагрузка", role="client")
+    db.add(user)
+    category = Category(name="Горячее")
+    db.add(category)
+    db.flush()
+    dishes = [Dish(name=f"Блюдо {i}", price=500 + i * 10, category_id=category.id) for i in range(30)]
+    db.add_all(dishes)
+    db.commit()
+    dish_ids = [dish.id for dish in dishes]
+    user_id = user.id
+    db.close()
+
+    def operation(number: int, own_orders: list):
+        """Четные операции создают заказ, нечетные переводят созданный заказ в следующий статус"""
+        if number % 2 == 0 or not own_orders:
+            order_in = OrderCreate(dishes=dish_ids[number % 7:number % 7 + 3], status="pending")
+            return create_order, (user_id, order_in)
+        return order_state.transition_order, (own_orders.pop(0),), {"status": "confirmed"}
+
+    def run(mode: str):
+        queue = WriteQueue(max_batch=64, max_wait_seconds=0.002) if mode == "очередь" else None
+        latencies, errors = [], []
+        lock = threading.Lock()
+        barrier = threading.Barrier(args.waiters + 1)
+
+        def waiter():
+            own_orders, own_latencies = [], []
+            barrier.wait()
+            for number in range(args.operations):
+                fn, fn_args, *rest = operation(number, own_orders)
+                kwargs = rest[0] if rest else {}
+                started = time.perf_counter()
+                try:
+                    if queue is not None:
+                        result = queue.submit(fn, *fn_args, **kwargs).result()
+                    else:
+                        session = SessionLocal()
+                        try:
+                            result = fn(session, *fn_args, **kwargs)
+                        finally:
+                            session.close()
+                except Exception as e:
+                    with lock:
+                        errors.append(e)
+                    continue
+                own_latencies.append(time.perf_counter() - started)
+                if fn is create_order:
+                    own_orders.append(result["id"])
+            with lock:
+                latencies.extend(own_latencies)
+
+        threads = [threading.Thread(target=waiter) for _ in range(args.waiters)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if queue is not None:
+            queue.stop()
+        stats = queue.stats() if queue is not None else {"average_batch": 1.0}
+        return len(latencies) / elapsed, latencies, errors, stats["average_batch"]
+
+    print(
+        f"Профиль {args.profile}, потоков {args.waiters}, операций на поток {args.operations} "
+        f"(создание заказа / смена статуса)"
+    )
+    print(f"{'режим':>9} {'операций/с':>11} {'p50, мс':>9} {'p99, мс':>9} {'пакет':>7} {'ошибок':>7}")
+    for mode in ("напрямую", "очередь"):
+        ops, latencies, errors, average_batch = run(mode)
+        print(
+            f"{mode:>9} {ops:>11.0f} {percentile(latencies, 0.5) * 1000:>9.1f} "
+            f"{percentile(latencies, 0.99) * 1000:>9.1f} {average_batch:>7.1f} {len(errors):>7}"
+        )
+        if errors:
+            print(f"          первая ошибка: {errors[0]}")
+    engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
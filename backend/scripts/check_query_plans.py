@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Проверка планов запросов бронирований по дате.
+
+Скрипт создает пустую SQLite-базу по моделям приложения, выполняет сервисные функции
+(бронирования за день, статистика бронирований, статистика панели управления -
+на пустой базе она пересчитывает строку счетчиков по таблицам),
+перехватывает их SQL и проверяет через EXPLAIN QUERY PLAN, что таблица reservations
+читается поиском по диапазону индекса (SEARCH), а не полным просмотром таблицы
+или индекса (SCAN).
+
+Использование:
+    python scripts/check_query_plans.py
+
+Код возврата 1, если хотя бы один запрос выполняет полный просмотр reservations.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database.session import Base
+import app.models  # noqa: F401 - регистрируем все модели в Base.metadata
+from app.services import analytics, dashboard, reservation
+
+TABLE = "reservations"
+
+
+def main() -> int:
+    db_file = os.path.join(tempfile.mkdtemp(), "plans.db")
+    engine = create_engine(f"sqlite:///{db_file}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if TABLE in statement and statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    checks = {
+        "get_reservations_by_date": lambda db: reservation.get_reservations_by_date(db, datetime.now()),
+        "get_reservation_stats": lambda db: analytics.get_reservation_stats(db),
+        "get_dashboard_stats": lambda db: dashboard.get_dashboard_stats(db),
+    }
+
+    failed = False
+    for name, run in checks.items():
+        db = Session()
+        statements.clear()
+        try:
+            run(db)
+            captured = list(statements)
+            if not captured:
+                print(f"[FAIL] {name}: запросы к {TABLE} не выполнялись")
+                failed = True
+                continue
+            for statement, parameters in captured:
+                with engine.connect() as conn:
+                    plan = [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+                # SCAN - полный просмотр таблицы или всего индекса; нужен SEARCH по диапазону
+                scans = [step for step in plan if step.startswith(f"SCAN {TABLE}")]
+                status = "FAIL" if scans else "OK"
+                failed = failed or bool(scans)
+                print(f"[{status}] {name}: {' | '.join(plan)}")
+        finally:
+            db.close()
+
+    engine.dispose()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
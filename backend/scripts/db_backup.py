@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Резервные копии базы SQLite (app.services.db_backup).
+
+Команды:
+    create           - создать снимок сейчас (можно при работающем приложении);
+    list             - список снимков от новых к старым;
+    restore <имя>    - восстановить базу и архивы заказов из снимка. Приложение должно быть
+                       остановлено; текущая база перед восстановлением сохраняется новым снимком.
+
+База берется из DATABASE_URL, как и в приложении.
+
+Использование:
+    python scripts/db_backup.py create
+    python scripts/db_backup.py list
+    python scripts/db_backup.py restore 20261019_120000
+"""
+
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create", help="создать снимок")
+    commands.add_parser("list", help="список снимков")
+    restore = commands.add_parser("restore", help="восстановить базу из снимка")
+    restore.add_argument("name", help="имя снимка (каталог в data/backups)")
+    args = parser.parse_args()
+
+    from app.database.session import IS_SQLITE
+    from app.services import db_backup
+
+    if not IS_SQLITE:
+        print("Резервные копии через backup API поддерживаются только для SQLite; для PostgreSQL используйте pg_dump")
+        return 1
+
+    if args.command == "create":
+        backup = db_backup.create_backup()
+        print(
+            f"Создан снимок {backup['name']}: {backup['bytes']} байт за {backup['duration_seconds']} с, "
+            f"шагов {backup['steps']}; удалено старых: {len(backup['removed'])}"
+        )
+    elif args.command == "list":
+        backups = db_backup.list_backups()
+        if not backups:
+            print(f"Снимков нет ({db_backup.BACKUP_DIR})")
+        for backup in backups:
+            print(f"{backup['name']}  {backup['created_at']:%Y-%m-%d %H:%M:%S} UTC  {backup['bytes'] / 1024 / 1024:.1f} МБ")
+    else:
+        result = db_backup.restore_backup(args.name)
+        print(
+            f"База восстановлена из снимка {result['restored']} (архивов: {len(result['archives'])}); "
+            f"предыдущее состояние: {result['previous_backup'] or 'не сохранялось'}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())